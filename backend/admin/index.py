@@ -1,424 +1,600 @@
 """API для админ-панели: управление собственниками, объектами и акциями"""
+import base64
+import gzip
 import json
 import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 import hashlib
-from datetime import datetime
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
 
-def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    return hashlib.sha256(password.encode()).hexdigest()
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
 
-def handler(event: dict, context) -> dict:
-    """API для управления всеми данными платформы (только для админа)"""
-    method = event.get('httpMethod', 'GET')
-    query_params = event.get('queryStringParameters', {}) or {}
-    action = query_params.get('action', '')
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# Маршрутизация: таблица (method, ROUTE_PARAMS...) -> обработчик собирается один раз при импорте модуля.
+# Все ответы собираются в json_response с общими заголовками - одно место для сериализации и заголовков
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Authorization',
+    'Access-Control-Max-Age': '86400'
+}
+ROUTE_PARAMS = (('action', ''),)
+
+def route_not_found(method: str, query: dict) -> dict:
+    return json_response(404, {'error': 'Endpoint not found'})
+
+# >>> shared/http.py - не править здесь, см. scripts/sync_shared.py
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+ROUTES = {}
+
+def route(method: str, *values):
+    """Регистрирует обработчик для метода и значений параметров ROUTE_PARAMS"""
+    def register(func):
+        ROUTES[(method,) + values] = func
+        return func
+    return register
+
+# Быстрая сериализация: orjson, если он установлен, иначе stdlib json.
+# NUMERIC приходит из драйвера сразу float, datetime/date кодируются по типу без цепочки isinstance
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_AS_FLOAT',
+    lambda value, cur: float(value) if value is not None else None
+))
+
+_JSON_ENCODERS = {Decimal: float, datetime: datetime.isoformat, date: date.isoformat}
+
+def _json_default(value):
+    encoder = _JSON_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return encoder(value)
+
+def dumps(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default).decode()
+    return json.dumps(payload, default=_json_default)
+
+def cursor_columns(cursor) -> list:
+    return [column.name for column in cursor.description]
+
+def rows_payload(columns: list, rows: list) -> list:
+    """Кортежи строк обычного курсора в объекты по именам колонок; в JSON их переводит только dumps"""
+    return [dict(zip(columns, row)) for row in rows]
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+# Сжатие ответов по Accept-Encoding: brotli (если установлен) или gzip, только для тел больше порога.
+# compression_stats по маршрутам помогают подобрать порог и уровни сжатия
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compression_stats = {}
+
+def accepted_encodings(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), None) or ''
+    encodings = set()
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=') if params.strip().startswith('q=') else '1'
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            continue
+    return encodings
+
+def compress_response(event: dict, response: dict, endpoint: str) -> dict:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or 'Content-Encoding' in response['headers']:
+        return response
+    
+    stats = compression_stats.setdefault(endpoint, {
+        'responses': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0
+    })
+    stats['responses'] += 1
+    raw = body.encode()
+    encodings = accepted_encodings(event)
+    if len(raw) < COMPRESS_MIN_SIZE or not encodings:
+        return response
+    
+    started = time.thread_time()
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings or '*' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    stats['cpu_ms'] += (time.thread_time() - started) * 1000
+    stats['compressed'] += 1
+    stats['bytes_in'] += len(raw)
+    stats['bytes_out'] += len(compressed)
     
+    headers = {**response['headers'], 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+    # Сжатое тело по байтам не совпадает с несжатым, поэтому сильный ETag ослабляется (W/).
+    # If-None-Match сравнивается без W/, так что 304 получают клиенты с любым из вариантов
+    if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+        headers['ETag'] = 'W/' + headers['ETag']
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+def dispatch(event: dict) -> dict:
+    """Выбор обработчика по таблице маршрутов за один поиск в словаре"""
+    method = event.get('httpMethod', 'GET')
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Authorization',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return {'statusCode': 200, 'headers': dict(PREFLIGHT_HEADERS), 'body': '', 'isBase64Encoded': False}
     
+    query = event.get('queryStringParameters') or {}
+    key = (method,) + tuple(query.get(name, default) for name, default in ROUTE_PARAMS)
+    route_handler = ROUTES.get(key)
+    if route_handler is None:
+        return route_not_found(method, query)
+    return compress_response(event, route_handler(event, query), ' '.join(str(part) for part in key if part))
+# <<< shared/http.py
+
+# >>> shared/passwords.py - не править здесь, см. scripts/sync_shared.py
+# Пароли хешируются scrypt; стоимость настраивается без миграции, т.к. параметры хранятся в самом хеше.
+# Хеширование идёт в ограниченном пуле потоков: всплеск логинов не отнимает весь CPU у остальных запросов
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '2'))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', '2'))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование переполнена - клиенту стоит повторить позже"""
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+def _run_hashing(func, *args):
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise PasswordHasherBusy()
     try:
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _hash_password_sync(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return '$'.join((
+        'scrypt', str(PASSWORD_SCRYPT_N), str(PASSWORD_SCRYPT_R), str(PASSWORD_SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ))
+
+def _verify_password_sync(password: str, stored: str) -> tuple:
+    if stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+        return ok, ok and (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    # Старый формат: SHA-256 без соли; при успешном входе хеш сразу заменяется на scrypt
+    ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    return ok, ok
+
+def hash_password(password: str) -> str:
+    """Хеширование пароля scrypt со случайной солью"""
+    return _run_hashing(_hash_password_sync, password)
+
+def verify_password(password: str, stored) -> tuple:
+    """Проверка пароля: (совпал ли, нужно ли перехешировать текущими параметрами).
+    Для отсутствующего пользователя хеш всё равно считается, чтобы время ответа не выдавало логины"""
+    if not stored:
+        hash_password(password)
+        return False, False
+    return _run_hashing(_verify_password_sync, password, stored)
+# <<< shared/passwords.py
+
+def bump_cache_version(cursor, name: str) -> None:
+    """Сообщает функциям с кэшем процесса (owner-dashboard), что справочник изменился"""
+    cursor.execute("""
+        INSERT INTO t_p27119953_apartment_rental_mos.cache_versions (name, version, updated_at)
+        VALUES (%s, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE
+        SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (name,))
+
+# GET ?action=get_owners - список всех собственников
+@route('GET', 'get_owners')
+def get_owners(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
         cursor = conn.cursor()
         
-        # GET ?action=get_owners - список всех собственников
-        if method == 'GET' and action == 'get_owners':
-            cursor.execute("""
-                SELECT o.id, o.username, o.full_name, o.phone, o.telegram, 
-                       o.is_active, o.created_at,
-                       COUNT(obj.id) as objects_count
-                FROM owners o
-                LEFT JOIN objects obj ON o.id = obj.owner_id
-                GROUP BY o.id
-                ORDER BY o.created_at DESC
-            """)
-            rows = cursor.fetchall()
-            owners = []
-            for row in rows:
-                owners.append({
-                    'id': row[0],
-                    'username': row[1],
-                    'full_name': row[2],
-                    'phone': row[3],
-                    'telegram': row[4],
-                    'is_active': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None,
-                    'objects_count': row[7]
-                })
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'owners': owners})
-            }
+        cursor.execute("""
+            SELECT o.id, o.username, o.full_name, o.phone, o.telegram, 
+                   o.is_active, o.created_at,
+                   COUNT(obj.id) as objects_count
+            FROM owners o
+            LEFT JOIN objects obj ON o.id = obj.owner_id
+            GROUP BY o.id
+            ORDER BY o.created_at DESC
+        """)
+        owners = rows_payload(cursor_columns(cursor), cursor.fetchall())
+        cursor.close()
+        return json_response(200, {'owners': owners})
+
+# POST ?action=create_owner - создать собственника
+@route('POST', 'create_owner')
+def create_owner(event: dict, query_params: dict) -> dict:
+    data = json.loads(event.get('body', '{}'))
+    username = data.get('username', '').strip()
+    password = data.get('password', '').strip()
+    full_name = data.get('full_name', '').strip()
+    phone = data.get('phone', '').strip()
+    telegram = data.get('telegram', '').strip()
+    
+    if not username or not password or not full_name:
+        return json_response(400, {'error': 'username, password and full_name required'})
+    
+    # scrypt считается до взятия соединения, чтобы не держать его из пула на время хеширования
+    password_hash = hash_password(password)
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
         
-        # POST ?action=create_owner - создать собственника
-        if method == 'POST' and action == 'create_owner':
-            data = json.loads(event.get('body', '{}'))
-            username = data.get('username', '').strip()
-            password = data.get('password', '').strip()
-            full_name = data.get('full_name', '').strip()
-            phone = data.get('phone', '').strip()
-            telegram = data.get('telegram', '').strip()
-            
-            if not username or not password or not full_name:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'username, password and full_name required'})
-                }
-            
-            password_hash = hash_password(password)
-            
-            cursor.execute("""
-                INSERT INTO owners (username, password_hash, full_name, phone, telegram)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id, username, full_name, phone, telegram, is_active, created_at
-            """, (username, password_hash, full_name, phone, telegram))
-            
-            row = cursor.fetchone()
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'id': row[0],
-                    'username': row[1],
-                    'full_name': row[2],
-                    'phone': row[3],
-                    'telegram': row[4],
-                    'is_active': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None
-                })
-            }
+        cursor.execute("""
+            INSERT INTO owners (username, password_hash, full_name, phone, telegram)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id, username, full_name, phone, telegram, is_active, created_at
+        """, (username, password_hash, full_name, phone, telegram))
         
-        # PUT ?action=update_owner&id=X - обновить собственника
-        if method == 'PUT' and action == 'update_owner':
-            owner_id = query_params.get('id')
-            data = json.loads(event.get('body', '{}'))
-            
-            full_name = data.get('full_name')
-            phone = data.get('phone')
-            telegram = data.get('telegram')
-            is_active = data.get('is_active')
-            password = data.get('password')
-            
-            updates = []
-            params = []
-            
-            if full_name is not None:
-                updates.append('full_name = %s')
-                params.append(full_name)
-            if phone is not None:
-                updates.append('phone = %s')
-                params.append(phone)
-            if telegram is not None:
-                updates.append('telegram = %s')
-                params.append(telegram)
-            if is_active is not None:
-                updates.append('is_active = %s')
-                params.append(is_active)
-            if password:
-                updates.append('password_hash = %s')
-                params.append(hash_password(password))
-            
-            if not updates:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'No fields to update'})
-                }
-            
-            params.append(owner_id)
-            query = f"UPDATE owners SET {', '.join(updates)} WHERE id = %s RETURNING id, username, full_name, phone, telegram, is_active, created_at"
-            
-            cursor.execute(query, params)
-            row = cursor.fetchone()
-            
-            if not row:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Owner not found'})
-                }
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'id': row[0],
-                    'username': row[1],
-                    'full_name': row[2],
-                    'phone': row[3],
-                    'telegram': row[4],
-                    'is_active': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None
-                })
-            }
+        owner = dict(zip(cursor_columns(cursor), cursor.fetchone()))
+        conn.commit()
+        cursor.close()
         
-        # GET ?action=get_objects - все объекты
-        if method == 'GET' and action == 'get_objects':
-            cursor.execute("""
-                SELECT o.id, o.owner_id, o.category, o.name, o.address, o.metro,
-                       o.area, o.rooms, o.price_per_hour, o.min_hours,
-                       o.lat, o.lon, o.image_url, o.telegram_contact,
-                       o.is_published, o.created_at,
-                       ow.full_name as owner_name,
-                       COALESCE(s.views_count, 0) as views,
-                       COALESCE(s.telegram_clicks_count, 0) as clicks
-                FROM objects o
-                LEFT JOIN owners ow ON o.owner_id = ow.id
-                LEFT JOIN object_stats s ON o.id = s.object_id
-                ORDER BY o.created_at DESC
-            """)
-            rows = cursor.fetchall()
-            objects = []
-            for row in rows:
-                objects.append({
-                    'id': row[0],
-                    'owner_id': row[1],
-                    'category': row[2],
-                    'name': row[3],
-                    'address': row[4],
-                    'metro': row[5],
-                    'area': float(row[6]) if row[6] else None,
-                    'rooms': row[7],
-                    'price_per_hour': float(row[8]) if row[8] else None,
-                    'min_hours': row[9],
-                    'lat': float(row[10]) if row[10] else None,
-                    'lon': float(row[11]) if row[11] else None,
-                    'image_url': row[12],
-                    'telegram_contact': row[13],
-                    'is_published': row[14],
-                    'created_at': row[15].isoformat() if row[15] else None,
-                    'owner_name': row[16],
-                    'views': row[17],
-                    'clicks': row[18]
-                })
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'objects': objects})
-            }
+        return json_response(201, owner)
+
+# PUT ?action=update_owner&id=X - обновить собственника
+@route('PUT', 'update_owner')
+def update_owner(event: dict, query_params: dict) -> dict:
+    owner_id = query_params.get('id')
+    data = json.loads(event.get('body', '{}'))
+    
+    full_name = data.get('full_name')
+    phone = data.get('phone')
+    telegram = data.get('telegram')
+    is_active = data.get('is_active')
+    password = data.get('password')
+    
+    updates = []
+    params = []
+    
+    if full_name is not None:
+        updates.append('full_name = %s')
+        params.append(full_name)
+    if phone is not None:
+        updates.append('phone = %s')
+        params.append(phone)
+    if telegram is not None:
+        updates.append('telegram = %s')
+        params.append(telegram)
+    if is_active is not None:
+        updates.append('is_active = %s')
+        params.append(is_active)
+    if password:
+        # scrypt считается до взятия соединения, чтобы не держать его из пула на время хеширования
+        updates.append('password_hash = %s')
+        params.append(hash_password(password))
+    
+    if not updates:
+        return json_response(400, {'error': 'No fields to update'})
+    
+    params.append(owner_id)
+    query = f"UPDATE owners SET {', '.join(updates)} WHERE id = %s RETURNING id, username, full_name, phone, telegram, is_active, created_at"
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
         
-        # POST ?action=create_object - создать объект
-        if method == 'POST' and action == 'create_object':
-            data = json.loads(event.get('body', '{}'))
-            
-            cursor.execute("""
-                INSERT INTO objects (
-                    owner_id, category, name, address, metro, area, rooms,
-                    price_per_hour, min_hours, lat, lon, image_url, telegram_contact, is_published
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                data.get('owner_id'),
-                data.get('category'),
-                data.get('name'),
-                data.get('address'),
-                data.get('metro'),
-                data.get('area'),
-                data.get('rooms'),
-                data.get('price_per_hour'),
-                data.get('min_hours', 1),
-                data.get('lat'),
-                data.get('lon'),
-                data.get('image_url'),
-                data.get('telegram_contact'),
-                data.get('is_published', False)
-            ))
-            
-            object_id = cursor.fetchone()[0]
-            
-            # Создаём запись статистики
-            cursor.execute("""
-                INSERT INTO object_stats (object_id, views_count, telegram_clicks_count)
-                VALUES (%s, 0, 0)
-            """, (object_id,))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'id': object_id})
-            }
+        cursor.execute(query, params)
+        row = cursor.fetchone()
         
-        # PUT ?action=update_object&id=X - обновить объект
-        if method == 'PUT' and action == 'update_object':
-            object_id = query_params.get('id')
-            data = json.loads(event.get('body', '{}'))
-            
-            cursor.execute("""
-                UPDATE objects SET
-                    category = COALESCE(%s, category),
-                    name = COALESCE(%s, name),
-                    address = COALESCE(%s, address),
-                    metro = COALESCE(%s, metro),
-                    area = COALESCE(%s, area),
-                    rooms = COALESCE(%s, rooms),
-                    price_per_hour = COALESCE(%s, price_per_hour),
-                    min_hours = COALESCE(%s, min_hours),
-                    lat = COALESCE(%s, lat),
-                    lon = COALESCE(%s, lon),
-                    image_url = COALESCE(%s, image_url),
-                    telegram_contact = COALESCE(%s, telegram_contact),
-                    is_published = COALESCE(%s, is_published),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (
-                data.get('category'),
-                data.get('name'),
-                data.get('address'),
-                data.get('metro'),
-                data.get('area'),
-                data.get('rooms'),
-                data.get('price_per_hour'),
-                data.get('min_hours'),
-                data.get('lat'),
-                data.get('lon'),
-                data.get('image_url'),
-                data.get('telegram_contact'),
-                data.get('is_published'),
-                object_id
-            ))
-            
-            conn.commit()
+        if not row:
             cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True})
-            }
+            return json_response(404, {'error': 'Owner not found'})
         
-        # GET ?action=get_promotions - все акции
-        if method == 'GET' and action == 'get_promotions':
-            cursor.execute("""
-                SELECT id, title, description, valid_from, valid_until, is_active, created_at
-                FROM promotions
-                ORDER BY created_at DESC
-            """)
-            rows = cursor.fetchall()
-            promotions = []
-            for row in rows:
-                promotions.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'valid_from': row[3].isoformat() if row[3] else None,
-                    'valid_until': row[4].isoformat() if row[4] else None,
-                    'is_active': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None
-                })
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'promotions': promotions})
-            }
+        owner = dict(zip(cursor_columns(cursor), row))
+        conn.commit()
+        cursor.close()
         
-        # POST ?action=create_promotion - создать акцию
-        if method == 'POST' and action == 'create_promotion':
-            data = json.loads(event.get('body', '{}'))
-            
-            cursor.execute("""
-                INSERT INTO promotions (title, description, valid_from, valid_until, is_active)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                data.get('title'),
-                data.get('description'),
-                data.get('valid_from'),
-                data.get('valid_until'),
-                data.get('is_active', True)
-            ))
-            
-            promo_id = cursor.fetchone()[0]
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'id': promo_id})
-            }
+        return json_response(200, owner)
+
+# GET ?action=get_objects - все объекты
+@route('GET', 'get_objects')
+def get_objects(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
         
-        # PUT ?action=update_promotion&id=X - обновить акцию
-        if method == 'PUT' and action == 'update_promotion':
-            promo_id = query_params.get('id')
-            data = json.loads(event.get('body', '{}'))
-            
-            cursor.execute("""
-                UPDATE promotions SET
-                    title = COALESCE(%s, title),
-                    description = COALESCE(%s, description),
-                    valid_until = COALESCE(%s, valid_until),
-                    is_active = COALESCE(%s, is_active)
-                WHERE id = %s
-            """, (
-                data.get('title'),
-                data.get('description'),
-                data.get('valid_until'),
-                data.get('is_active'),
-                promo_id
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True})
-            }
+        cursor.execute("""
+            SELECT o.id, o.owner_id, o.category, o.name, o.address, o.metro,
+                   o.area, o.rooms, o.price_per_hour, o.min_hours,
+                   o.lat, o.lon, o.image_url, o.telegram_contact,
+                   o.is_published, o.created_at,
+                   ow.full_name as owner_name,
+                   COALESCE(s.views_count, 0) as views,
+                   COALESCE(s.telegram_clicks_count, 0) as clicks
+            FROM objects o
+            LEFT JOIN owners ow ON o.owner_id = ow.id
+            LEFT JOIN object_stats s ON o.id = s.object_id
+            ORDER BY o.created_at DESC
+        """)
+        objects = rows_payload(cursor_columns(cursor), cursor.fetchall())
+        cursor.close()
+        return json_response(200, {'objects': objects})
+
+# POST ?action=create_object - создать объект
+@route('POST', 'create_object')
+def create_object(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        data = json.loads(event.get('body', '{}'))
         
+        cursor.execute("""
+            INSERT INTO objects (
+                owner_id, category, name, address, metro, area, rooms,
+                price_per_hour, min_hours, lat, lon, image_url, telegram_contact, is_published
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            data.get('owner_id'),
+            data.get('category'),
+            data.get('name'),
+            data.get('address'),
+            data.get('metro'),
+            data.get('area'),
+            data.get('rooms'),
+            data.get('price_per_hour'),
+            data.get('min_hours', 1),
+            data.get('lat'),
+            data.get('lon'),
+            data.get('image_url'),
+            data.get('telegram_contact'),
+            data.get('is_published', False)
+        ))
+        
+        object_id = cursor.fetchone()[0]
+        
+        # Создаём запись статистики
+        cursor.execute("""
+            INSERT INTO object_stats (object_id, views_count, telegram_clicks_count)
+            VALUES (%s, 0, 0)
+            ON CONFLICT (object_id) DO NOTHING
+        """, (object_id,))
+        
+        conn.commit()
         cursor.close()
-        conn.close()
         
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Endpoint not found'})
-        }
+        return json_response(201, {'id': object_id})
+
+# PUT ?action=update_object&id=X - обновить объект
+@route('PUT', 'update_object')
+def update_object(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
         
+        object_id = query_params.get('id')
+        data = json.loads(event.get('body', '{}'))
+        
+        cursor.execute("""
+            UPDATE objects SET
+                category = COALESCE(%s, category),
+                name = COALESCE(%s, name),
+                address = COALESCE(%s, address),
+                metro = COALESCE(%s, metro),
+                area = COALESCE(%s, area),
+                rooms = COALESCE(%s, rooms),
+                price_per_hour = COALESCE(%s, price_per_hour),
+                min_hours = COALESCE(%s, min_hours),
+                lat = COALESCE(%s, lat),
+                lon = COALESCE(%s, lon),
+                image_url = COALESCE(%s, image_url),
+                telegram_contact = COALESCE(%s, telegram_contact),
+                is_published = COALESCE(%s, is_published),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (
+            data.get('category'),
+            data.get('name'),
+            data.get('address'),
+            data.get('metro'),
+            data.get('area'),
+            data.get('rooms'),
+            data.get('price_per_hour'),
+            data.get('min_hours'),
+            data.get('lat'),
+            data.get('lon'),
+            data.get('image_url'),
+            data.get('telegram_contact'),
+            data.get('is_published'),
+            object_id
+        ))
+        
+        conn.commit()
+        cursor.close()
+        
+        return json_response(200, {'success': True})
+
+# GET ?action=get_promotions - все акции
+@route('GET', 'get_promotions')
+def get_promotions(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, title, description, valid_from, valid_until, is_active, created_at
+            FROM promotions
+            ORDER BY created_at DESC
+        """)
+        promotions = rows_payload(cursor_columns(cursor), cursor.fetchall())
+        cursor.close()
+        return json_response(200, {'promotions': promotions})
+
+# POST ?action=create_promotion - создать акцию
+@route('POST', 'create_promotion')
+def create_promotion(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        data = json.loads(event.get('body', '{}'))
+        
+        cursor.execute("""
+            INSERT INTO promotions (title, description, valid_from, valid_until, is_active)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            data.get('title'),
+            data.get('description'),
+            data.get('valid_from'),
+            data.get('valid_until'),
+            data.get('is_active', True)
+        ))
+        
+        promo_id = cursor.fetchone()[0]
+        bump_cache_version(cursor, 'promotions')
+        conn.commit()
+        cursor.close()
+        
+        return json_response(201, {'id': promo_id})
+
+# PUT ?action=update_promotion&id=X - обновить акцию
+@route('PUT', 'update_promotion')
+def update_promotion(event: dict, query_params: dict) -> dict:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        promo_id = query_params.get('id')
+        data = json.loads(event.get('body', '{}'))
+        
+        cursor.execute("""
+            UPDATE promotions SET
+                title = COALESCE(%s, title),
+                description = COALESCE(%s, description),
+                valid_until = COALESCE(%s, valid_until),
+                is_active = COALESCE(%s, is_active)
+            WHERE id = %s
+        """, (
+            data.get('title'),
+            data.get('description'),
+            data.get('valid_until'),
+            data.get('is_active'),
+            promo_id
+        ))
+        bump_cache_version(cursor, 'promotions')
+        
+        conn.commit()
+        cursor.close()
+        
+        return json_response(200, {'success': True})
+
+def handler(event: dict, context) -> dict:
+    """API для управления всеми данными платформы (только для админа)"""
+    try:
+        return dispatch(event)
+    except PasswordHasherBusy:
+        return json_response(503, {'error': 'Password hashing is busy, retry later'}, {'Retry-After': '1'})
     except Exception as e:
         print(f'Error in admin API: {str(e)}')
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
\ No newline at end of file
+        return json_response(500, {'error': 'Internal server error', 'details': str(e)})
\ No newline at end of file
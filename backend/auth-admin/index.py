@@ -1,7 +1,244 @@
+import base64
+import hashlib
+import hmac
 import json
+import math
 import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# >>> shared/passwords.py - не править здесь, см. scripts/sync_shared.py
+# Пароли хешируются scrypt; стоимость настраивается без миграции, т.к. параметры хранятся в самом хеше.
+# Хеширование идёт в ограниченном пуле потоков: всплеск логинов не отнимает весь CPU у остальных запросов
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '2'))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', '2'))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование переполнена - клиенту стоит повторить позже"""
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+def _run_hashing(func, *args):
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise PasswordHasherBusy()
+    try:
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _hash_password_sync(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return '$'.join((
+        'scrypt', str(PASSWORD_SCRYPT_N), str(PASSWORD_SCRYPT_R), str(PASSWORD_SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ))
+
+def _verify_password_sync(password: str, stored: str) -> tuple:
+    if stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+        return ok, ok and (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    # Старый формат: SHA-256 без соли; при успешном входе хеш сразу заменяется на scrypt
+    ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    return ok, ok
+
+def hash_password(password: str) -> str:
+    """Хеширование пароля scrypt со случайной солью"""
+    return _run_hashing(_hash_password_sync, password)
+
+def verify_password(password: str, stored) -> tuple:
+    """Проверка пароля: (совпал ли, нужно ли перехешировать текущими параметрами).
+    Для отсутствующего пользователя хеш всё равно считается, чтобы время ответа не выдавало логины"""
+    if not stored:
+        hash_password(password)
+        return False, False
+    return _run_hashing(_verify_password_sync, password, stored)
+# <<< shared/passwords.py
+
+# Ограничение попыток входа: token bucket на логин и на IP источника.
+# Проверяется до запроса к БД и хеширования пароля; состояние - LRU в памяти или общий Redis (RATE_LIMIT_REDIS_URL)
+RATE_LIMIT_PREFIX = 'auth-admin'
+
+# >>> shared/login_limits.py - не править здесь, см. scripts/sync_shared.py
+LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', '5'))
+LOGIN_RATE_USER_PER_MIN = float(os.environ.get('LOGIN_RATE_USER_PER_MIN', '5'))
+LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', '20'))
+LOGIN_RATE_IP_PER_MIN = float(os.environ.get('LOGIN_RATE_IP_PER_MIN', '30'))
+LOGIN_RATE_MAX_KEYS = int(os.environ.get('LOGIN_RATE_MAX_KEYS', '10000'))
+
+rate_limit_stats = {'allowed': 0, 'limited': 0, 'evictions': 0}
+
+class LocalBuckets:
+    """Token bucket в памяти процесса: на ключ хранятся только остаток токенов и время обновления"""
+    
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Списывает токен; возвращает 0 или через сколько секунд появится следующий"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                rate_limit_stats['evictions'] += 1
+        return retry_after
+
+class RedisBuckets:
+    """Общие для всех экземпляров бакеты; списание атомарно в Lua-скрипте"""
+    
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        local retry_after = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            retry_after = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(retry_after)
+    """
+    
+    def __init__(self, client):
+        self.script = client.register_script(self.SCRIPT)
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(self.script(keys=[key], args=[capacity, rate, time.time()]))
+
+def create_buckets():
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisBuckets(redis.Redis.from_url(redis_url))
+    return LocalBuckets(LOGIN_RATE_MAX_KEYS)
+
+login_buckets = create_buckets()
+
+def source_ip(event: dict) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    headers = event.get('headers') or {}
+    forwarded = next((v for k, v in headers.items() if k.lower() == 'x-forwarded-for'), None) or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+def login_retry_after(event: dict, username: str) -> float:
+    """0, если попытку входа можно обрабатывать, иначе сколько секунд ждать"""
+    retry_after = login_buckets.take(
+        f'{RATE_LIMIT_PREFIX}:ip:{source_ip(event)}', LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MIN / 60
+    )
+    if not retry_after:
+        retry_after = login_buckets.take(
+            f'{RATE_LIMIT_PREFIX}:user:{username.lower()}', LOGIN_RATE_USER_BURST, LOGIN_RATE_USER_PER_MIN / 60
+        )
+    rate_limit_stats['limited' if retry_after else 'allowed'] += 1
+    return retry_after
+# <<< shared/login_limits.py
 
 def handler(event: dict, context) -> dict:
     '''API для авторизации администраторов'''
@@ -42,6 +279,21 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
+        # Лимит попыток проверяем до обращения к БД и хеширования пароля
+        retry_after = login_retry_after(event, username)
+        if retry_after:
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'Retry-After',
+                    'Retry-After': str(math.ceil(retry_after))
+                },
+                'body': json.dumps({'error': 'Too many login attempts, retry later'}),
+                'isBase64Encoded': False
+            }
+        
         dsn = os.environ.get('DATABASE_URL')
         if not dsn:
             return {
@@ -51,19 +303,29 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        # Хеш читаем коротким запросом: соединение возвращается в пул до проверки scrypt
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "SELECT id, username, full_name, password_hash FROM admins WHERE username = %s",
+                    (username,)
+                )
+                admin = cur.fetchone()
         
-        cur.execute(
-            "SELECT id, username, full_name FROM admins WHERE username = %s AND password = %s",
-            (username, password)
-        )
+        password_ok, needs_rehash = verify_password(password, admin['password_hash'] if admin else None)
         
-        admin = cur.fetchone()
-        cur.close()
-        conn.close()
+        # Новый хеш считается до взятия соединения; пароль, сменённый за это время, не перезаписываем
+        if password_ok and needs_rehash:
+            new_hash = hash_password(password)
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE admins SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                        (new_hash, admin['id'], admin['password_hash'])
+                    )
+                conn.commit()
         
-        if admin:
+        if password_ok:
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -85,6 +347,13 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
     
+    except PasswordHasherBusy:
+        return {
+            'statusCode': 503,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+            'body': json.dumps({'error': 'Too many login attempts, retry later'}),
+            'isBase64Encoded': False
+        }
     except Exception as e:
         return {
             'statusCode': 500,
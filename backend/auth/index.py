@@ -1,18 +1,345 @@
 """API для авторизации собственников в личном кабинете"""
+import base64
+import hmac
 import json
+import math
 import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 import hashlib
 import secrets
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# >>> shared/tokens.py - не править здесь, см. scripts/sync_shared.py
+# Подписанные токены сессии проверяются локально по HMAC, без запроса к БД.
+# AUTH_SIGNING_KEYS="kid2:secret2,kid1:secret1": первым ключом подписываются новые токены,
+# остальные ещё принимаются при проверке, пока не истекут выданные ими токены
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(12 * 3600)))
+REVOCATION_REFRESH = float(os.environ.get('AUTH_REVOCATION_REFRESH', '30'))
+
+def load_signing_keys() -> list:
+    keys = []
+    for item in os.environ.get('AUTH_SIGNING_KEYS', '').split(','):
+        kid, sep, secret = item.strip().partition(':')
+        if sep and kid and secret:
+            keys.append((kid, secret.encode()))
+    return keys
+
+SIGNING_KEYS = load_signing_keys()
+if not SIGNING_KEYS:
+    # Без ключей токены не выдаются и не принимаются: вход отвечает 503, кабинет - 401
+    print('AUTH_SIGNING_KEYS is not configured: owner tokens can be neither signed nor verified')
+
+# Отозванные до срока токены (выход из кабинета) держим в памяти и перечитываем не чаще REVOCATION_REFRESH
+_revoked = {'jtis': frozenset(), 'loaded_at': None}
+_revoked_lock = threading.Lock()
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def _token_signature(secret: bytes, signed_part: str) -> str:
+    return _b64encode(hmac.new(secret, signed_part.encode(), hashlib.sha256).digest())
+
+def refresh_revoked(force: bool = False) -> frozenset:
+    now = time.monotonic()
+    loaded_at = _revoked['loaded_at']
+    if not force and loaded_at is not None and now - loaded_at < REVOCATION_REFRESH:
+        return _revoked['jtis']
+    with _revoked_lock:
+        if not force and _revoked['loaded_at'] is not None and now - _revoked['loaded_at'] < REVOCATION_REFRESH:
+            return _revoked['jtis']
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT jti FROM t_p27119953_apartment_rental_mos.revoked_tokens
+                        WHERE expires_at > CURRENT_TIMESTAMP
+                    """)
+                    _revoked['jtis'] = frozenset(row[0] for row in cur.fetchall())
+        except psycopg2.Error as e:
+            # Оставляем прежний список, чтобы сбой БД не блокировал проверку; повторим позже
+            print(f'Revocation list refresh failed: {str(e)}')
+        _revoked['loaded_at'] = now
+    return _revoked['jtis']
+
+def verify_token(token: str):
+    """Claims токена или None, если подпись, срок действия или отзыв не проходят проверку"""
+    parts = (token or '').split('.')
+    if len(parts) != 3:
+        return None
+    kid, payload, signature = parts
+    secret = next((secret for key_id, secret in SIGNING_KEYS if key_id == kid), None)
+    if secret is None or not hmac.compare_digest(signature, _token_signature(secret, f'{kid}.{payload}')):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) <= time.time():
+        return None
+    if claims.get('jti') in refresh_revoked():
+        return None
+    return claims
+
+def request_token(event: dict) -> str:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'x-authorization'), None) or ''
+    return value.removeprefix('Bearer ').strip()
+# <<< shared/tokens.py
+
+def sign_token(owner_id: int) -> tuple:
+    """Новый токен собственника, подписанный текущим ключом; возвращает токен и его claims"""
+    if not SIGNING_KEYS:
+        raise RuntimeError('AUTH_SIGNING_KEYS is not configured')
+    kid, secret = SIGNING_KEYS[0]
+    now = int(time.time())
+    claims = {'sub': owner_id, 'role': 'owner', 'iat': now, 'exp': now + AUTH_TOKEN_TTL, 'jti': secrets.token_urlsafe(16)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f'{kid}.{payload}.{_token_signature(secret, f"{kid}.{payload}")}', claims
+
+def revoke_token(conn, claims: dict) -> None:
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO t_p27119953_apartment_rental_mos.revoked_tokens (jti, owner_id, expires_at)
+            VALUES (%s, %s, to_timestamp(%s) AT TIME ZONE 'UTC')
+            ON CONFLICT (jti) DO NOTHING
+        """, (claims['jti'], claims['sub'], claims['exp']))
+    conn.commit()
+    with _revoked_lock:
+        _revoked['jtis'] = _revoked['jtis'] | {claims['jti']}
+
+# >>> shared/passwords.py - не править здесь, см. scripts/sync_shared.py
+# Пароли хешируются scrypt; стоимость настраивается без миграции, т.к. параметры хранятся в самом хеше.
+# Хеширование идёт в ограниченном пуле потоков: всплеск логинов не отнимает весь CPU у остальных запросов
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '2'))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', '2'))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование переполнена - клиенту стоит повторить позже"""
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+def _run_hashing(func, *args):
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise PasswordHasherBusy()
+    try:
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _hash_password_sync(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return '$'.join((
+        'scrypt', str(PASSWORD_SCRYPT_N), str(PASSWORD_SCRYPT_R), str(PASSWORD_SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ))
+
+def _verify_password_sync(password: str, stored: str) -> tuple:
+    if stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+        return ok, ok and (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    # Старый формат: SHA-256 без соли; при успешном входе хеш сразу заменяется на scrypt
+    ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    return ok, ok
 
 def hash_password(password: str) -> str:
-    """Хеширование пароля с солью"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Хеширование пароля scrypt со случайной солью"""
+    return _run_hashing(_hash_password_sync, password)
 
-def generate_token() -> str:
-    """Генерация токена сессии"""
-    return secrets.token_urlsafe(32)
+def verify_password(password: str, stored) -> tuple:
+    """Проверка пароля: (совпал ли, нужно ли перехешировать текущими параметрами).
+    Для отсутствующего пользователя хеш всё равно считается, чтобы время ответа не выдавало логины"""
+    if not stored:
+        hash_password(password)
+        return False, False
+    return _run_hashing(_verify_password_sync, password, stored)
+# <<< shared/passwords.py
+
+# Ограничение попыток входа: token bucket на логин и на IP источника.
+# Проверяется до запроса к БД и хеширования пароля; состояние - LRU в памяти или общий Redis (RATE_LIMIT_REDIS_URL)
+RATE_LIMIT_PREFIX = 'auth'
+
+# >>> shared/login_limits.py - не править здесь, см. scripts/sync_shared.py
+LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', '5'))
+LOGIN_RATE_USER_PER_MIN = float(os.environ.get('LOGIN_RATE_USER_PER_MIN', '5'))
+LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', '20'))
+LOGIN_RATE_IP_PER_MIN = float(os.environ.get('LOGIN_RATE_IP_PER_MIN', '30'))
+LOGIN_RATE_MAX_KEYS = int(os.environ.get('LOGIN_RATE_MAX_KEYS', '10000'))
+
+rate_limit_stats = {'allowed': 0, 'limited': 0, 'evictions': 0}
+
+class LocalBuckets:
+    """Token bucket в памяти процесса: на ключ хранятся только остаток токенов и время обновления"""
+    
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Списывает токен; возвращает 0 или через сколько секунд появится следующий"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                rate_limit_stats['evictions'] += 1
+        return retry_after
+
+class RedisBuckets:
+    """Общие для всех экземпляров бакеты; списание атомарно в Lua-скрипте"""
+    
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        local retry_after = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            retry_after = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(retry_after)
+    """
+    
+    def __init__(self, client):
+        self.script = client.register_script(self.SCRIPT)
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(self.script(keys=[key], args=[capacity, rate, time.time()]))
+
+def create_buckets():
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisBuckets(redis.Redis.from_url(redis_url))
+    return LocalBuckets(LOGIN_RATE_MAX_KEYS)
+
+login_buckets = create_buckets()
+
+def source_ip(event: dict) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    headers = event.get('headers') or {}
+    forwarded = next((v for k, v in headers.items() if k.lower() == 'x-forwarded-for'), None) or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+def login_retry_after(event: dict, username: str) -> float:
+    """0, если попытку входа можно обрабатывать, иначе сколько секунд ждать"""
+    retry_after = login_buckets.take(
+        f'{RATE_LIMIT_PREFIX}:ip:{source_ip(event)}', LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MIN / 60
+    )
+    if not retry_after:
+        retry_after = login_buckets.take(
+            f'{RATE_LIMIT_PREFIX}:user:{username.lower()}', LOGIN_RATE_USER_BURST, LOGIN_RATE_USER_PER_MIN / 60
+        )
+    rate_limit_stats['limited' if retry_after else 'allowed'] += 1
+    return retry_after
+# <<< shared/login_limits.py
 
 def handler(event: dict, context) -> dict:
     """API для авторизации и управления сессиями собственников"""
@@ -38,6 +365,25 @@ def handler(event: dict, context) -> dict:
         }
     
     try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        # POST ?action=logout - отзыв токена до истечения срока
+        if query_params.get('action') == 'logout':
+            claims = verify_token(request_token(event))
+            if not claims:
+                return {
+                    'statusCode': 401,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Invalid token'})
+                }
+            with db_connection() as conn:
+                revoke_token(conn, claims)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'success': True})
+            }
+        
         data = json.loads(event.get('body', '{}'))
         username = data.get('username', '').strip()
         password = data.get('password', '').strip()
@@ -49,46 +395,71 @@ def handler(event: dict, context) -> dict:
                 'body': json.dumps({'error': 'Username and password required'})
             }
         
-        # Подключение к БД
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
-        cursor = conn.cursor()
+        # Без ключа подписи токен не выдать: отвечаем сразу, не тратя scrypt и запросы к БД
+        if not SIGNING_KEYS:
+            return {
+                'statusCode': 503,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Login is temporarily unavailable'})
+            }
         
-        # Проверка учетных данных
-        password_hash = hash_password(password)
-        cursor.execute("""
-            SELECT id, full_name, is_active 
-            FROM owners 
-            WHERE username = %s AND password_hash = %s
-        """, (username, password_hash))
+        # Лимит попыток проверяем до обращения к БД и хеширования пароля
+        retry_after = login_retry_after(event, username)
+        if retry_after:
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'Retry-After',
+                    'Retry-After': str(math.ceil(retry_after))
+                },
+                'body': json.dumps({'error': 'Too many login attempts, retry later'})
+            }
+        
+        # Хеш читаем коротким запросом: соединение возвращается в пул до проверки scrypt
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, full_name, is_active, password_hash
+                    FROM owners 
+                    WHERE username = %s
+                """, (username,))
+                result = cursor.fetchone()
         
-        result = cursor.fetchone()
+        # Проверка учетных данных: хеш сверяется в пуле хеширования без занятого соединения
+        password_ok, needs_rehash = verify_password(password, result[3] if result else None)
         
-        if not result:
-            cursor.close()
-            conn.close()
+        if not password_ok:
             return {
                 'statusCode': 401,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'body': json.dumps({'error': 'Invalid credentials'})
             }
         
-        owner_id, full_name, is_active = result
+        owner_id, full_name, is_active, stored_hash = result
+        
+        # Устаревший хеш (SHA-256 или старые параметры scrypt) заменяем, пока пароль известен.
+        # Новый хеш считается до взятия соединения; пароль, сменённый за это время, не перезаписываем
+        if needs_rehash:
+            new_hash = hash_password(password)
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE owners SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                        (new_hash, owner_id, stored_hash)
+                    )
+                conn.commit()
         
         if not is_active:
-            cursor.close()
-            conn.close()
             return {
                 'statusCode': 403,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'body': json.dumps({'error': 'Account is disabled'})
             }
         
-        # Генерация токена
-        token = generate_token()
-        
-        cursor.close()
-        conn.close()
+        # Подписанный токен: другие функции проверяют его без запроса к БД
+        token, claims = sign_token(owner_id)
         
         return {
             'statusCode': 200,
@@ -99,10 +470,17 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({
                 'token': token,
                 'owner_id': owner_id,
-                'full_name': full_name
+                'full_name': full_name,
+                'expires_at': claims['exp']
             })
         }
         
+    except PasswordHasherBusy:
+        return {
+            'statusCode': 503,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+            'body': json.dumps({'error': 'Too many login attempts, retry later'})
+        }
     except Exception as e:
         print(f'Error in auth: {str(e)}')
         return {
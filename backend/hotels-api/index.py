@@ -1,159 +1,849 @@
 """API для управления отелями и номерами"""
+import gzip
 import json
+import math
 import os
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from datetime import date, datetime
+from decimal import Decimal
 
-def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
 
-def handler(event: dict, context) -> dict:
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# Маршрутизация: таблица (method, ROUTE_PARAMS...) -> обработчик собирается один раз при импорте модуля.
+# Все ответы собираются в json_response с общими заголовками - одно место для сериализации и заголовков
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'
+}
+ROUTE_PARAMS = (('entity', 'hotels'), ('action', None))
+
+def route_not_found(method: str, query: dict) -> dict:
+    return json_response(404, {'error': 'Not found', 'entity': query.get('entity', 'hotels'), 'method': method})
+
+# >>> shared/http.py - не править здесь, см. scripts/sync_shared.py
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+ROUTES = {}
+
+def route(method: str, *values):
+    """Регистрирует обработчик для метода и значений параметров ROUTE_PARAMS"""
+    def register(func):
+        ROUTES[(method,) + values] = func
+        return func
+    return register
+
+# Быстрая сериализация: orjson, если он установлен, иначе stdlib json.
+# NUMERIC приходит из драйвера сразу float, datetime/date кодируются по типу без цепочки isinstance
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_AS_FLOAT',
+    lambda value, cur: float(value) if value is not None else None
+))
+
+_JSON_ENCODERS = {Decimal: float, datetime: datetime.isoformat, date: date.isoformat}
+
+def _json_default(value):
+    encoder = _JSON_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return encoder(value)
+
+def dumps(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default).decode()
+    return json.dumps(payload, default=_json_default)
+
+def cursor_columns(cursor) -> list:
+    return [column.name for column in cursor.description]
+
+def rows_payload(columns: list, rows: list) -> list:
+    """Кортежи строк обычного курсора в объекты по именам колонок; в JSON их переводит только dumps"""
+    return [dict(zip(columns, row)) for row in rows]
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+# Сжатие ответов по Accept-Encoding: brotli (если установлен) или gzip, только для тел больше порога.
+# compression_stats по маршрутам помогают подобрать порог и уровни сжатия
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compression_stats = {}
+
+def accepted_encodings(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), None) or ''
+    encodings = set()
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=') if params.strip().startswith('q=') else '1'
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            continue
+    return encodings
+
+def compress_response(event: dict, response: dict, endpoint: str) -> dict:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or 'Content-Encoding' in response['headers']:
+        return response
+    
+    stats = compression_stats.setdefault(endpoint, {
+        'responses': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0
+    })
+    stats['responses'] += 1
+    raw = body.encode()
+    encodings = accepted_encodings(event)
+    if len(raw) < COMPRESS_MIN_SIZE or not encodings:
+        return response
+    
+    started = time.thread_time()
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings or '*' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    stats['cpu_ms'] += (time.thread_time() - started) * 1000
+    stats['compressed'] += 1
+    stats['bytes_in'] += len(raw)
+    stats['bytes_out'] += len(compressed)
+    
+    headers = {**response['headers'], 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+    # Сжатое тело по байтам не совпадает с несжатым, поэтому сильный ETag ослабляется (W/).
+    # If-None-Match сравнивается без W/, так что 304 получают клиенты с любым из вариантов
+    if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+        headers['ETag'] = 'W/' + headers['ETag']
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+def dispatch(event: dict) -> dict:
+    """Выбор обработчика по таблице маршрутов за один поиск в словаре"""
     method = event.get('httpMethod', 'GET')
+    if method == 'OPTIONS':
+        return {'statusCode': 200, 'headers': dict(PREFLIGHT_HEADERS), 'body': '', 'isBase64Encoded': False}
+    
     query = event.get('queryStringParameters') or {}
-    entity = query.get('entity', 'hotels')
-    entity_id = query.get('id')
-    action = query.get('action')
+    key = (method,) + tuple(query.get(name, default) for name, default in ROUTE_PARAMS)
+    route_handler = ROUTES.get(key)
+    if route_handler is None:
+        return route_not_found(method, query)
+    return compress_response(event, route_handler(event, query), ' '.join(str(part) for part in key if part))
+# <<< shared/http.py
+
+# Кеш ответов публичного каталога: LRU в памяти процесса или общий Redis (CACHE_REDIS_URL)
+CACHE_PREFIX = 'hotels-api'
+
+# >>> shared/cache.py - не править здесь, см. scripts/sync_shared.py
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '60'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+class LocalCache:
+    """LRU-кеш с TTL в памяти процесса"""
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
     
-    try:
-        conn = get_db_connection()
-        
-        # GET ?entity=hotels - получить все отели
-        if method == 'GET' and entity == 'hotels' and not entity_id:
-            return get_hotels(conn)
-        
-        # GET ?entity=hotels&id=123 - получить отель по ID
-        elif method == 'GET' and entity == 'hotels' and entity_id:
-            return get_hotel(conn, entity_id)
-        
-        # POST ?entity=hotels - создать отель
-        elif method == 'POST' and entity == 'hotels':
-            body = json.loads(event.get('body', '{}'))
-            return create_hotel(conn, body)
-        
-        # PUT ?entity=hotels&id=123 - обновить отель
-        elif method == 'PUT' and entity == 'hotels' and entity_id:
-            body = json.loads(event.get('body', '{}'))
-            return update_hotel(conn, entity_id, body)
-        
-        # PUT ?entity=hotels&id=123&action=publish - опубликовать/снять с публикации
-        elif method == 'PUT' and entity == 'hotels' and entity_id and action == 'publish':
-            body = json.loads(event.get('body', '{}'))
-            return toggle_hotel_publish(conn, entity_id, body.get('is_published'))
-        
-        # PUT ?entity=hotels&id=123&action=archive - архивировать/разархивировать
-        elif method == 'PUT' and entity == 'hotels' and entity_id and action == 'archive':
-            body = json.loads(event.get('body', '{}'))
-            return toggle_hotel_archive(conn, entity_id, body.get('is_archived'))
-        
-        # GET ?entity=rooms&id=123 - получить номер по ID
-        elif method == 'GET' and entity == 'rooms' and entity_id:
-            return get_room(conn, entity_id)
-        
-        # POST ?entity=rooms - создать номер
-        elif method == 'POST' and entity == 'rooms':
-            body = json.loads(event.get('body', '{}'))
-            return create_room(conn, body)
-        
-        # PUT ?entity=rooms&id=123 - обновить номер
-        elif method == 'PUT' and entity == 'rooms' and entity_id:
-            body = json.loads(event.get('body', '{}'))
-            return update_room(conn, entity_id, body)
-        
-        # PUT ?entity=rooms&id=123&action=publish - опубликовать/снять с публикации
-        elif method == 'PUT' and entity == 'rooms' and entity_id and action == 'publish':
-            body = json.loads(event.get('body', '{}'))
-            return toggle_room_publish(conn, entity_id, body.get('is_published'))
-        
-        # PUT ?entity=rooms&id=123&action=archive - архивировать/разархивировать
-        elif method == 'PUT' and entity == 'rooms' and entity_id and action == 'archive':
-            body = json.loads(event.get('body', '{}'))
-            return toggle_room_archive(conn, entity_id, body.get('is_archived'))
-        
-        # DELETE ?entity=rooms&id=123 - удалить номер
-        elif method == 'DELETE' and entity == 'rooms' and entity_id:
-            return delete_room(conn, entity_id)
-        
-        # GET ?entity=owners - получить всех владельцев
-        elif method == 'GET' and entity == 'owners':
-            return get_owners(conn)
-        
-        # POST ?entity=owners - создать владельца
-        elif method == 'POST' and entity == 'owners':
-            body = json.loads(event.get('body', '{}'))
-            return create_owner(conn, body)
-        
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                cache_stats['evictions'] += 1
+
+class RedisCache:
+    """Общий кеш для всех функций; принимает готовый клиент (в тестах подходит fakeredis)"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def get(self, key: str):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        self.client.set(key, json.dumps(value), ex=max(int(ttl), 1))
+
+def create_cache():
+    redis_url = os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisCache(redis.Redis.from_url(redis_url))
+    return LocalCache(CACHE_MAX_ENTRIES)
+
+cache = create_cache()
+
+def normalize_params(params: dict) -> str:
+    return '&'.join(f'{k}={params[k]}' for k in sorted(params) if params[k] not in (None, ''))
+
+def cached_response(namespace: str, params: dict, build) -> dict:
+    """Read-through: ответ из кеша по нормализованным параметрам запроса или build().
+    Версия данных приходит в params (_version), поэтому после записи в БД кеш сбрасывать не нужно"""
+    key = f'{CACHE_PREFIX}:{namespace}:{normalize_params(params)}'
+    
+    response = cache.get(key)
+    if response is not None:
+        cache_stats['hits'] += 1
+        return {**response, 'headers': {**response['headers'], 'X-Cache': 'HIT'}}
+    
+    cache_stats['misses'] += 1
+    response = build()
+    if response['statusCode'] == 200:
+        cache.set(key, response, CACHE_TTL)
+    return {**response, 'headers': {**response['headers'], 'X-Cache': 'MISS'}}
+# <<< shared/cache.py
+
+def run_with_connection(func, *args) -> dict:
+    with db_connection() as conn:
+        return func(conn, *args)
+
+# >>> shared/catalog.py - не править здесь, см. scripts/sync_shared.py
+# Условные GET: ETag строится по дешёвому признаку версии данных, а не по телу ответа
+def get_catalog_version(conn, property_id=None, property_type=None) -> str:
+    """Версия одного объекта, объектов одного типа или всего каталога из счётчиков, которые ведут триггеры V0021/V0025.
+    Счётчики типов только растут, поэтому их сумма меняется при любой записи в каталог"""
+    with conn.cursor() as cur:
+        if property_id is not None:
+            cur.execute('''
+                SELECT version FROM t_p27119953_apartment_rental_mos.catalog_versions WHERE property_id = %s::int
+            ''', (property_id,))
+        elif property_type:
+            cur.execute('''
+                SELECT version FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name = 'catalog:' || %s
+            ''', (property_type,))
         else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Not found', 'entity': entity, 'method': method}),
-                'isBase64Encoded': False
-            }
-            
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
-    finally:
-        if 'conn' in locals():
-            conn.close()
+            cur.execute('''
+                SELECT sum(version) FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name LIKE 'catalog:%'
+            ''')
+        row = cur.fetchone()
+    return str(row[0]) if row and row[0] is not None else '0'
+
+def make_etag(version: str, params: dict) -> str:
+    return '"' + hashlib.sha1(f'{version}#{normalize_params(params)}'.encode()).hexdigest() + '"'
+
+def request_etags(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'if-none-match'), None) or ''
+    return {tag.strip() for tag in value.split(',') if tag.strip()}
+
+def not_modified(etag: str) -> dict:
+    return {
+        'statusCode': 304,
+        'headers': {'ETag': etag, 'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'ETag'},
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+def conditional_get(event: dict, property_id, namespace: str, params: dict, build, property_type=None) -> dict:
+    """304 без тела, если версия не менялась; иначе ответ из кеша с ETag"""
+    with db_connection() as conn:
+        etag = make_etag(get_catalog_version(conn, property_id, property_type), params)
+    client_etags = request_etags(event)
+    if 'W/' + etag in client_etags:
+        # Клиент получил тело сжатым (compress_response ослабляет ETag): 304 повторяет тот же W/-вариант
+        return not_modified('W/' + etag)
+    if etag in client_etags or '*' in client_etags:
+        return not_modified(etag)
+    
+    # Версия входит в ключ кеша, поэтому кеш не отдаёт тело, не совпадающее с ETag
+    response = cached_response(namespace, {**params, '_version': etag}, build)
+    if response['statusCode'] != 200:
+        return response
+    headers = {**response['headers'], 'ETag': etag, 'Access-Control-Expose-Headers': 'X-Next-Cursor, ETag'}
+    return {**response, 'headers': headers}
+
+# Постраничная выдача каталога: курсор по (created_at, id), размер страницы ограничен
+CATALOG_PAGE_SIZE = 50
+CATALOG_PAGE_SIZE_MAX = 100
+CATALOG_QUERY_MAX_LENGTH = 200
+# ?near_metro=Белорусская&walk_minutes=5 отвечает по предрасчитанной таблице listing_metro
+METRO_WALK_MINUTES_DEFAULT = 10
+METRO_WALK_MINUTES_MAX = 30
+
+def encode_cursor(row: dict) -> str:
+    """Курсор следующей страницы из последней строки текущей; created_at может быть NULL"""
+    created_at = row['created_at'].isoformat() if row['created_at'] is not None else None
+    raw = json.dumps([created_at, row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id)
+
+def build_catalog_filters(query_params: dict, room_condition: str = 'TRUE') -> tuple:
+    """Условия WHERE и параметры для фильтров каталога; ValueError при неверных значениях"""
+    conditions = []
+    params = []
+    
+    if query_params.get('type'):
+        conditions.append('p.type = %s')
+        params.append(query_params['type'])
+    if query_params.get('status'):
+        conditions.append('p.status = %s')
+        params.append(query_params['status'])
+    if query_params.get('metro'):
+        conditions.append('lower(p.metro) = lower(%s)')
+        params.append(query_params['metro'].strip())
+    if query_params.get('near_metro'):
+        walk_minutes = int(query_params.get('walk_minutes') or METRO_WALK_MINUTES_DEFAULT)
+        if not 1 <= walk_minutes <= METRO_WALK_MINUTES_MAX:
+            raise ValueError('walk_minutes out of range')
+        conditions.append('''p.id IN (
+            SELECT lm.listing_id
+            FROM t_p27119953_apartment_rental_mos.listing_metro lm
+            JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+            WHERE lm.source = 'property' AND lower(s.name) = lower(%s) AND lm.walk_minutes <= %s
+        )''')
+        params.extend([query_params['near_metro'].strip(), walk_minutes])
+    if query_params.get('q'):
+        # Подстрока названия, метро или адреса: search_text в нижнем регистре, LIKE идёт по триграммному GIN
+        pattern = ' '.join(query_params['q'].split()).lower()
+        if len(pattern) > CATALOG_QUERY_MAX_LENGTH:
+            raise ValueError('q too long')
+        pattern = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append('p.search_text LIKE %s')
+        params.append(f'%{pattern}%')
+    if query_params.get('price_min'):
+        conditions.append('p.price >= %s')
+        params.append(float(query_params['price_min']))
+    if query_params.get('price_max'):
+        conditions.append('p.price <= %s')
+        params.append(float(query_params['price_max']))
+    if query_params.get('capacity'):
+        conditions.append(f'''EXISTS (
+            SELECT 1 FROM t_p27119953_apartment_rental_mos.property_rooms pr
+            WHERE pr.property_id = p.id AND pr.capacity >= %s AND {room_condition}
+        )''')
+        params.append(int(query_params['capacity']))
+    if query_params.get('cursor'):
+        created_at, row_id = decode_cursor(query_params['cursor'])
+        if created_at is None:
+            # В ORDER BY created_at DESC строки без даты идут первыми (NULLS FIRST):
+            # после них остаются такие же строки с меньшим id и все строки с датой
+            conditions.append('(p.created_at IS NOT NULL OR p.id < %s)')
+            params.append(row_id)
+        else:
+            conditions.append('(p.created_at, p.id) < (%s, %s)')
+            params.extend((created_at, row_id))
+    
+    return conditions, params
+
+def get_page_size(query_params: dict) -> int:
+    limit = int(query_params.get('limit') or CATALOG_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, CATALOG_PAGE_SIZE_MAX)
+# <<< shared/catalog.py
+
+# Геопоиск: кандидаты выбираются по geo_cell (сетка 0.01°, btree), точное расстояние считается только для них.
+# Область поиска покрывается одним диапазоном ячеек на каждую строку широты
+GEO_CELLS_PER_DEGREE = 100
+GEO_ROW_STRIDE = 100000
+GEO_RADIUS_DEFAULT_KM = 2.0
+GEO_RADIUS_MAX_KM = 50.0
+GEO_BBOX_MAX_DEGREES = 2.0
+GEO_RESULTS_DEFAULT = 50
+GEO_RESULTS_MAX = 200
+EARTH_RADIUS_KM = 6371.0
+
+def geo_cell_ranges(south: float, west: float, north: float, east: float) -> tuple:
+    """Границы диапазонов geo_cell (массивы lo и hi) для прямоугольной области"""
+    col_lo = math.floor(west * GEO_CELLS_PER_DEGREE) + 18000
+    col_hi = math.floor(east * GEO_CELLS_PER_DEGREE) + 18000
+    lows, highs = [], []
+    for row in range(math.floor(south * GEO_CELLS_PER_DEGREE), math.floor(north * GEO_CELLS_PER_DEGREE) + 1):
+        base = (row + 9000) * GEO_ROW_STRIDE
+        lows.append(base + col_lo)
+        highs.append(base + col_hi)
+    return lows, highs
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> tuple:
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 0.01)))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+def parse_geo_query(query_params: dict) -> dict:
+    """?lat=&lon=&radius_km= или ?bbox=south,west,north,east (можно вместе с lat/lon для сортировки)"""
+    limit = min(int(query_params.get('limit') or GEO_RESULTS_DEFAULT), GEO_RESULTS_MAX)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    
+    if query_params.get('bbox'):
+        south, west, north, east = (float(v) for v in query_params['bbox'].split(','))
+        if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+            raise ValueError('invalid bbox')
+        if north - south > GEO_BBOX_MAX_DEGREES or east - west > GEO_BBOX_MAX_DEGREES:
+            raise ValueError('bbox is too large')
+        lat = float(query_params.get('lat') or (south + north) / 2)
+        lon = float(query_params.get('lon') or (west + east) / 2)
+        radius_km = None
+    else:
+        lat, lon = float(query_params['lat']), float(query_params['lon'])
+        radius_km = float(query_params.get('radius_km') or GEO_RADIUS_DEFAULT_KM)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 0 < radius_km <= GEO_RADIUS_MAX_KM:
+            raise ValueError('invalid center or radius')
+        south, west, north, east = radius_bbox(lat, lon, radius_km)
+    
+    lows, highs = geo_cell_ranges(south, west, north, east)
+    return {
+        'lat': lat, 'lon': lon, 'radius_km': radius_km, 'limit': limit,
+        'south': south, 'west': west, 'north': north, 'east': east,
+        'lows': lows, 'highs': highs
+    }
 
-def get_hotels(conn):
+def find_nearby(conn, geo: dict) -> list:
+    """Опубликованные объекты собственников и активные объекты каталога в области, ближайшие первыми"""
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute('''
-            SELECT p.*,
-                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as images
-            FROM t_p27119953_apartment_rental_mos.properties p
-            LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
-            WHERE p.type = 'hotel' AND p.status = 'active'
-            GROUP BY p.id
-            ORDER BY p.created_at DESC
-        ''')
+            WITH ranges (lo, hi) AS (SELECT * FROM unnest(%(lows)s::bigint[], %(highs)s::bigint[])),
+            candidates AS (
+                SELECT 'property' AS source, p.id, p.name, p.type AS category, p.address, p.metro,
+                       p.price, p.main_photo AS image_url, p.lat::float AS lat, p.lon::float AS lon
+                FROM ranges r
+                JOIN t_p27119953_apartment_rental_mos.properties p ON p.geo_cell BETWEEN r.lo AND r.hi
+                WHERE p.status = 'active'
+                UNION ALL
+                SELECT 'object' AS source, o.id, o.name, o.category, o.address, o.metro,
+                       o.price_per_hour AS price, o.image_url, o.lat::float AS lat, o.lon::float AS lon
+                FROM ranges r
+                JOIN objects o ON o.geo_cell BETWEEN r.lo AND r.hi
+                WHERE o.is_published = true
+            ),
+            measured AS (
+                SELECT c.*,
+                       2 * %(earth_radius)s * asin(sqrt(
+                           power(sin(radians(c.lat - %(lat)s) / 2), 2) +
+                           cos(radians(%(lat)s)) * cos(radians(c.lat)) * power(sin(radians(c.lon - %(lon)s) / 2), 2)
+                       )) AS distance_km
+                FROM candidates c
+                WHERE c.lat BETWEEN %(south)s AND %(north)s AND c.lon BETWEEN %(west)s AND %(east)s
+            )
+            SELECT * FROM measured
+            WHERE %(radius_km)s::float IS NULL OR distance_km <= %(radius_km)s::float
+            ORDER BY distance_km
+            LIMIT %(limit)s
+        ''', {**geo, 'earth_radius': EARTH_RADIUS_KM})
+        return cur.fetchall()
+
+def search_nearby(conn, geo: dict) -> dict:
+    return json_response(200, {
+        'items': find_nearby(conn, geo),
+        'center': {'lat': geo['lat'], 'lon': geo['lon']},
+        'radius_km': geo['radius_km']
+    })
+
+# Кластеры для карты предрасчитаны триггерами в map_clusters для zoom 8-16 (ячейка - четверть тайла по ширине).
+# На zoom выше 16 ячейки мельче плотности объявлений, поэтому отдаются сами метки
+MAP_CLUSTER_MIN_ZOOM = 8
+MAP_CLUSTER_MAX_ZOOM = 16
+MAP_CELLS_PER_TILE = 4
+MAP_CLUSTER_CELLS_MAX = 4096
+
+def map_cell_size(zoom: int) -> float:
+    return 360.0 / (MAP_CELLS_PER_TILE * 2 ** zoom)
+
+def parse_cluster_query(query_params: dict) -> dict:
+    """?bbox=south,west,north,east&zoom=N; zoom ниже 8 приводится к 8"""
+    south, west, north, east = (float(v) for v in query_params['bbox'].split(','))
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError('invalid bbox')
+    zoom = max(int(query_params.get('zoom') or MAP_CLUSTER_MIN_ZOOM), MAP_CLUSTER_MIN_ZOOM)
+    if zoom > MAP_CLUSTER_MAX_ZOOM:
+        return {'zoom': zoom, 'markers': parse_geo_query({'bbox': query_params['bbox'], 'limit': GEO_RESULTS_MAX})}
+    
+    size = map_cell_size(zoom)
+    cells = {
+        'zoom': zoom,
+        'x_lo': math.floor((west + 180) / size), 'x_hi': math.floor((east + 180) / size),
+        'y_lo': math.floor((south + 90) / size), 'y_hi': math.floor((north + 90) / size)
+    }
+    if (cells['x_hi'] - cells['x_lo'] + 1) * (cells['y_hi'] - cells['y_lo'] + 1) > MAP_CLUSTER_CELLS_MAX:
+        raise ValueError('bbox is too large for zoom')
+    return cells
+
+def get_clusters(conn, cells: dict) -> dict:
+    if 'markers' in cells:
+        return json_response(200, {'zoom': cells['zoom'], 'clusters': [], 'markers': find_nearby(conn, cells['markers'])})
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('''
+            SELECT lat_sum / listings AS lat, lon_sum / listings AS lon,
+                   listings AS count, min_price
+            FROM t_p27119953_apartment_rental_mos.map_clusters
+            WHERE zoom = %(zoom)s
+              AND cell_x BETWEEN %(x_lo)s AND %(x_hi)s
+              AND cell_y BETWEEN %(y_lo)s AND %(y_hi)s
+        ''', cells)
+        clusters = cur.fetchall()
+    
+    return json_response(200, {'zoom': cells['zoom'], 'clusters': clusters, 'markers': []})
+
+# Поиск по каталогу: search_vector (russian, GIN) для слов с морфологией и триграммы по search_text для опечаток.
+# Страница ранжируется по сумме ts_rank (с весами A-C) и word_similarity, сниппеты строятся только для строк страницы
+SEARCH_QUERY_MIN_LENGTH = 2
+SEARCH_QUERY_MAX_LENGTH = 200
+SEARCH_MAX_OFFSET = 1000
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=12, MaxFragments=2'
+
+def parse_search_query(query_params: dict) -> dict:
+    """?q=...&limit=&offset=; ValueError при пустом или слишком длинном запросе"""
+    text = ' '.join((query_params.get('q') or '').split())
+    if not SEARCH_QUERY_MIN_LENGTH <= len(text) <= SEARCH_QUERY_MAX_LENGTH:
+        raise ValueError('invalid search query')
+    offset = int(query_params.get('offset') or 0)
+    if not 0 <= offset <= SEARCH_MAX_OFFSET:
+        raise ValueError('offset out of range')
+    return {'q': text, 'limit': get_page_size(query_params), 'offset': offset}
+
+def search_listings(conn, search: dict) -> dict:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Текст экранируется до ts_headline: в ответе безопасный HTML, где теги - только <mark>
+        cur.execute('''
+            WITH q AS (
+                SELECT websearch_to_tsquery('russian', %(q)s) AS query, lower(%(q)s) AS text
+            ),
+            matches AS (
+                SELECT p.id,
+                       ts_rank(p.search_vector, q.query, 32) + word_similarity(q.text, p.search_text) AS score
+                FROM t_p27119953_apartment_rental_mos.properties p, q
+                WHERE p.status = 'active' AND (p.search_vector @@ q.query OR q.text <%% p.search_text)
+                ORDER BY score DESC, p.id
+                LIMIT %(limit)s OFFSET %(offset)s
+            )
+            SELECT p.id, p.type, p.name, p.address, p.metro, p.price, p.main_photo,
+                   p.lat::float AS lat, p.lon::float AS lon, m.score,
+                   ts_headline('russian', replace(replace(replace(p.name, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                               q.query, 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true') AS name_highlight,
+                   ts_headline('russian', replace(replace(replace(coalesce(p.description, ''), '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                               q.query, %(headline_options)s) AS snippet
+            FROM matches m
+            JOIN t_p27119953_apartment_rental_mos.properties p ON p.id = m.id, q
+            ORDER BY m.score DESC, m.id
+        ''', {**search, 'limit': search['limit'] + 1, 'headline_options': SEARCH_HEADLINE_OPTIONS})
+        items = cur.fetchall()
+    
+    next_offset = None
+    if len(items) > search['limit']:
+        items = items[:search['limit']]
+        next_offset = search['offset'] + search['limit']
+    
+    return json_response(200, {'items': items, 'next_offset': next_offset})
+
+def request_body(event: dict) -> dict:
+    return json.loads(event.get('body') or '{}')
+
+def with_id(func):
+    """Маршрут, которому нужен ?id=: без него ответ 404, как у неизвестного маршрута"""
+    def wrapper(event: dict, query: dict) -> dict:
+        if not query.get('id'):
+            return json_response(404, {'error': 'Not found', 'entity': query.get('entity', 'hotels'), 'method': event.get('httpMethod')})
+        return func(event, query, query['id'])
+    return wrapper
+
+# GET ?entity=hotels - все отели, GET ?entity=hotels&id=123 - отель по ID (ETag + кеш)
+@route('GET', 'hotels', None)
+def route_get_hotels(event: dict, query: dict) -> dict:
+    entity_id = query.get('id')
+    if entity_id:
+        return conditional_get(event, entity_id, f'property:{entity_id}', query, lambda: run_with_connection(get_hotel, entity_id))
+    return conditional_get(event, None, 'catalog', query, lambda: run_with_connection(get_hotels, query), 'hotel')
+
+# POST ?entity=hotels - создать отель
+@route('POST', 'hotels', None)
+def route_create_hotel(event: dict, query: dict) -> dict:
+    return run_with_connection(create_hotel, request_body(event))
+
+# PUT ?entity=hotels&id=123 - обновить отель
+@route('PUT', 'hotels', None)
+@with_id
+def route_update_hotel(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(update_hotel, entity_id, request_body(event))
+
+# PUT ?entity=hotels&id=123&action=publish - опубликовать/снять с публикации
+@route('PUT', 'hotels', 'publish')
+@with_id
+def route_publish_hotel(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(toggle_hotel_publish, entity_id, request_body(event).get('is_published'))
+
+# PUT ?entity=hotels&id=123&action=archive - архивировать/разархивировать
+@route('PUT', 'hotels', 'archive')
+@with_id
+def route_archive_hotel(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(toggle_hotel_archive, entity_id, request_body(event).get('is_archived'))
+
+# GET ?entity=rooms&id=123 - получить номер по ID
+@route('GET', 'rooms', None)
+@with_id
+def route_get_room(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(get_room, entity_id)
+
+# POST ?entity=rooms - создать номер
+@route('POST', 'rooms', None)
+def route_create_room(event: dict, query: dict) -> dict:
+    return run_with_connection(create_room, request_body(event))
+
+# PUT ?entity=rooms&id=123 - обновить номер
+@route('PUT', 'rooms', None)
+@with_id
+def route_update_room(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(update_room, entity_id, request_body(event))
+
+# PUT ?entity=rooms&id=123&action=publish - опубликовать/снять с публикации
+@route('PUT', 'rooms', 'publish')
+@with_id
+def route_publish_room(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(toggle_room_publish, entity_id, request_body(event).get('is_published'))
+
+# PUT ?entity=rooms&id=123&action=archive - архивировать/разархивировать
+@route('PUT', 'rooms', 'archive')
+@with_id
+def route_archive_room(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(toggle_room_archive, entity_id, request_body(event).get('is_archived'))
+
+# DELETE ?entity=rooms&id=123 - удалить номер
+@route('DELETE', 'rooms', None)
+@with_id
+def route_delete_room(event: dict, query: dict, entity_id) -> dict:
+    return run_with_connection(delete_room, entity_id)
+
+# GET ?entity=owners - получить всех владельцев
+@route('GET', 'owners', None)
+def route_get_owners(event: dict, query: dict) -> dict:
+    return run_with_connection(get_owners)
+
+# POST ?entity=owners - создать владельца
+@route('POST', 'owners', None)
+def route_create_owner(event: dict, query: dict) -> dict:
+    return run_with_connection(create_owner, request_body(event))
+
+# GET ?entity=nearby&lat=..&lon=..&radius_km=.. или &bbox=south,west,north,east - поиск рядом на карте
+@route('GET', 'nearby', None)
+def route_nearby(event: dict, query: dict) -> dict:
+    try:
+        geo = parse_geo_query(query)
+    except (KeyError, ValueError, TypeError):
+        return json_response(400, {'error': 'Invalid geo parameters'})
+    return run_with_connection(search_nearby, geo)
+
+# GET ?entity=clusters&bbox=south,west,north,east&zoom=N - кластеры меток для видимой области карты
+@route('GET', 'clusters', None)
+def route_clusters(event: dict, query: dict) -> dict:
+    try:
+        cells = parse_cluster_query(query)
+    except (KeyError, ValueError, TypeError):
+        return json_response(400, {'error': 'Invalid cluster parameters'})
+    return run_with_connection(get_clusters, cells)
+
+# GET ?entity=search&q=...&limit=&offset= - полнотекстовый поиск с подсветкой (кеш и ETag каталога)
+@route('GET', 'search', None)
+def route_search(event: dict, query: dict) -> dict:
+    try:
+        search = parse_search_query(query)
+    except (ValueError, TypeError):
+        return json_response(400, {'error': 'Invalid search parameters'})
+    return conditional_get(event, None, 'catalog', query, lambda: run_with_connection(search_listings, search))
+
+def handler(event: dict, context) -> dict:
+    try:
+        return dispatch(event)
+    except Exception as e:
+        return json_response(500, {'error': str(e)})
+
+def get_hotels(conn, query_params: dict):
+    filters = {k: v for k, v in query_params.items() if k not in ('type', 'status')}
+    try:
+        conditions, params = build_catalog_filters(
+            filters, room_condition='pr.is_published = true AND pr.is_archived = false'
+        )
+        limit = get_page_size(query_params)
+    except (ValueError, TypeError):
+        return json_response(400, {'error': 'Invalid filter parameters'})
+    conditions = ["p.type = 'hotel'", "p.status = 'active'"] + conditions
+    
+    with conn.cursor() as cur:
+        cur.execute(f'''
+            WITH page AS (
+                SELECT p.*
+                FROM t_p27119953_apartment_rental_mos.properties p
+                WHERE {' AND '.join(conditions)}
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT %s
+            )
+            SELECT page.*,
+                   COALESCE((SELECT array_agg(DISTINCT ph.photo_url)
+                    FROM t_p27119953_apartment_rental_mos.property_photos ph
+                    WHERE ph.property_id = page.id), ARRAY[]::text[]) as images,
+                   (SELECT json_object_agg(ph.photo_url, ph.variants)
+                    FROM t_p27119953_apartment_rental_mos.property_photos ph
+                    WHERE ph.property_id = page.id AND ph.variants IS NOT NULL) as image_variants,
+                   (SELECT json_agg(json_build_object('name', s.name, 'line', s.line, 'walk_minutes', lm.walk_minutes) ORDER BY lm.rank)
+                    FROM t_p27119953_apartment_rental_mos.listing_metro lm
+                    JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+                    WHERE lm.source = 'property' AND lm.listing_id = page.id) as nearest_metro
+            FROM page
+            ORDER BY page.created_at DESC, page.id DESC
+        ''', params + [limit + 1])
         hotels = cur.fetchall()
+        columns = cursor_columns(cur)
+        
+        next_cursor = None
+        if len(hotels) > limit:
+            hotels = hotels[:limit]
+            next_cursor = encode_cursor(dict(zip(columns, hotels[-1])))
         
-        for hotel in hotels:
+        # Номера всех отелей одним запросом вместо запроса на каждый отель
+        id_index = columns.index('id')
+        rooms_by_hotel = {}
+        if hotels:
             cur.execute('''
-                SELECT pr.id, pr.name, pr.type, pr.price, pr.capacity, pr.area, 
+                SELECT pr.property_id, pr.id, pr.name, pr.type, pr.price, pr.capacity, pr.area, 
                        pr.description, pr.amenities, pr.is_published, pr.is_archived,
-                       array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as images
+                       array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as images,
+                       json_object_agg(prp.photo_url, prp.variants) FILTER (WHERE prp.variants IS NOT NULL) as image_variants
                 FROM t_p27119953_apartment_rental_mos.property_rooms pr
                 LEFT JOIN t_p27119953_apartment_rental_mos.property_room_photos prp ON pr.id = prp.room_id
-                WHERE pr.property_id = %s AND pr.is_published = true AND pr.is_archived = false
+                WHERE pr.property_id = ANY(%s) AND pr.is_published = true AND pr.is_archived = false
                 GROUP BY pr.id
-                ORDER BY pr.price
-            ''', (hotel['id'],))
-            hotel['rooms'] = cur.fetchall()
-            
-            if not hotel['images']:
-                hotel['images'] = []
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps([dict(h) for h in hotels], default=str),
-            'isBase64Encoded': False
-        }
+                ORDER BY pr.property_id, pr.price
+            ''', ([hotel[id_index] for hotel in hotels],))
+            for room in cur.fetchall():
+                rooms_by_hotel.setdefault(room[0], []).append(room[1:])
+            room_columns = cursor_columns(cur)[1:]
+            rooms_by_hotel = {
+                hotel_id: rows_payload(room_columns, rooms) for hotel_id, rooms in rooms_by_hotel.items()
+            }
+        
+        hotels = rows_payload(columns + ['rooms'], [
+            hotel + (rooms_by_hotel.get(hotel[id_index], []),) for hotel in hotels
+        ])
+        
+        headers = {'Access-Control-Expose-Headers': 'X-Next-Cursor'}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        
+        return json_response(200, hotels, headers)
 
 def get_hotel(conn, hotel_id):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute('''
             SELECT p.*,
-                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as images
+                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as images,
+                   json_object_agg(ph.photo_url, ph.variants) FILTER (WHERE ph.variants IS NOT NULL) as image_variants
             FROM t_p27119953_apartment_rental_mos.properties p
             LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
             WHERE p.id = %s AND p.type = 'hotel'
@@ -162,17 +852,13 @@ def get_hotel(conn, hotel_id):
         hotel = cur.fetchone()
         
         if not hotel:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Hotel not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Hotel not found'})
         
         cur.execute('''
             SELECT pr.id, pr.name, pr.type, pr.price, pr.capacity, pr.area, 
                    pr.description, pr.amenities, pr.is_published, pr.is_archived,
-                   array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as images
+                   array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as images,
+                   json_object_agg(prp.photo_url, prp.variants) FILTER (WHERE prp.variants IS NOT NULL) as image_variants
             FROM t_p27119953_apartment_rental_mos.property_rooms pr
             LEFT JOIN t_p27119953_apartment_rental_mos.property_room_photos prp ON pr.id = prp.room_id
             WHERE pr.property_id = %s
@@ -184,14 +870,9 @@ def get_hotel(conn, hotel_id):
         if not hotel['images']:
             hotel['images'] = []
         
-        hotel['rooms'] = [dict(r) for r in rooms]
+        hotel['rooms'] = rooms
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(dict(hotel), default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, dict(hotel))
 
 def create_hotel(conn, data):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -216,12 +897,7 @@ def create_hotel(conn, data):
         hotel = cur.fetchone()
         conn.commit()
         
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(hotel, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(201, hotel)
 
 def update_hotel(conn, hotel_id, data):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -249,19 +925,9 @@ def update_hotel(conn, hotel_id, data):
         conn.commit()
         
         if not hotel:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Hotel not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Hotel not found'})
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(hotel, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, hotel)
 
 def toggle_hotel_publish(conn, hotel_id, is_published):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -275,19 +941,9 @@ def toggle_hotel_publish(conn, hotel_id, is_published):
         conn.commit()
         
         if not hotel:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Hotel not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Hotel not found'})
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(hotel, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, hotel)
 
 def toggle_hotel_archive(conn, hotel_id, is_archived):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -301,19 +957,9 @@ def toggle_hotel_archive(conn, hotel_id, is_archived):
         conn.commit()
         
         if not hotel:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Hotel not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Hotel not found'})
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(hotel, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, hotel)
 
 def get_room(conn, room_id):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -321,12 +967,7 @@ def get_room(conn, room_id):
         room = cur.fetchone()
         
         if not room:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Room not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Room not found'})
         
         cur.execute('SELECT * FROM room_features WHERE room_id = %s', (room_id,))
         room['features'] = cur.fetchall()
@@ -334,15 +975,12 @@ def get_room(conn, room_id):
         cur.execute('SELECT amenity FROM room_amenities WHERE room_id = %s', (room_id,))
         room['amenities'] = [r['amenity'] for r in cur.fetchall()]
         
-        cur.execute('SELECT image_url FROM room_images WHERE room_id = %s ORDER BY sort_order', (room_id,))
-        room['images'] = [r['image_url'] for r in cur.fetchall()]
+        cur.execute('SELECT image_url, variants FROM room_images WHERE room_id = %s ORDER BY sort_order', (room_id,))
+        images = cur.fetchall()
+        room['images'] = [r['image_url'] for r in images]
+        room['image_variants'] = {r['image_url']: r['variants'] for r in images if r['variants']}
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(room, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, room)
 
 def create_room(conn, data):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -380,12 +1018,41 @@ def create_room(conn, data):
         
         conn.commit()
         
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(room, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(201, room)
+
+def sync_room_children(cur, table: str, room_id, key_columns: tuple, submitted: list, order_column: str = None) -> int:
+    """Приводит строки дочерней таблицы номера к присланному списку минимальным числом изменений"""
+    select_columns = ('id',) + key_columns + ((order_column,) if order_column else ())
+    cur.execute(f"SELECT {', '.join(select_columns)} FROM {table} WHERE room_id = %s ORDER BY id", (room_id,))
+    stored = {}
+    for row in cur.fetchall():
+        stored.setdefault(tuple(row[column] for column in key_columns), []).append(row)
+    
+    to_insert = []
+    to_reorder = []
+    for position, key in enumerate(submitted):
+        matches = stored.get(key)
+        if matches:
+            row = matches.pop(0)
+            if order_column and row[order_column] != position:
+                to_reorder.append((row['id'], position))
+        else:
+            to_insert.append((room_id,) + key + ((position,) if order_column else ()))
+    to_delete = [row['id'] for rows in stored.values() for row in rows]
+    
+    if to_delete:
+        cur.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', (to_delete,))
+    if to_insert:
+        insert_columns = ('room_id',) + key_columns + ((order_column,) if order_column else ())
+        execute_values(cur, f"INSERT INTO {table} ({', '.join(insert_columns)}) VALUES %s", to_insert)
+    if to_reorder:
+        execute_values(cur, f'''
+            UPDATE {table} AS t SET {order_column} = v.position
+            FROM (VALUES %s) AS v(id, position)
+            WHERE t.id = v.id
+        ''', to_reorder)
+    
+    return len(to_delete) + len(to_insert) + len(to_reorder)
 
 def update_room(conn, room_id, data):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -408,37 +1075,32 @@ def update_room(conn, room_id, data):
         room = cur.fetchone()
         
         if not room:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Room not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Room not found'})
         
+        # Дочерние таблицы меняются по разнице с сохранённым состоянием, а не удалением всех строк
+        changed_rows = {}
         if 'amenities' in data:
-            cur.execute('DELETE FROM room_amenities WHERE room_id = %s', (room_id,))
-            for amenity in data['amenities']:
-                cur.execute('INSERT INTO room_amenities (room_id, amenity) VALUES (%s, %s)', (room_id, amenity))
+            changed_rows['amenities'] = sync_room_children(
+                cur, 'room_amenities', room_id, ('amenity',),
+                [(amenity,) for amenity in data['amenities']]
+            )
         
         if 'images' in data:
-            cur.execute('DELETE FROM room_images WHERE room_id = %s', (room_id,))
-            for idx, image_url in enumerate(data['images']):
-                cur.execute('INSERT INTO room_images (room_id, image_url, sort_order) VALUES (%s, %s, %s)', (room_id, image_url, idx))
+            changed_rows['images'] = sync_room_children(
+                cur, 'room_images', room_id, ('image_url',),
+                [(image_url,) for image_url in data['images']], order_column='sort_order'
+            )
         
         if 'features' in data:
-            cur.execute('DELETE FROM room_features WHERE room_id = %s', (room_id,))
-            for feature in data['features']:
-                cur.execute('INSERT INTO room_features (room_id, feature_name, feature_value) VALUES (%s, %s, %s)', 
-                          (room_id, feature.get('feature_name'), feature.get('feature_value')))
+            changed_rows['features'] = sync_room_children(
+                cur, 'room_features', room_id, ('feature_name', 'feature_value'),
+                [(feature.get('feature_name'), feature.get('feature_value')) for feature in data['features']]
+            )
+        room['changed_rows'] = changed_rows
         
         conn.commit()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(room, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, room)
 
 def toggle_room_publish(conn, room_id, is_published):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -452,19 +1114,9 @@ def toggle_room_publish(conn, room_id, is_published):
         conn.commit()
         
         if not room:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Room not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Room not found'})
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(room, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, room)
 
 def toggle_room_archive(conn, room_id, is_archived):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -478,19 +1130,9 @@ def toggle_room_archive(conn, room_id, is_archived):
         conn.commit()
         
         if not room:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Room not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Room not found'})
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(room, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, room)
 
 def delete_room(conn, room_id):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -501,33 +1143,18 @@ def delete_room(conn, room_id):
         room = cur.fetchone()
         
         if not room:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Room not found'}),
-                'isBase64Encoded': False
-            }
+            return json_response(404, {'error': 'Room not found'})
         
         conn.commit()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Room deleted successfully'}),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {'message': 'Room deleted successfully'})
 
 def get_owners(conn):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute('SELECT * FROM owners ORDER BY name')
         owners = cur.fetchall()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(owners, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, owners)
 
 def create_owner(conn, data):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -543,9 +1170,4 @@ def create_owner(conn, data):
         owner = cur.fetchone()
         conn.commit()
         
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(owner, default=str),
-            'isBase64Encoded': False
-        }
\ No newline at end of file
+        return json_response(201, owner)
\ No newline at end of file
@@ -1,161 +1,491 @@
 """API для получения данных собственника: объекты, статистика, акции"""
+import base64
+import hashlib
+import hmac
+import gzip
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 
-def handler(event: dict, context) -> dict:
-    """Получение данных для личного кабинета собственника"""
-    method = event.get('httpMethod', 'GET')
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# >>> shared/tokens.py - не править здесь, см. scripts/sync_shared.py
+# Подписанные токены сессии проверяются локально по HMAC, без запроса к БД.
+# AUTH_SIGNING_KEYS="kid2:secret2,kid1:secret1": первым ключом подписываются новые токены,
+# остальные ещё принимаются при проверке, пока не истекут выданные ими токены
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(12 * 3600)))
+REVOCATION_REFRESH = float(os.environ.get('AUTH_REVOCATION_REFRESH', '30'))
+
+def load_signing_keys() -> list:
+    keys = []
+    for item in os.environ.get('AUTH_SIGNING_KEYS', '').split(','):
+        kid, sep, secret = item.strip().partition(':')
+        if sep and kid and secret:
+            keys.append((kid, secret.encode()))
+    return keys
+
+SIGNING_KEYS = load_signing_keys()
+if not SIGNING_KEYS:
+    # Без ключей токены не выдаются и не принимаются: вход отвечает 503, кабинет - 401
+    print('AUTH_SIGNING_KEYS is not configured: owner tokens can be neither signed nor verified')
+
+# Отозванные до срока токены (выход из кабинета) держим в памяти и перечитываем не чаще REVOCATION_REFRESH
+_revoked = {'jtis': frozenset(), 'loaded_at': None}
+_revoked_lock = threading.Lock()
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def _token_signature(secret: bytes, signed_part: str) -> str:
+    return _b64encode(hmac.new(secret, signed_part.encode(), hashlib.sha256).digest())
+
+def refresh_revoked(force: bool = False) -> frozenset:
+    now = time.monotonic()
+    loaded_at = _revoked['loaded_at']
+    if not force and loaded_at is not None and now - loaded_at < REVOCATION_REFRESH:
+        return _revoked['jtis']
+    with _revoked_lock:
+        if not force and _revoked['loaded_at'] is not None and now - _revoked['loaded_at'] < REVOCATION_REFRESH:
+            return _revoked['jtis']
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT jti FROM t_p27119953_apartment_rental_mos.revoked_tokens
+                        WHERE expires_at > CURRENT_TIMESTAMP
+                    """)
+                    _revoked['jtis'] = frozenset(row[0] for row in cur.fetchall())
+        except psycopg2.Error as e:
+            # Оставляем прежний список, чтобы сбой БД не блокировал проверку; повторим позже
+            print(f'Revocation list refresh failed: {str(e)}')
+        _revoked['loaded_at'] = now
+    return _revoked['jtis']
+
+def verify_token(token: str):
+    """Claims токена или None, если подпись, срок действия или отзыв не проходят проверку"""
+    parts = (token or '').split('.')
+    if len(parts) != 3:
+        return None
+    kid, payload, signature = parts
+    secret = next((secret for key_id, secret in SIGNING_KEYS if key_id == kid), None)
+    if secret is None or not hmac.compare_digest(signature, _token_signature(secret, f'{kid}.{payload}')):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) <= time.time():
+        return None
+    if claims.get('jti') in refresh_revoked():
+        return None
+    return claims
+
+def request_token(event: dict) -> str:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'x-authorization'), None) or ''
+    return value.removeprefix('Bearer ').strip()
+# <<< shared/tokens.py
+
+# Активные акции одинаковы для всех собственников и кэшируются на уровне процесса.
+# Кэш сбрасывается, когда админка меняет версию акций или истекает ближайший valid_until
+_promotions_cache = {'version': None, 'expires_at': None, 'items': None}
+_promotions_lock = threading.Lock()
+promotions_stats = {'hits': 0, 'refreshes': 0}
+
+def load_active_promotions(cursor) -> tuple:
+    cursor.execute("""
+        SELECT id, title, description, valid_from, valid_until
+        FROM promotions
+        WHERE is_active = true
+        AND (valid_until IS NULL OR valid_until > CURRENT_TIMESTAMP)
+        ORDER BY created_at DESC
+    """)
+    
+    rows = cursor.fetchall()
+    expires_at = min((row[4] for row in rows if row[4]), default=None)
+    return rows_payload(cursor_columns(cursor), rows), expires_at
+
+def get_active_promotions(cursor, version) -> list:
+    """Акции из кэша процесса; запрос к БД только при смене версии или истечении акции"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with _promotions_lock:
+        cached = dict(_promotions_cache)
+    if (
+        cached['items'] is not None and cached['version'] == version and
+        (cached['expires_at'] is None or cached['expires_at'] > now)
+    ):
+        promotions_stats['hits'] += 1
+        return cached['items']
+    
+    promotions, expires_at = load_active_promotions(cursor)
+    promotions_stats['refreshes'] += 1
+    with _promotions_lock:
+        _promotions_cache.update({'version': version, 'expires_at': expires_at, 'items': promotions})
+    return promotions
+
+# Маршрутизация: таблица (method, ROUTE_PARAMS...) -> обработчик собирается один раз при импорте модуля.
+# Все ответы собираются в json_response с общими заголовками - одно место для сериализации и заголовков
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Authorization',
+    'Access-Control-Max-Age': '86400'
+}
+ROUTE_PARAMS = ()
+
+def route_not_found(method: str, query: dict) -> dict:
+    return json_response(405, {'error': 'Method not allowed'})
+
+# >>> shared/http.py - не править здесь, см. scripts/sync_shared.py
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+ROUTES = {}
+
+def route(method: str, *values):
+    """Регистрирует обработчик для метода и значений параметров ROUTE_PARAMS"""
+    def register(func):
+        ROUTES[(method,) + values] = func
+        return func
+    return register
+
+# Быстрая сериализация: orjson, если он установлен, иначе stdlib json.
+# NUMERIC приходит из драйвера сразу float, datetime/date кодируются по типу без цепочки isinstance
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_AS_FLOAT',
+    lambda value, cur: float(value) if value is not None else None
+))
+
+_JSON_ENCODERS = {Decimal: float, datetime: datetime.isoformat, date: date.isoformat}
+
+def _json_default(value):
+    encoder = _JSON_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return encoder(value)
+
+def dumps(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default).decode()
+    return json.dumps(payload, default=_json_default)
+
+def cursor_columns(cursor) -> list:
+    return [column.name for column in cursor.description]
+
+def rows_payload(columns: list, rows: list) -> list:
+    """Кортежи строк обычного курсора в объекты по именам колонок; в JSON их переводит только dumps"""
+    return [dict(zip(columns, row)) for row in rows]
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+# Сжатие ответов по Accept-Encoding: brotli (если установлен) или gzip, только для тел больше порога.
+# compression_stats по маршрутам помогают подобрать порог и уровни сжатия
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compression_stats = {}
+
+def accepted_encodings(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), None) or ''
+    encodings = set()
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=') if params.strip().startswith('q=') else '1'
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            continue
+    return encodings
+
+def compress_response(event: dict, response: dict, endpoint: str) -> dict:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or 'Content-Encoding' in response['headers']:
+        return response
+    
+    stats = compression_stats.setdefault(endpoint, {
+        'responses': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0
+    })
+    stats['responses'] += 1
+    raw = body.encode()
+    encodings = accepted_encodings(event)
+    if len(raw) < COMPRESS_MIN_SIZE or not encodings:
+        return response
     
+    started = time.thread_time()
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings or '*' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    stats['cpu_ms'] += (time.thread_time() - started) * 1000
+    stats['compressed'] += 1
+    stats['bytes_in'] += len(raw)
+    stats['bytes_out'] += len(compressed)
+    
+    headers = {**response['headers'], 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+    # Сжатое тело по байтам не совпадает с несжатым, поэтому сильный ETag ослабляется (W/).
+    # If-None-Match сравнивается без W/, так что 304 получают клиенты с любым из вариантов
+    if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+        headers['ETag'] = 'W/' + headers['ETag']
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+def dispatch(event: dict) -> dict:
+    """Выбор обработчика по таблице маршрутов за один поиск в словаре"""
+    method = event.get('httpMethod', 'GET')
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Authorization',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return {'statusCode': 200, 'headers': dict(PREFLIGHT_HEADERS), 'body': '', 'isBase64Encoded': False}
     
-    if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+    query = event.get('queryStringParameters') or {}
+    key = (method,) + tuple(query.get(name, default) for name, default in ROUTE_PARAMS)
+    route_handler = ROUTES.get(key)
+    if route_handler is None:
+        return route_not_found(method, query)
+    return compress_response(event, route_handler(event, query), ' '.join(str(part) for part in key if part))
+# <<< shared/http.py
+
+# Графики строятся по готовым агрегатам: не больше одной строки на объект за день (или час)
+SERIES_PERIODS = (7, 30, 90)
+HOURLY_SERIES_MAX_DAYS = 7
+
+def get_series(cursor, object_ids: list, period: int, granularity: str) -> dict:
+    """Временной ряд просмотров и кликов по объектам, с нулями за периоды без событий"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if granularity == 'hour':
+        end = now.replace(minute=0, second=0, microsecond=0)
+        step = timedelta(hours=1)
+        start = end - timedelta(days=period) + step
+        cursor.execute("""
+            SELECT object_id, bucket_start, views, telegram_clicks
+            FROM t_p27119953_apartment_rental_mos.object_stats_hourly
+            WHERE object_id = ANY(%s) AND bucket_start >= %s
+        """, (object_ids, start))
+    else:
+        end = now.date()
+        step = timedelta(days=1)
+        start = end - timedelta(days=period - 1)
+        cursor.execute("""
+            SELECT object_id, day, views, telegram_clicks
+            FROM t_p27119953_apartment_rental_mos.object_stats_daily
+            WHERE object_id = ANY(%s) AND day >= %s
+        """, (object_ids, start))
     
-    try:
-        # Получаем owner_id из query параметров
-        query_params = event.get('queryStringParameters', {}) or {}
-        owner_id = query_params.get('owner_id')
-        
-        if not owner_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'owner_id required'})
+    counts = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+    buckets = []
+    bucket = start
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket += step
+    
+    return {
+        object_id: [
+            {
+                'bucket': bucket,
+                'views': counts.get((object_id, bucket), (0, 0))[0],
+                'telegram_clicks': counts.get((object_id, bucket), (0, 0))[1]
             }
-        
-        # Подключение к БД
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+            for bucket in buckets
+        ]
+        for object_id in object_ids
+    }
+
+@route('GET')
+def get_dashboard(event: dict, query_params: dict) -> dict:
+    """Получение данных для личного кабинета собственника"""
+    # owner_id берём из подписанного токена, а не из query параметров
+    claims = verify_token(request_token(event))
+    
+    if not claims or claims.get('role') != 'owner':
+        return json_response(401, {'error': 'Authorization required'})
+    
+    owner_id = claims['sub']
+    if query_params.get('owner_id') and str(query_params['owner_id']) != str(owner_id):
+        return json_response(403, {'error': 'Access denied'})
+    
+    # period=7|30|90 добавляет к статистике объектов временной ряд, granularity=hour - только для 7 дней
+    period = query_params.get('period')
+    granularity = query_params.get('granularity', 'day')
+    if period is not None:
+        if not period.isdigit() or int(period) not in SERIES_PERIODS or granularity not in ('day', 'hour') or (
+            granularity == 'hour' and int(period) > HOURLY_SERIES_MAX_DAYS
+        ):
+            return json_response(400, {'error': 'Invalid period or granularity'})
+        period = int(period)
+    
+    with db_connection() as conn:
         cursor = conn.cursor()
         
-        # Получаем информацию о собственнике
+        # Собственник, его объекты со статистикой и версия акций - одним запросом
         cursor.execute("""
-            SELECT id, username, full_name, phone, telegram, created_at
-            FROM owners
-            WHERE id = %s AND is_active = true
+            SELECT
+                json_build_object(
+                    'id', ow.id,
+                    'username', ow.username,
+                    'full_name', ow.full_name,
+                    'phone', ow.phone,
+                    'telegram', ow.telegram,
+                    'created_at', ow.created_at
+                ),
+                COALESCE((
+                    SELECT json_agg(json_build_object(
+                        'id', o.id,
+                        'category', o.category,
+                        'name', o.name,
+                        'address', o.address,
+                        'metro', o.metro,
+                        'area', o.area::float,
+                        'rooms', o.rooms,
+                        'price_per_hour', o.price_per_hour::float,
+                        'min_hours', o.min_hours,
+                        'lat', o.lat::float,
+                        'lon', o.lon::float,
+                        'image_url', o.image_url,
+                        'telegram_contact', o.telegram_contact,
+                        'is_published', o.is_published,
+                        'created_at', o.created_at,
+                        'stats', json_build_object(
+                            'views', COALESCE(s.views_count, 0),
+                            'telegram_clicks', COALESCE(s.telegram_clicks_count, 0),
+                            'last_view_at', s.last_view_at,
+                            'last_click_at', s.last_click_at
+                        )
+                    ) ORDER BY o.created_at DESC)
+                    FROM objects o
+                    LEFT JOIN object_stats s ON o.id = s.object_id
+                    WHERE o.owner_id = ow.id
+                ), '[]'::json),
+                (SELECT version FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name = 'promotions')
+            FROM owners ow
+            WHERE ow.id = %s AND ow.is_active = true
         """, (owner_id,))
         
-        owner_row = cursor.fetchone()
+        row = cursor.fetchone()
         
-        if not owner_row:
+        if not row:
             cursor.close()
-            conn.close()
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Owner not found'})
-            }
-        
-        owner_info = {
-            'id': owner_row[0],
-            'username': owner_row[1],
-            'full_name': owner_row[2],
-            'phone': owner_row[3],
-            'telegram': owner_row[4],
-            'created_at': owner_row[5].isoformat() if owner_row[5] else None
-        }
+            return json_response(404, {'error': 'Owner not found'})
         
-        # Получаем объекты собственника с статистикой
-        cursor.execute("""
-            SELECT 
-                o.id, o.category, o.name, o.address, o.metro,
-                o.area, o.rooms, o.price_per_hour, o.min_hours,
-                o.lat, o.lon, o.image_url, o.telegram_contact,
-                o.is_published, o.created_at,
-                COALESCE(s.views_count, 0) as views,
-                COALESCE(s.telegram_clicks_count, 0) as telegram_clicks,
-                s.last_view_at, s.last_click_at
-            FROM objects o
-            LEFT JOIN object_stats s ON o.id = s.object_id
-            WHERE o.owner_id = %s
-            ORDER BY o.created_at DESC
-        """, (owner_id,))
+        owner_info, objects, promotions_version = row
         
-        objects_rows = cursor.fetchall()
-        objects = []
+        if period is not None and objects:
+            series = get_series(cursor, [obj['id'] for obj in objects], period, granularity)
+            for obj in objects:
+                obj['stats']['series'] = series[obj['id']]
         
-        for row in objects_rows:
-            objects.append({
-                'id': row[0],
-                'category': row[1],
-                'name': row[2],
-                'address': row[3],
-                'metro': row[4],
-                'area': float(row[5]) if row[5] else None,
-                'rooms': row[6],
-                'price_per_hour': float(row[7]) if row[7] else None,
-                'min_hours': row[8],
-                'lat': float(row[9]) if row[9] else None,
-                'lon': float(row[10]) if row[10] else None,
-                'image_url': row[11],
-                'telegram_contact': row[12],
-                'is_published': row[13],
-                'created_at': row[14].isoformat() if row[14] else None,
-                'stats': {
-                    'views': row[15],
-                    'telegram_clicks': row[16],
-                    'last_view_at': row[17].isoformat() if row[17] else None,
-                    'last_click_at': row[18].isoformat() if row[18] else None
-                }
-            })
-        
-        # Получаем активные акции
-        cursor.execute("""
-            SELECT id, title, description, valid_from, valid_until
-            FROM promotions
-            WHERE is_active = true
-            AND (valid_until IS NULL OR valid_until > CURRENT_TIMESTAMP)
-            ORDER BY created_at DESC
-        """)
-        
-        promotions_rows = cursor.fetchall()
-        promotions = []
-        
-        for row in promotions_rows:
-            promotions.append({
-                'id': row[0],
-                'title': row[1],
-                'description': row[2],
-                'valid_from': row[3].isoformat() if row[3] else None,
-                'valid_until': row[4].isoformat() if row[4] else None
-            })
+        promotions = get_active_promotions(cursor, promotions_version)
         
         cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'owner': owner_info,
-                'objects': objects,
-                'promotions': promotions
-            })
-        }
         
+        return json_response(200, {
+            'owner': owner_info,
+            'objects': objects,
+            'promotions': promotions
+        })
+
+def handler(event: dict, context) -> dict:
+    try:
+        return dispatch(event)
     except Exception as e:
         print(f'Error in owner-dashboard: {str(e)}')
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error'})
-        }
+        return json_response(500, {'error': 'Internal server error'})
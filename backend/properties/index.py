@@ -1,240 +1,697 @@
 """API для управления объектами недвижимости в личном кабинете"""
+import gzip
 import json
 import os
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, execute_values
+from datetime import date, datetime
+from decimal import Decimal
 
-def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
 
-def handler(event: dict, context) -> dict:
-    method = event.get('httpMethod', 'GET')
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# Маршрутизация: таблица (method, ROUTE_PARAMS...) -> обработчик собирается один раз при импорте модуля.
+# Все ответы собираются в json_response с общими заголовками - одно место для сериализации и заголовков
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Authorization, If-None-Match'
+}
+ROUTE_PARAMS = ()
+
+def route_not_found(method: str, query: dict) -> dict:
+    return json_response(405, {'error': 'Method not allowed'})
+
+# >>> shared/http.py - не править здесь, см. scripts/sync_shared.py
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+ROUTES = {}
+
+def route(method: str, *values):
+    """Регистрирует обработчик для метода и значений параметров ROUTE_PARAMS"""
+    def register(func):
+        ROUTES[(method,) + values] = func
+        return func
+    return register
+
+# Быстрая сериализация: orjson, если он установлен, иначе stdlib json.
+# NUMERIC приходит из драйвера сразу float, datetime/date кодируются по типу без цепочки isinstance
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_AS_FLOAT',
+    lambda value, cur: float(value) if value is not None else None
+))
+
+_JSON_ENCODERS = {Decimal: float, datetime: datetime.isoformat, date: date.isoformat}
+
+def _json_default(value):
+    encoder = _JSON_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return encoder(value)
+
+def dumps(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default).decode()
+    return json.dumps(payload, default=_json_default)
+
+def cursor_columns(cursor) -> list:
+    return [column.name for column in cursor.description]
+
+def rows_payload(columns: list, rows: list) -> list:
+    """Кортежи строк обычного курсора в объекты по именам колонок; в JSON их переводит только dumps"""
+    return [dict(zip(columns, row)) for row in rows]
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+# Сжатие ответов по Accept-Encoding: brotli (если установлен) или gzip, только для тел больше порога.
+# compression_stats по маршрутам помогают подобрать порог и уровни сжатия
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compression_stats = {}
+
+def accepted_encodings(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), None) or ''
+    encodings = set()
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=') if params.strip().startswith('q=') else '1'
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            continue
+    return encodings
+
+def compress_response(event: dict, response: dict, endpoint: str) -> dict:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or 'Content-Encoding' in response['headers']:
+        return response
     
+    stats = compression_stats.setdefault(endpoint, {
+        'responses': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0
+    })
+    stats['responses'] += 1
+    raw = body.encode()
+    encodings = accepted_encodings(event)
+    if len(raw) < COMPRESS_MIN_SIZE or not encodings:
+        return response
+    
+    started = time.thread_time()
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings or '*' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    stats['cpu_ms'] += (time.thread_time() - started) * 1000
+    stats['compressed'] += 1
+    stats['bytes_in'] += len(raw)
+    stats['bytes_out'] += len(compressed)
+    
+    headers = {**response['headers'], 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+    # Сжатое тело по байтам не совпадает с несжатым, поэтому сильный ETag ослабляется (W/).
+    # If-None-Match сравнивается без W/, так что 304 получают клиенты с любым из вариантов
+    if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+        headers['ETag'] = 'W/' + headers['ETag']
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+def dispatch(event: dict) -> dict:
+    """Выбор обработчика по таблице маршрутов за один поиск в словаре"""
+    method = event.get('httpMethod', 'GET')
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Authorization'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return {'statusCode': 200, 'headers': dict(PREFLIGHT_HEADERS), 'body': '', 'isBase64Encoded': False}
     
-    try:
-        if method == 'GET':
-            return get_properties(event)
-        elif method == 'POST':
-            return create_property(event)
-        elif method == 'PUT':
-            return update_property(event)
-        elif method == 'DELETE':
-            return delete_property(event)
-        else:
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+    query = event.get('queryStringParameters') or {}
+    key = (method,) + tuple(query.get(name, default) for name, default in ROUTE_PARAMS)
+    route_handler = ROUTES.get(key)
+    if route_handler is None:
+        return route_not_found(method, query)
+    return compress_response(event, route_handler(event, query), ' '.join(str(part) for part in key if part))
+# <<< shared/http.py
 
-def get_properties(event: dict) -> dict:
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+# Кеш ответов публичного каталога: LRU в памяти процесса или общий Redis (CACHE_REDIS_URL)
+CACHE_PREFIX = 'properties'
+
+# >>> shared/cache.py - не править здесь, см. scripts/sync_shared.py
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '60'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+class LocalCache:
+    """LRU-кеш с TTL в памяти процесса"""
     
-    query_params = event.get('queryStringParameters') or {}
-    property_id = query_params.get('id')
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
     
-    if property_id:
-        cur.execute('''
-            SELECT p.*, 
-                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as photos
-            FROM t_p27119953_apartment_rental_mos.properties p
-            LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
-            WHERE p.id = %s
-            GROUP BY p.id
-        ''', (property_id,))
-        property_data = cur.fetchone()
-        
-        if property_data:
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                cache_stats['evictions'] += 1
+
+class RedisCache:
+    """Общий кеш для всех функций; принимает готовый клиент (в тестах подходит fakeredis)"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def get(self, key: str):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        self.client.set(key, json.dumps(value), ex=max(int(ttl), 1))
+
+def create_cache():
+    redis_url = os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisCache(redis.Redis.from_url(redis_url))
+    return LocalCache(CACHE_MAX_ENTRIES)
+
+cache = create_cache()
+
+def normalize_params(params: dict) -> str:
+    return '&'.join(f'{k}={params[k]}' for k in sorted(params) if params[k] not in (None, ''))
+
+def cached_response(namespace: str, params: dict, build) -> dict:
+    """Read-through: ответ из кеша по нормализованным параметрам запроса или build().
+    Версия данных приходит в params (_version), поэтому после записи в БД кеш сбрасывать не нужно"""
+    key = f'{CACHE_PREFIX}:{namespace}:{normalize_params(params)}'
+    
+    response = cache.get(key)
+    if response is not None:
+        cache_stats['hits'] += 1
+        return {**response, 'headers': {**response['headers'], 'X-Cache': 'HIT'}}
+    
+    cache_stats['misses'] += 1
+    response = build()
+    if response['statusCode'] == 200:
+        cache.set(key, response, CACHE_TTL)
+    return {**response, 'headers': {**response['headers'], 'X-Cache': 'MISS'}}
+# <<< shared/cache.py
+
+# >>> shared/catalog.py - не править здесь, см. scripts/sync_shared.py
+# Условные GET: ETag строится по дешёвому признаку версии данных, а не по телу ответа
+def get_catalog_version(conn, property_id=None, property_type=None) -> str:
+    """Версия одного объекта, объектов одного типа или всего каталога из счётчиков, которые ведут триггеры V0021/V0025.
+    Счётчики типов только растут, поэтому их сумма меняется при любой записи в каталог"""
+    with conn.cursor() as cur:
+        if property_id is not None:
             cur.execute('''
-                SELECT pr.*, 
-                       array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as photos
-                FROM t_p27119953_apartment_rental_mos.property_rooms pr
-                LEFT JOIN t_p27119953_apartment_rental_mos.property_room_photos prp ON pr.id = prp.room_id
-                WHERE pr.property_id = %s
-                GROUP BY pr.id
+                SELECT version FROM t_p27119953_apartment_rental_mos.catalog_versions WHERE property_id = %s::int
             ''', (property_id,))
-            rooms = cur.fetchall()
-            property_data['rooms'] = [dict(r) for r in rooms]
-    else:
-        cur.execute('''
-            SELECT p.*,
-                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as photos,
-                   COUNT(DISTINCT pr.id) as room_count
-            FROM t_p27119953_apartment_rental_mos.properties p
-            LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
-            LEFT JOIN t_p27119953_apartment_rental_mos.property_rooms pr ON p.id = pr.property_id
-            GROUP BY p.id
-            ORDER BY p.created_at DESC
-        ''')
-        properties = cur.fetchall()
-        property_data = [dict(p) for p in properties]
-    
-    cur.close()
-    conn.close()
-    
+        elif property_type:
+            cur.execute('''
+                SELECT version FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name = 'catalog:' || %s
+            ''', (property_type,))
+        else:
+            cur.execute('''
+                SELECT sum(version) FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name LIKE 'catalog:%'
+            ''')
+        row = cur.fetchone()
+    return str(row[0]) if row and row[0] is not None else '0'
+
+def make_etag(version: str, params: dict) -> str:
+    return '"' + hashlib.sha1(f'{version}#{normalize_params(params)}'.encode()).hexdigest() + '"'
+
+def request_etags(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'if-none-match'), None) or ''
+    return {tag.strip() for tag in value.split(',') if tag.strip()}
+
+def not_modified(etag: str) -> dict:
     return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(property_data, default=str),
+        'statusCode': 304,
+        'headers': {'ETag': etag, 'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'ETag'},
+        'body': '',
         'isBase64Encoded': False
     }
 
+def conditional_get(event: dict, property_id, namespace: str, params: dict, build, property_type=None) -> dict:
+    """304 без тела, если версия не менялась; иначе ответ из кеша с ETag"""
+    with db_connection() as conn:
+        etag = make_etag(get_catalog_version(conn, property_id, property_type), params)
+    client_etags = request_etags(event)
+    if 'W/' + etag in client_etags:
+        # Клиент получил тело сжатым (compress_response ослабляет ETag): 304 повторяет тот же W/-вариант
+        return not_modified('W/' + etag)
+    if etag in client_etags or '*' in client_etags:
+        return not_modified(etag)
+    
+    # Версия входит в ключ кеша, поэтому кеш не отдаёт тело, не совпадающее с ETag
+    response = cached_response(namespace, {**params, '_version': etag}, build)
+    if response['statusCode'] != 200:
+        return response
+    headers = {**response['headers'], 'ETag': etag, 'Access-Control-Expose-Headers': 'X-Next-Cursor, ETag'}
+    return {**response, 'headers': headers}
+
+# Постраничная выдача каталога: курсор по (created_at, id), размер страницы ограничен
+CATALOG_PAGE_SIZE = 50
+CATALOG_PAGE_SIZE_MAX = 100
+CATALOG_QUERY_MAX_LENGTH = 200
+# ?near_metro=Белорусская&walk_minutes=5 отвечает по предрасчитанной таблице listing_metro
+METRO_WALK_MINUTES_DEFAULT = 10
+METRO_WALK_MINUTES_MAX = 30
+
+def encode_cursor(row: dict) -> str:
+    """Курсор следующей страницы из последней строки текущей; created_at может быть NULL"""
+    created_at = row['created_at'].isoformat() if row['created_at'] is not None else None
+    raw = json.dumps([created_at, row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id)
+
+def build_catalog_filters(query_params: dict, room_condition: str = 'TRUE') -> tuple:
+    """Условия WHERE и параметры для фильтров каталога; ValueError при неверных значениях"""
+    conditions = []
+    params = []
+    
+    if query_params.get('type'):
+        conditions.append('p.type = %s')
+        params.append(query_params['type'])
+    if query_params.get('status'):
+        conditions.append('p.status = %s')
+        params.append(query_params['status'])
+    if query_params.get('metro'):
+        conditions.append('lower(p.metro) = lower(%s)')
+        params.append(query_params['metro'].strip())
+    if query_params.get('near_metro'):
+        walk_minutes = int(query_params.get('walk_minutes') or METRO_WALK_MINUTES_DEFAULT)
+        if not 1 <= walk_minutes <= METRO_WALK_MINUTES_MAX:
+            raise ValueError('walk_minutes out of range')
+        conditions.append('''p.id IN (
+            SELECT lm.listing_id
+            FROM t_p27119953_apartment_rental_mos.listing_metro lm
+            JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+            WHERE lm.source = 'property' AND lower(s.name) = lower(%s) AND lm.walk_minutes <= %s
+        )''')
+        params.extend([query_params['near_metro'].strip(), walk_minutes])
+    if query_params.get('q'):
+        # Подстрока названия, метро или адреса: search_text в нижнем регистре, LIKE идёт по триграммному GIN
+        pattern = ' '.join(query_params['q'].split()).lower()
+        if len(pattern) > CATALOG_QUERY_MAX_LENGTH:
+            raise ValueError('q too long')
+        pattern = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append('p.search_text LIKE %s')
+        params.append(f'%{pattern}%')
+    if query_params.get('price_min'):
+        conditions.append('p.price >= %s')
+        params.append(float(query_params['price_min']))
+    if query_params.get('price_max'):
+        conditions.append('p.price <= %s')
+        params.append(float(query_params['price_max']))
+    if query_params.get('capacity'):
+        conditions.append(f'''EXISTS (
+            SELECT 1 FROM t_p27119953_apartment_rental_mos.property_rooms pr
+            WHERE pr.property_id = p.id AND pr.capacity >= %s AND {room_condition}
+        )''')
+        params.append(int(query_params['capacity']))
+    if query_params.get('cursor'):
+        created_at, row_id = decode_cursor(query_params['cursor'])
+        if created_at is None:
+            # В ORDER BY created_at DESC строки без даты идут первыми (NULLS FIRST):
+            # после них остаются такие же строки с меньшим id и все строки с датой
+            conditions.append('(p.created_at IS NOT NULL OR p.id < %s)')
+            params.append(row_id)
+        else:
+            conditions.append('(p.created_at, p.id) < (%s, %s)')
+            params.extend((created_at, row_id))
+    
+    return conditions, params
+
+def get_page_size(query_params: dict) -> int:
+    limit = int(query_params.get('limit') or CATALOG_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, CATALOG_PAGE_SIZE_MAX)
+# <<< shared/catalog.py
+
+@route('GET')
+def route_get_properties(event: dict, query: dict) -> dict:
+    namespace = f"property:{query['id']}" if query.get('id') else 'catalog'
+    return conditional_get(event, query.get('id'), namespace, query, lambda: get_properties(event), query.get('type'))
+
+@route('POST')
+def route_create_property(event: dict, query: dict) -> dict:
+    return create_property(event)
+
+@route('PUT')
+def route_update_property(event: dict, query: dict) -> dict:
+    return update_property(event)
+
+@route('DELETE')
+def route_delete_property(event: dict, query: dict) -> dict:
+    return delete_property(event)
+
+def handler(event: dict, context) -> dict:
+    try:
+        return dispatch(event)
+    except Exception as e:
+        return json_response(500, {'error': str(e)})
+
+def get_properties(event: dict) -> dict:
+    with db_connection() as conn:
+        cur = conn.cursor()
+        
+        query_params = event.get('queryStringParameters') or {}
+        property_id = query_params.get('id')
+        next_cursor = None
+        
+        if property_id:
+            cur.execute('''
+                SELECT p.*, 
+                       array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as photos,
+                       json_object_agg(ph.photo_url, ph.variants) FILTER (WHERE ph.variants IS NOT NULL) as photo_variants,
+                       (SELECT json_agg(json_build_object('name', s.name, 'line', s.line, 'walk_minutes', lm.walk_minutes) ORDER BY lm.rank)
+                        FROM t_p27119953_apartment_rental_mos.listing_metro lm
+                        JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+                        WHERE lm.source = 'property' AND lm.listing_id = p.id) as nearest_metro
+                FROM t_p27119953_apartment_rental_mos.properties p
+                LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
+                WHERE p.id = %s
+                GROUP BY p.id
+            ''', (property_id,))
+            property_row = cur.fetchone()
+            property_data = None
+            
+            if property_row:
+                columns = cursor_columns(cur)
+                cur.execute('''
+                    SELECT pr.*, 
+                           array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as photos,
+                           json_object_agg(prp.photo_url, prp.variants) FILTER (WHERE prp.variants IS NOT NULL) as photo_variants
+                    FROM t_p27119953_apartment_rental_mos.property_rooms pr
+                    LEFT JOIN t_p27119953_apartment_rental_mos.property_room_photos prp ON pr.id = prp.room_id
+                    WHERE pr.property_id = %s
+                    GROUP BY pr.id
+                ''', (property_id,))
+                rooms = rows_payload(cursor_columns(cur), cur.fetchall())
+                property_data = dict(zip(columns + ['rooms'], property_row + (rooms,)))
+        else:
+            try:
+                conditions, params = build_catalog_filters(query_params)
+                limit = get_page_size(query_params)
+            except (ValueError, TypeError):
+                cur.close()
+                return json_response(400, {'error': 'Invalid filter parameters'})
+            
+            # Сначала выбираем страницу, потом агрегируем фото и номера только для неё
+            cur.execute(f'''
+                WITH page AS (
+                    SELECT p.*
+                    FROM t_p27119953_apartment_rental_mos.properties p
+                    WHERE {' AND '.join(conditions) or 'TRUE'}
+                    ORDER BY p.created_at DESC, p.id DESC
+                    LIMIT %s
+                )
+                SELECT page.*,
+                       (SELECT array_agg(DISTINCT ph.photo_url)
+                        FROM t_p27119953_apartment_rental_mos.property_photos ph
+                        WHERE ph.property_id = page.id) as photos,
+                       (SELECT json_object_agg(ph.photo_url, ph.variants)
+                        FROM t_p27119953_apartment_rental_mos.property_photos ph
+                        WHERE ph.property_id = page.id AND ph.variants IS NOT NULL) as photo_variants,
+                       (SELECT COUNT(*)
+                        FROM t_p27119953_apartment_rental_mos.property_rooms pr
+                        WHERE pr.property_id = page.id) as room_count,
+                       (SELECT json_agg(json_build_object('name', s.name, 'line', s.line, 'walk_minutes', lm.walk_minutes) ORDER BY lm.rank)
+                        FROM t_p27119953_apartment_rental_mos.listing_metro lm
+                        JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+                        WHERE lm.source = 'property' AND lm.listing_id = page.id) as nearest_metro
+                FROM page
+                ORDER BY page.created_at DESC, page.id DESC
+            ''', params + [limit + 1])
+            properties = cur.fetchall()
+            columns = cursor_columns(cur)
+            
+            if len(properties) > limit:
+                properties = properties[:limit]
+                next_cursor = encode_cursor(dict(zip(columns, properties[-1])))
+            property_data = rows_payload(columns, properties)
+        
+        cur.close()
+    
+    headers = {'Access-Control-Expose-Headers': 'X-Next-Cursor'}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    
+    return json_response(200, property_data, headers)
+
+def photo_row(photo) -> tuple:
+    """Фото приходит строкой URL или объектом {url, variants} из ответа upload-image.
+    Без variants их подставит триггер из image_variants, когда копии будут готовы"""
+    if isinstance(photo, dict):
+        return photo['url'], Json(photo['variants']) if photo.get('variants') else None
+    return photo, None
+
 def create_property(event: dict) -> dict:
     data = json.loads(event.get('body', '{}'))
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute('''
-        INSERT INTO t_p27119953_apartment_rental_mos.properties 
-        (type, status, name, description, address, metro, price, owner_name, owner_phone, 
-         owner_telegram, main_photo, amenities, created_by)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-    ''', (
-        data.get('type'),
-        data.get('status', 'draft'),
-        data.get('name'),
-        data.get('description'),
-        data.get('address'),
-        data.get('metro'),
-        data.get('price'),
-        data['owner']['name'],
-        data['owner']['phone'],
-        data['owner'].get('telegram'),
-        data.get('mainPhoto'),
-        data.get('amenities', []),
-        data.get('createdBy', 'admin')
-    ))
-    
-    property_id = cur.fetchone()[0]
-    
-    if data.get('photos'):
-        for photo_url in data['photos']:
-            cur.execute('''
+    with db_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.properties 
+            (type, status, name, description, address, metro, price, owner_name, owner_phone, 
+             owner_telegram, main_photo, amenities, created_by, lat, lon)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        ''', (
+            data.get('type'),
+            data.get('status', 'draft'),
+            data.get('name'),
+            data.get('description'),
+            data.get('address'),
+            data.get('metro'),
+            data.get('price'),
+            data['owner']['name'],
+            data['owner']['phone'],
+            data['owner'].get('telegram'),
+            data.get('mainPhoto'),
+            data.get('amenities', []),
+            data.get('createdBy', 'admin'),
+            data.get('lat'),
+            data.get('lon')
+        ))
+        
+        property_id = cur.fetchone()[0]
+        
+        # Фото, номера и фото номеров пишутся пакетными INSERT в той же транзакции
+        if data.get('photos'):
+            execute_values(cur, '''
                 INSERT INTO t_p27119953_apartment_rental_mos.property_photos 
-                (property_id, photo_url) VALUES (%s, %s)
-            ''', (property_id, photo_url))
-    
-    if data.get('rooms'):
-        for room in data['rooms']:
-            cur.execute('''
+                (property_id, photo_url, variants) VALUES %s
+            ''', [(property_id,) + photo_row(photo) for photo in data['photos']], page_size=1000)
+        
+        if data.get('rooms'):
+            rooms = data['rooms']
+            room_ids = [row[0] for row in execute_values(cur, '''
                 INSERT INTO t_p27119953_apartment_rental_mos.property_rooms
                 (property_id, name, type, price, capacity, area, description, amenities, 
                  is_published, is_archived)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES %s
                 RETURNING id
-            ''', (
+            ''', [(
                 property_id, room['name'], room['type'], room['price'], room['capacity'],
                 room.get('area'), room.get('description'), room.get('amenities', []),
                 room.get('isPublished', False), room.get('isArchived', False)
-            ))
-            
-            room_id = cur.fetchone()[0]
+            ) for room in rooms], page_size=len(rooms), fetch=True)]
             
-            if room.get('photos'):
-                for photo_url in room['photos']:
-                    cur.execute('''
-                        INSERT INTO t_p27119953_apartment_rental_mos.property_room_photos
-                        (room_id, photo_url) VALUES (%s, %s)
-                    ''', (room_id, photo_url))
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+            room_photos = [
+                (room_id,) + photo_row(photo)
+                for room_id, room in zip(room_ids, rooms)
+                for photo in room.get('photos') or []
+            ]
+            if room_photos:
+                execute_values(cur, '''
+                    INSERT INTO t_p27119953_apartment_rental_mos.property_room_photos
+                    (room_id, photo_url, variants) VALUES %s
+                ''', room_photos, page_size=1000)
+        
+        conn.commit()
+        cur.close()
     
-    return {
-        'statusCode': 201,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'id': property_id, 'message': 'Property created'}),
-        'isBase64Encoded': False
-    }
+    return json_response(201, {'id': property_id, 'message': 'Property created'})
 
 def update_property(event: dict) -> dict:
     data = json.loads(event.get('body', '{}'))
     property_id = data.get('id')
     
     if not property_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Property ID required'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute('''
-        UPDATE t_p27119953_apartment_rental_mos.properties
-        SET type = %s, status = %s, name = %s, description = %s, address = %s,
-            metro = %s, price = %s, owner_name = %s, owner_phone = %s,
-            owner_telegram = %s, main_photo = %s, amenities = %s,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    ''', (
-        data.get('type'), data.get('status'), data.get('name'),
-        data.get('description'), data.get('address'), data.get('metro'),
-        data.get('price'), data['owner']['name'], data['owner']['phone'],
-        data['owner'].get('telegram'), data.get('mainPhoto'),
-        data.get('amenities', []), property_id
-    ))
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+        return json_response(400, {'error': 'Property ID required'})
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'message': 'Property updated'}),
-        'isBase64Encoded': False
-    }
+    with db_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute('''
+            UPDATE t_p27119953_apartment_rental_mos.properties
+            SET type = %s, status = %s, name = %s, description = %s, address = %s,
+                metro = %s, price = %s, owner_name = %s, owner_phone = %s,
+                owner_telegram = %s, main_photo = %s, amenities = %s,
+                lat = CASE WHEN %s THEN %s ELSE lat END,
+                lon = CASE WHEN %s THEN %s ELSE lon END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        ''', (
+            data.get('type'), data.get('status'), data.get('name'),
+            data.get('description'), data.get('address'), data.get('metro'),
+            data.get('price'), data['owner']['name'], data['owner']['phone'],
+            data['owner'].get('telegram'), data.get('mainPhoto'),
+            data.get('amenities', []),
+            # Координаты меняются только если пришли в запросе: клиент без lat/lon не стирает их
+            'lat' in data, data.get('lat'), 'lon' in data, data.get('lon'),
+            property_id
+        ))
+        
+        # Форма редактирования присылает только новые фото, поэтому добавляем те, которых ещё нет
+        if data.get('photos'):
+            execute_values(cur, '''
+                INSERT INTO t_p27119953_apartment_rental_mos.property_photos (property_id, photo_url, variants)
+                SELECT v.property_id, v.photo_url, v.variants::jsonb
+                FROM (VALUES %s) AS v(property_id, photo_url, variants)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM t_p27119953_apartment_rental_mos.property_photos ph
+                    WHERE ph.property_id = v.property_id AND ph.photo_url = v.photo_url
+                )
+            ''', [(property_id,) + photo_row(photo) for photo in data['photos']], page_size=1000)
+        
+        conn.commit()
+        cur.close()
+    
+    return json_response(200, {'message': 'Property updated'})
 
 def delete_property(event: dict) -> dict:
     query_params = event.get('queryStringParameters') or {}
     property_id = query_params.get('id')
     
     if not property_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Property ID required'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+        return json_response(400, {'error': 'Property ID required'})
     
-    cur.execute('UPDATE t_p27119953_apartment_rental_mos.properties SET status = %s WHERE id = %s', ('archived', property_id))
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute('UPDATE t_p27119953_apartment_rental_mos.properties SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s', ('archived', property_id))
+        
+        conn.commit()
+        cur.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'message': 'Property archived'}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'message': 'Property archived'})
@@ -1,12 +1,442 @@
 import json
 import os
-import urllib.request
+import time
+import random
+import hashlib
+import hmac
+import threading
+import http.client
 import urllib.parse
+from bisect import bisect_left
+from contextlib import contextmanager
+import psycopg2
+
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# Исходящая очередь заявок: запрос только пишет в brief_outbox, отправкой в Telegram занимается диспетчер
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_INLINE_TIMEOUT = float(os.environ.get('TELEGRAM_INLINE_TIMEOUT', '2'))
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get('TELEGRAM_CONNECT_TIMEOUT', '3'))
+TELEGRAM_TIMEOUT = float(os.environ.get('TELEGRAM_TIMEOUT', '10'))
+TELEGRAM_MIN_INTERVAL = float(os.environ.get('TELEGRAM_MIN_INTERVAL', '1'))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_BACKOFF_BASE = 30
+OUTBOX_BACKOFF_MAX = 3600
+OUTBOX_LEASE_SECONDS = 120
+# Разбор очереди по HTTP (?action=dispatch) доступен только с заголовком X-Dispatch-Secret; таймеру он не нужен
+OUTBOX_DISPATCH_SECRET = os.environ.get('OUTBOX_DISPATCH_SECRET', '')
+
+CATEGORY_LABELS = {
+    'hotel': 'Отель',
+    'apartment': 'Апартамент',
+    'sauna': 'Сауна',
+    'conference': 'Конференц-зал'
+}
+
+def build_message(data: dict) -> str:
+    message_parts = [
+        '🏢 Новая заявка на размещение\n',
+        f'📋 Категория: {CATEGORY_LABELS.get(data.get("category", ""), data.get("category", ""))}',
+        f'🏠 Наименование: {data.get("name", "")}',
+        f'📍 Адрес: {data.get("address", "")}'
+    ]
+    
+    if data.get('metro'):
+        message_parts.append(f'🚇 Метро: {data.get("metro")}')
+    
+    message_parts.append(f'🔢 Количество объектов: {data.get("objectsCount", "")}')
+    
+    if data.get('website'):
+        message_parts.append(f'🌐 Сайт: {data.get("website")}')
+    
+    message_parts.append(f'📞 Телефон: {data.get("phone", "")}')
+    
+    if data.get('telegram'):
+        message_parts.append(f'💬 Telegram: {data.get("telegram")}')
+    
+    message_parts.append(f'👤 Имя собственника: {data.get("ownerName", "")}')
+    
+    return '\n'.join(message_parts)
+
+def idempotency_key(event: dict, data: dict) -> str:
+    """Ключ из заголовка Idempotency-Key, поля idempotencyKey или хеша содержимого заявки"""
+    headers = event.get('headers') or {}
+    key = next((v for k, v in headers.items() if k.lower() == 'idempotency-key'), None)
+    key = key or data.pop('idempotencyKey', None)
+    if key:
+        return str(key)[:200]
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+# Постоянное соединение с Telegram API, автомат отключения и гистограмма задержек живут между тёплыми вызовами
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('BREAKER_RESET_TIMEOUT', '30'))
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class TelegramClient:
+    """HTTP(S)-клиент с keep-alive и раздельными таймаутами на соединение и чтение"""
+    
+    def __init__(self, base_url: str, connect_timeout: float):
+        parts = urllib.parse.urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.connect_timeout = connect_timeout
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def post_json(self, path: str, payload: dict, read_timeout: float) -> tuple:
+        body = json.dumps(payload).encode('utf-8')
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is not None and self._conn.sock is None:
+                    self._close()
+                reused = self._conn is not None
+                try:
+                    if not reused:
+                        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                        self._conn = connection_class(self.host, self.port, timeout=self.connect_timeout)
+                        self._conn.connect()
+                    self._conn.sock.settimeout(read_timeout)
+                    self._conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+                    response = self._conn.getresponse()
+                    data = response.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # Сервер закрыл простаивавшее соединение - переподключаемся один раз
+                    self._close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except Exception:
+                    self._close()
+                    raise
+                if response.will_close:
+                    self._close()
+                return response.status, data
+
+class CircuitBreaker:
+    """Размыкается после серии ошибок и пропускает один пробный запрос через reset_timeout"""
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self._lock = threading.Lock()
+    
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def _trial_in_flight(self) -> bool:
+        # Пробный запрос, не вернувший результат за reset_timeout, считаем потерянным
+        return self.trial_started_at is not None and time.monotonic() - self.trial_started_at < self.reset_timeout
+    
+    def available(self) -> bool:
+        """Пропустит ли allow() запрос сейчас, без захвата пробного слота"""
+        state = self.state()
+        return state == 'closed' or (state == 'half_open' and not self._trial_in_flight())
+    
+    def allow(self) -> bool:
+        """В полуоткрытом состоянии пропускает только один пробный запрос до его результата"""
+        with self._lock:
+            state = self.state()
+            if state == 'closed':
+                return True
+            if state == 'open' or self._trial_in_flight():
+                return False
+            self.trial_started_at = time.monotonic()
+            return True
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+    
+    def release_trial(self) -> None:
+        """Ответ, который не говорит о доступности сервиса (429): счётчик не трогаем, пробный слот освобождаем"""
+        with self._lock:
+            self.trial_started_at = None
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_started_at = None
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+    
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+    
+    def snapshot(self) -> dict:
+        return {'state': self.state(), 'failures': self.failures, 'retry_in': round(self.retry_in(), 1)}
+
+telegram_client = TelegramClient(TELEGRAM_API_URL, TELEGRAM_CONNECT_TIMEOUT)
+telegram_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+telegram_latency = {'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'count': 0, 'sum_ms': 0.0}
+
+def observe_latency(elapsed_ms: float) -> None:
+    telegram_latency['buckets'][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+    telegram_latency['count'] += 1
+    telegram_latency['sum_ms'] += elapsed_ms
+
+def telegram_status() -> dict:
+    """Состояние автомата и гистограмма задержек для ответа функции"""
+    buckets = dict(zip([f'le_{b}' for b in LATENCY_BUCKETS_MS] + ['le_inf'], telegram_latency['buckets']))
+    return {
+        'circuit': telegram_breaker.snapshot(),
+        'latency_ms': {'buckets': buckets, 'count': telegram_latency['count'], 'sum': round(telegram_latency['sum_ms'], 1)}
+    }
+
+def send_telegram(message: str, timeout: float) -> tuple:
+    """Отправка в Telegram; возвращает (ok, retry_after, error)"""
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+    if not bot_token or not chat_id:
+        return False, None, 'Telegram credentials not configured'
+    if not telegram_breaker.allow():
+        return False, None, 'Telegram circuit open'
+    
+    started = time.monotonic()
+    try:
+        status, raw = telegram_client.post_json(
+            f'/bot{bot_token}/sendMessage', {'chat_id': chat_id, 'text': message}, timeout
+        )
+    except Exception as e:
+        telegram_breaker.record_failure()
+        return False, None, f'Telegram request failed: {str(e)}'
+    finally:
+        observe_latency((time.monotonic() - started) * 1000)
+    
+    try:
+        result = json.loads(raw.decode('utf-8'))
+    except ValueError:
+        result = {}
+    
+    # 429 - лимит Telegram, а не сбой: retry_after только откладывает повтор и не размыкает автомат
+    if status == 429:
+        telegram_breaker.release_trial()
+    elif status >= 500:
+        telegram_breaker.record_failure()
+    else:
+        telegram_breaker.record_success()
+    
+    if status == 429:
+        retry_after = result.get('parameters', {}).get('retry_after') or OUTBOX_BACKOFF_BASE
+        return False, retry_after, f'Telegram HTTP Error: 429 - {raw.decode("utf-8", "replace")}'
+    if status != 200:
+        return False, None, f'Telegram HTTP Error: {status} - {raw.decode("utf-8", "replace")}'
+    if result.get('ok'):
+        return True, None, None
+    return False, None, f'Telegram error: {result}'
+
+def enqueue_brief(conn, key: str, data: dict, message: str):
+    """Запись заявки в очередь; None, если заявка с таким ключом уже есть"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO t_p27119953_apartment_rental_mos.brief_outbox (idempotency_key, payload, message)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING id
+        """, (key, json.dumps(data, ensure_ascii=False), message))
+        row = cur.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+def claim_outbox(conn, limit: int, outbox_id=None) -> list:
+    """Забирает готовые к отправке записи под аренду, чтобы параллельные диспетчеры не дублировали отправку"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE t_p27119953_apartment_rental_mos.brief_outbox
+            SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE id IN (
+                SELECT id FROM t_p27119953_apartment_rental_mos.brief_outbox
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                  AND (%s::int IS NULL OR id = %s::int)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, message, attempts
+        """, (OUTBOX_LEASE_SECONDS, outbox_id, outbox_id, limit))
+        rows = cur.fetchall()
+    conn.commit()
+    return sorted(rows)
+
+def record_attempt(conn, outbox_id: int, attempts: int, ok: bool, retry_after, error) -> str:
+    with conn.cursor() as cur:
+        if ok:
+            cur.execute("""
+                UPDATE t_p27119953_apartment_rental_mos.brief_outbox
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, attempts = attempts + 1, last_error = NULL
+                WHERE id = %s
+            """, (outbox_id,))
+            status = 'sent'
+        elif retry_after:
+            # Лимит Telegram: ждём указанное время, попытку не засчитываем
+            cur.execute("""
+                UPDATE t_p27119953_apartment_rental_mos.brief_outbox
+                SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s), last_error = %s
+                WHERE id = %s
+            """, (retry_after, error, outbox_id))
+            status = 'pending'
+        else:
+            attempts += 1
+            status = 'failed' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending'
+            delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+            delay = delay * random.uniform(0.8, 1.2)
+            cur.execute("""
+                UPDATE t_p27119953_apartment_rental_mos.brief_outbox
+                SET status = %s, attempts = %s, last_error = %s,
+                    next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                WHERE id = %s
+            """, (status, attempts, error, delay, outbox_id))
+    conn.commit()
+    return status
+
+def postpone_outbox(conn, outbox_ids: list, delay: float) -> None:
+    if not outbox_ids:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE t_p27119953_apartment_rental_mos.brief_outbox
+            SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE id = ANY(%s)
+        """, (delay, outbox_ids))
+    conn.commit()
+
+def dispatch_outbox(conn, limit: int = OUTBOX_BATCH_SIZE, outbox_id=None, timeout: float = TELEGRAM_TIMEOUT) -> dict:
+    """Отправляет накопившиеся заявки с экспоненциальной задержкой повторов и паузой между сообщениями"""
+    result = {'sent': 0, 'retry': 0, 'failed': 0}
+    rows = claim_outbox(conn, limit, outbox_id)
+    last_sent_at = 0.0
+    
+    for index, (row_id, message, attempts) in enumerate(rows):
+        if not telegram_breaker.available():
+            # Автомат разомкнут: не тратим попытки, откладываем оставшиеся заявки до пробного запроса
+            postpone_outbox(conn, [r[0] for r in rows[index:]], telegram_breaker.retry_in())
+            result['deferred'] = len(rows) - index
+            break
+        wait = TELEGRAM_MIN_INTERVAL - (time.monotonic() - last_sent_at)
+        if wait > 0:
+            time.sleep(wait)
+        ok, retry_after, error = send_telegram(message, timeout)
+        last_sent_at = time.monotonic()
+        if error:
+            print(f'Outbox {row_id}: {error}')
+        status = record_attempt(conn, row_id, attempts, ok, retry_after, error)
+        result['sent' if ok else ('failed' if status == 'failed' else 'retry')] += 1
+        
+        if retry_after:
+            # Остальные заявки пакета откладываем на то же время и не трогаем до окончания лимита
+            postpone_outbox(conn, [r[0] for r in rows[index + 1:]], retry_after)
+            break
+    
+    return result
+
+def json_response(status: int, payload: dict) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(payload)
+    }
+
+def dispatch_authorized(event: dict) -> bool:
+    headers = event.get('headers') or {}
+    secret = next((v for k, v in headers.items() if k.lower() == 'x-dispatch-secret'), None) or ''
+    return bool(OUTBOX_DISPATCH_SECRET) and hmac.compare_digest(secret.encode(), OUTBOX_DISPATCH_SECRET.encode())
 
 def handler(event: dict, context) -> dict:
     '''API для отправки заявок собственников в Telegram'''
     
-    method = event.get('httpMethod', 'POST')
+    method = event.get('httpMethod')
+    query_params = event.get('queryStringParameters') or {}
     
     if method == 'OPTIONS':
         return {
@@ -14,133 +444,52 @@ def handler(event: dict, context) -> dict:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
+                'Access-Control-Allow-Headers': 'Content-Type, Idempotency-Key'
             },
             'body': ''
         }
     
+    # Вызов по таймеру (событие без httpMethod) или ?action=dispatch с секретом - разбор очереди
+    if method is None or query_params.get('action') == 'dispatch':
+        if method is not None and not dispatch_authorized(event):
+            return json_response(403, {'error': 'Forbidden'})
+        try:
+            with db_connection() as conn:
+                return json_response(200, {**dispatch_outbox(conn), 'telegram': telegram_status()})
+        except Exception as e:
+            print(f'Outbox dispatch failed: {str(e)}')
+            return json_response(500, {'error': str(e)})
+    
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return json_response(405, {'error': 'Method not allowed'})
     
     try:
-        data = json.loads(event.get('body', '{}'))
-        
-        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-        chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+        data = json.loads(event.get('body') or '{}')
+        key = idempotency_key(event, data)
+        message = build_message(data)
         
-        print(f'Bot token exists: {bool(bot_token)}')
-        print(f'Chat ID: {chat_id}')
-        print(f'Request data: {data}')
+        with db_connection() as conn:
+            outbox_id = enqueue_brief(conn, key, data, message)
+            delivered = False
+            
+            # Короткая попытка отправить сразу; при неудаче заявка остаётся в очереди и уйдёт с повтором
+            if outbox_id and TELEGRAM_INLINE_TIMEOUT > 0:
+                try:
+                    delivery = dispatch_outbox(conn, limit=1, outbox_id=outbox_id, timeout=TELEGRAM_INLINE_TIMEOUT)
+                    delivered = delivery['sent'] > 0
+                except Exception as e:
+                    print(f'Inline delivery failed for outbox {outbox_id}: {str(e)}')
         
-        if not bot_token or not chat_id:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Telegram credentials not configured'})
-            }
-        
-        category_labels = {
-            'hotel': 'Отель',
-            'apartment': 'Апартамент',
-            'sauna': 'Сауна',
-            'conference': 'Конференц-зал'
-        }
-        
-        message_parts = [
-            '🏢 Новая заявка на размещение\n',
-            f'📋 Категория: {category_labels.get(data.get("category", ""), data.get("category", ""))}',
-            f'🏠 Наименование: {data.get("name", "")}',
-            f'📍 Адрес: {data.get("address", "")}'
-        ]
-        
-        if data.get('metro'):
-            message_parts.append(f'🚇 Метро: {data.get("metro")}')
-        
-        message_parts.append(f'🔢 Количество объектов: {data.get("objectsCount", "")}')
-        
-        if data.get('website'):
-            message_parts.append(f'🌐 Сайт: {data.get("website")}')
-        
-        message_parts.append(f'📞 Телефон: {data.get("phone", "")}')
-        
-        if data.get('telegram'):
-            message_parts.append(f'💬 Telegram: {data.get("telegram")}')
-        
-        message_parts.append(f'👤 Имя собственника: {data.get("ownerName", "")}')
-        
-        message = '\n'.join(message_parts)
-        
-        telegram_url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-        payload = {
-            'chat_id': chat_id,
-            'text': message
-        }
-        
-        req = urllib.request.Request(
-            telegram_url,
-            data=json.dumps(payload).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        print(f'Sending to Telegram: {telegram_url}')
-        print(f'Payload: {payload}')
-        print(f'Message: {message}')
-        
-        try:
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode('utf-8'))
-            print(f'Telegram response: {result}')
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8')
-            print(f'Telegram HTTP Error: {e.code} - {error_body}')
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': f'Telegram API error: {error_body}'})
-            }
-        
-        if result.get('ok'):
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'success': True})
-            }
-        else:
-            print(f'Telegram error: {result}')
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Failed to send Telegram message', 'details': result})
-            }
+        return json_response(200, {
+            'success': True,
+            'queued': True,
+            'duplicate': outbox_id is None,
+            'delivered': delivered,
+            'telegram': telegram_status()
+        })
     
     except Exception as e:
         print(f'Exception: {str(e)}')
         import traceback
         print(f'Traceback: {traceback.format_exc()}')
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        return json_response(500, {'error': str(e)})
\ No newline at end of file
@@ -0,0 +1,291 @@
+"""API для учёта просмотров и кликов по объектам: пакет событий записывается в object_stats одним upsert на объект"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import psycopg2
+from psycopg2.extras import execute_values
+
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# События вызова сводятся в памяти в дельты по объектам и сбрасываются до ответа: таймер приходит
+# в произвольный экземпляр, поэтому буфер не переживает вызов. Между вызовами в нём остаются
+# только дельты, которые не удалось записать, - их дописывает следующий вызов этого экземпляра
+MAX_EVENTS_PER_REQUEST = 100
+HOURLY_RETENTION_DAYS = int(os.environ.get('STATS_HOURLY_RETENTION_DAYS', '14'))
+EVENT_TYPES = ('view', 'click')
+
+_buffer = {}
+_hourly = {}
+_buffer_lock = threading.Lock()
+buffer_stats = {'events': 0, 'flushes': 0, 'rows_written': 0}
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def buffer_events(events: list) -> int:
+    """Складывает события в буфер: на объект хранятся счётчики и время последнего события,
+    отдельно - счётчики за текущий час для агрегатов"""
+    now = utc_now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    with _buffer_lock:
+        for event in events:
+            entry = _buffer.setdefault(event['object_id'], [0, 0, None, None])
+            bucket = _hourly.setdefault((event['object_id'], hour), [0, 0])
+            if event['type'] == 'view':
+                entry[0] += 1
+                entry[2] = now
+                bucket[0] += 1
+            else:
+                entry[1] += 1
+                entry[3] = now
+                bucket[1] += 1
+        buffer_stats['events'] += len(events)
+    return len(events)
+
+def take_buffer() -> tuple:
+    with _buffer_lock:
+        pending = dict(_buffer)
+        hourly = dict(_hourly)
+        _buffer.clear()
+        _hourly.clear()
+    return pending, hourly
+
+def restore_buffer(pending: dict, hourly: dict) -> None:
+    """Возвращает несброшенные дельты в буфер, если запись в БД не удалась"""
+    with _buffer_lock:
+        for key, (views, clicks) in hourly.items():
+            bucket = _hourly.setdefault(key, [0, 0])
+            bucket[0] += views
+            bucket[1] += clicks
+        for object_id, (views, clicks, last_view_at, last_click_at) in pending.items():
+            entry = _buffer.setdefault(object_id, [0, 0, None, None])
+            entry[0] += views
+            entry[1] += clicks
+            entry[2] = max(filter(None, (entry[2], last_view_at)), default=None)
+            entry[3] = max(filter(None, (entry[3], last_click_at)), default=None)
+
+def write_deltas(conn, rows: list) -> None:
+    """Одна запись на объект: прибавляет дельты или создаёт строку статистики.
+    ON CONFLICT по уникальному object_id (V0024) не даёт параллельным сбросам создать дубликаты"""
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO object_stats (object_id, views_count, telegram_clicks_count, last_view_at, last_click_at)
+            SELECT v.object_id, v.views, v.clicks, v.last_view_at, v.last_click_at
+            FROM (VALUES %s) AS v (object_id, views, clicks, last_view_at, last_click_at)
+            JOIN objects o ON o.id = v.object_id
+            ON CONFLICT (object_id) DO UPDATE
+            SET views_count = COALESCE(object_stats.views_count, 0) + EXCLUDED.views_count,
+                telegram_clicks_count = COALESCE(object_stats.telegram_clicks_count, 0) + EXCLUDED.telegram_clicks_count,
+                last_view_at = GREATEST(object_stats.last_view_at, EXCLUDED.last_view_at),
+                last_click_at = GREATEST(object_stats.last_click_at, EXCLUDED.last_click_at)
+        """, rows, template='(%s, %s, %s, %s::timestamp, %s::timestamp)', page_size=len(rows))
+
+def write_rollups(conn, hourly: dict) -> None:
+    """Прибавляет дельты к почасовым и дневным агрегатам; дневные считаются из тех же часов"""
+    daily = {}
+    for (object_id, hour), (views, clicks) in hourly.items():
+        bucket = daily.setdefault((object_id, hour.date()), [0, 0])
+        bucket[0] += views
+        bucket[1] += clicks
+    
+    hourly_rows = [key + tuple(value) for key, value in sorted(hourly.items())]
+    daily_rows = [key + tuple(value) for key, value in sorted(daily.items())]
+    
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO t_p27119953_apartment_rental_mos.object_stats_hourly (object_id, bucket_start, views, telegram_clicks)
+            SELECT v.object_id, v.bucket_start, v.views, v.clicks
+            FROM (VALUES %s) AS v (object_id, bucket_start, views, clicks)
+            JOIN objects o ON o.id = v.object_id
+            ON CONFLICT (object_id, bucket_start) DO UPDATE
+            SET views = object_stats_hourly.views + EXCLUDED.views,
+                telegram_clicks = object_stats_hourly.telegram_clicks + EXCLUDED.telegram_clicks
+        """, hourly_rows, template='(%s, %s::timestamp, %s, %s)', page_size=len(hourly_rows))
+        execute_values(cur, """
+            INSERT INTO t_p27119953_apartment_rental_mos.object_stats_daily (object_id, day, views, telegram_clicks)
+            SELECT v.object_id, v.day, v.views, v.clicks
+            FROM (VALUES %s) AS v (object_id, day, views, clicks)
+            JOIN objects o ON o.id = v.object_id
+            ON CONFLICT (object_id, day) DO UPDATE
+            SET views = object_stats_daily.views + EXCLUDED.views,
+                telegram_clicks = object_stats_daily.telegram_clicks + EXCLUDED.telegram_clicks
+        """, daily_rows, template='(%s, %s::date, %s, %s)', page_size=len(daily_rows))
+
+def prune_hourly(conn) -> int:
+    """Почасовые строки нужны только для недавних графиков, старые удаляются"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM t_p27119953_apartment_rental_mos.object_stats_hourly
+            WHERE bucket_start < %s
+        """, (utc_now() - timedelta(days=HOURLY_RETENTION_DAYS),))
+        return cur.rowcount
+
+def flush_buffer() -> int:
+    pending, hourly = take_buffer()
+    if not pending:
+        return 0
+    rows = [(object_id,) + tuple(entry) for object_id, entry in sorted(pending.items())]
+    try:
+        # Итоги и агрегаты пишутся в одной транзакции, чтобы не разойтись при повторном сбросе
+        with db_connection() as conn:
+            write_deltas(conn, rows)
+            write_rollups(conn, hourly)
+            conn.commit()
+    except Exception:
+        restore_buffer(pending, hourly)
+        raise
+    buffer_stats['flushes'] += 1
+    buffer_stats['rows_written'] += len(rows)
+    return len(rows)
+
+def parse_events(data) -> list:
+    """Одно событие {object_id, type} или пакет {"events": [...]}; ValueError при неверных данных"""
+    events = data.get('events') if isinstance(data, dict) and 'events' in data else [data]
+    if not isinstance(events, list) or not events or len(events) > MAX_EVENTS_PER_REQUEST:
+        raise ValueError(f'events must be a list of 1..{MAX_EVENTS_PER_REQUEST} items')
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES:
+            raise ValueError('event type must be view or click')
+        parsed.append({'object_id': int(event['object_id']), 'type': event['type']})
+    return parsed
+
+def handler(event: dict, context) -> dict:
+    """Приём событий просмотров и кликов по Telegram"""
+    method = event.get('httpMethod')
+    
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': ''
+        }
+    
+    # Вызов по таймеру (событие без httpMethod) - дозапись несброшенных дельт и очистка старых часов
+    if method is None:
+        try:
+            flushed_objects = flush_buffer()
+            with db_connection() as conn:
+                pruned = prune_hourly(conn)
+                conn.commit()
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'flushed_objects': flushed_objects, 'pruned_hours': pruned, 'stats': buffer_stats})
+            }
+        except Exception as e:
+            print(f'Error in track-stats flush: {str(e)}')
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Internal server error'})
+            }
+    
+    if method != 'POST':
+        return {
+            'statusCode': 405,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'})
+        }
+    
+    try:
+        events = parse_events(json.loads(event.get('body') or '{}'))
+    except (ValueError, TypeError, KeyError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid events'})
+        }
+    
+    accepted = buffer_events(events)
+    flushed_objects = 0
+    try:
+        flushed_objects = flush_buffer()
+    except Exception as e:
+        # Дельты вернулись в буфер и уйдут со следующим вызовом этого экземпляра
+        print(f'Error in track-stats flush: {str(e)}')
+    
+    return {
+        'statusCode': 202,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'accepted': accepted, 'flushed_objects': flushed_objects})
+    }
\ No newline at end of file
@@ -1,13 +1,428 @@
 """API для загрузки изображений в S3"""
 import json
 import os
+import io
+import re
 import boto3
+from botocore.config import Config
 import base64
 import uuid
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from PIL import Image, ImageOps
+from tempfile import SpooledTemporaryFile
 from datetime import datetime
 
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', 'https://bucket.poehali.dev')
+S3_BUCKET = 'files'
+PRESIGN_EXPIRES = int(os.environ.get('PRESIGN_EXPIRES', '300'))
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', str(20 * 1024 * 1024)))
+DECODE_CHUNK_SIZE = 64 * 1024  # кратно 4, чтобы base64 декодировался кусками без склейки
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '8'))
+MAX_BATCH_FILES = 50
+
+# Производные размеры для карточек и srcset; метаданные (EXIF и т.п.) при пересжатии не копируются
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True})
+)
+SAFE_NAME_RE = re.compile(r'^hotel-[0-9-]+-[0-9a-f]{8}\.[a-z0-9]+$')
+
+# Копии строятся по таймеру вне запроса загрузки: оригинал сохраняется сразу, а variants появляются в фото позже
+DERIVATIVES_BATCH_SIZE = int(os.environ.get('DERIVATIVES_BATCH_SIZE', '10'))
+DERIVATIVES_TIME_BUDGET = float(os.environ.get('DERIVATIVES_TIME_BUDGET', '20'))
+DERIVATIVES_LEASE = 120
+DERIVATIVES_MAX_ATTEMPTS = 5
+DERIVATIVES_BACKOFF_BASE = 30
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+# >>> shared/db_pool.py - не править здесь, см. scripts/sync_shared.py
+# Пул соединений с БД живёт на уровне модуля и переиспользуется между тёплыми вызовами
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_CONN_MAX_AGE = float(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_CONN_CHECK_AFTER = float(os.environ.get('DB_CONN_CHECK_AFTER', '30'))
+
+_pool_idle = []
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
+def _connection_alive(conn) -> bool:
+    """Проверка соединения, которое долго простаивало в пуле"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def _acquire_connection():
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            entry = _pool_idle.pop() if _pool_idle else None
+        if entry is None:
+            break
+        conn, created_at, released_at = entry
+        if conn.closed or now - created_at > DB_CONN_MAX_AGE:
+            _discard_connection(conn)
+            continue
+        if now - released_at > DB_CONN_CHECK_AFTER and not _connection_alive(conn):
+            _discard_connection(conn)
+            continue
+        pool_stats['hits'] += 1
+        return conn, created_at
+    pool_stats['misses'] += 1
+    return psycopg2.connect(os.environ['DATABASE_URL']), now
+
+@contextmanager
+def db_connection():
+    """Соединение из пула; после использования возвращается обратно или закрывается"""
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn, created_at = _acquire_connection()
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if broken or conn.closed:
+                _discard_connection(conn)
+            else:
+                try:
+                    conn.rollback()
+                    with _pool_lock:
+                        _pool_idle.append((conn, created_at, time.monotonic()))
+                except psycopg2.Error:
+                    _discard_connection(conn)
+        _pool_slots.release()
+# <<< shared/db_pool.py
+
+# Клиент S3 создаётся один раз и переиспользуется между тёплыми вызовами
+_s3_client = None
+_s3_lock = threading.Lock()
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client(
+                    's3',
+                    endpoint_url=S3_ENDPOINT_URL,
+                    aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                    aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+                    config=Config(max_pool_connections=max(10, UPLOAD_CONCURRENCY * 2))
+                )
+    return _s3_client
+
+def make_object_name(file_name: str) -> tuple:
+    """Уникальное имя объекта в бакете и его Content-Type"""
+    ext = file_name.split('.')[-1].lower()
+    content_type = CONTENT_TYPES.get(ext, 'image/jpeg')
+    
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    unique_id = str(uuid.uuid4())[:8]
+    return f"hotel-{timestamp}-{unique_id}.{ext}", content_type
+
+def cdn_url(safe_name: str) -> str:
+    return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{safe_name}"
+
+def decode_base64_to_file(file_data: str, start: int) -> SpooledTemporaryFile:
+    """Декодирует base64 кусками во временный файл, не создавая копию всех байт в памяти"""
+    buffer = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for offset in range(start, len(file_data), DECODE_CHUNK_SIZE):
+        buffer.write(base64.b64decode(file_data[offset:offset + DECODE_CHUNK_SIZE]))
+    buffer.seek(0)
+    return buffer
+
+def build_derivatives(file_obj, safe_name: str) -> list:
+    """Уменьшенные копии оригинала в WebP и JPEG; возвращает их размеры и URL"""
+    stem = safe_name.rsplit('.', 1)[0]
+    s3 = get_s3_client()
+    variants = []
+    
+    with Image.open(file_obj) as source:
+        # Поворот по EXIF применяем до пересжатия, т.к. сами метаданные не сохраняются
+        original = ImageOps.exif_transpose(source)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        
+        for width in DERIVATIVE_WIDTHS:
+            if width > original.width and variants:
+                break
+            image = original.copy()
+            image.thumbnail((width, original.height), Image.LANCZOS)
+            variant = {'width': image.width, 'height': image.height}
+            
+            for ext, image_format, content_type, options in DERIVATIVE_FORMATS:
+                frame = image.convert('RGB') if image_format == 'JPEG' and image.mode != 'RGB' else image
+                buffer = io.BytesIO()
+                frame.save(buffer, image_format, **options)
+                buffer.seek(0)
+                key = f'{stem}-{width}w.{ext}'
+                s3.upload_fileobj(buffer, S3_BUCKET, key, ExtraArgs={
+                    'ContentType': content_type,
+                    'CacheControl': 'public, max-age=31536000, immutable'
+                })
+                variant[ext] = cdn_url(key)
+            variants.append(variant)
+    
+    return variants
+
+def derivatives_payload(variants: list) -> dict:
+    return {
+        'variants': variants,
+        'srcset': {
+            'webp': ', '.join(f"{v['webp']} {v['width']}w" for v in variants),
+            'jpeg': ', '.join(f"{v['jpg']} {v['width']}w" for v in variants)
+        }
+    }
+
+def record_upload(safe_name: str) -> None:
+    """Ставит загруженный оригинал в очередь на построение копий"""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO t_p27119953_apartment_rental_mos.image_variants (file_name, url)
+                VALUES (%s, %s)
+                ON CONFLICT (file_name) DO NOTHING
+            """, (safe_name, cdn_url(safe_name)))
+        conn.commit()
+
+def store_variants(cur, safe_name: str, variants: list) -> None:
+    """Готовые копии; триггер image_variants переносит их во все фото с этим URL"""
+    cur.execute("""
+        INSERT INTO t_p27119953_apartment_rental_mos.image_variants (file_name, url, status, variants)
+        VALUES (%s, %s, 'ready', %s)
+        ON CONFLICT (file_name) DO UPDATE
+        SET status = 'ready', variants = EXCLUDED.variants, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+    """, (safe_name, cdn_url(safe_name), json.dumps(variants)))
+
+def build_stored_derivatives(safe_name: str) -> list:
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as file_obj:
+        get_s3_client().download_fileobj(S3_BUCKET, safe_name, file_obj)
+        file_obj.seek(0)
+        return build_derivatives(file_obj, safe_name)
+
+def claim_pending(conn, limit: int) -> list:
+    """Забирает ожидающие оригиналы под аренду, чтобы параллельные вызовы не строили одно и то же"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE t_p27119953_apartment_rental_mos.image_variants
+            SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE file_name IN (
+                SELECT file_name FROM t_p27119953_apartment_rental_mos.image_variants
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING file_name, attempts
+        """, (DERIVATIVES_LEASE, limit))
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+def mark_failed_attempt(cur, safe_name: str, attempts: int, error: Exception) -> str:
+    """Повтор с экспоненциальной задержкой; после DERIVATIVES_MAX_ATTEMPTS попыток - failed"""
+    status = 'failed' if attempts + 1 >= DERIVATIVES_MAX_ATTEMPTS else 'pending'
+    cur.execute("""
+        UPDATE t_p27119953_apartment_rental_mos.image_variants
+        SET status = %s, attempts = attempts + 1, last_error = %s, updated_at = CURRENT_TIMESTAMP,
+            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+        WHERE file_name = %s
+    """, (status, str(error)[:1000], DERIVATIVES_BACKOFF_BASE * 2 ** attempts, safe_name))
+    return status
+
+def process_pending() -> dict:
+    """Вызов по таймеру: строит копии для ожидающих оригиналов в пределах бюджета времени.
+    Соединение берётся только на короткие записи: скачивание, пересжатие и загрузка копий идут без него"""
+    result = {'ready': 0, 'retry': 0, 'failed': 0}
+    started = time.monotonic()
+    with db_connection() as conn:
+        rows = claim_pending(conn, DERIVATIVES_BATCH_SIZE)
+    
+    for index, (safe_name, attempts) in enumerate(rows):
+        if time.monotonic() - started > DERIVATIVES_TIME_BUDGET:
+            # Остальные вернутся в очередь по истечении аренды
+            result['deferred'] = len(rows) - index
+            break
+        try:
+            variants = build_stored_derivatives(safe_name)
+        except Exception as e:
+            print(f'Derivatives failed for {safe_name}: {str(e)}')
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    status = mark_failed_attempt(cur, safe_name, attempts, e)
+                conn.commit()
+            result['failed' if status == 'failed' else 'retry'] += 1
+            continue
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                store_variants(cur, safe_name, variants)
+            conn.commit()
+        result['ready'] += 1
+    return result
+
+def create_derivatives(body: dict) -> dict:
+    """Синхронная стадия после прямой загрузки: строит копии для уже лежащего в бакете файла и сохраняет их.
+    Клиент, которому копии не нужны сразу, может не вызывать её - файл достроит таймер, если записан в очередь"""
+    safe_name = body.get('fileName', '')
+    if not SAFE_NAME_RE.match(safe_name):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid fileName'}),
+            'isBase64Encoded': False
+        }
+    
+    variants = build_stored_derivatives(safe_name)
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            store_variants(cur, safe_name, variants)
+        conn.commit()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'url': cdn_url(safe_name), 'fileName': safe_name, **derivatives_payload(variants)}),
+        'isBase64Encoded': False
+    }
+
+class FileTooLarge(ValueError):
+    """Файл больше MAX_UPLOAD_SIZE; обнаруживается по длине base64 до декодирования"""
+
+def decoded_size(file_data: str, start: int) -> int:
+    """Размер байт после декодирования base64 по длине строки: 4 символа - 3 байта минус паддинг"""
+    padding = 2 if file_data.endswith('==') else 1 if file_data.endswith('=') else 0
+    return (len(file_data) - start) * 3 // 4 - padding
+
+def upload_base64_file(file_data: str, file_name: str) -> dict:
+    """Загрузка одного файла из base64; уменьшенные копии строятся позже по таймеру"""
+    # Декодируем base64 (префикс data:...;base64, пропускаем без копирования строки)
+    start = file_data.find(',') + 1
+    if decoded_size(file_data, start) > MAX_UPLOAD_SIZE:
+        raise FileTooLarge(f'File exceeds {MAX_UPLOAD_SIZE} bytes')
+    safe_name, content_type = make_object_name(file_name)
+    
+    with decode_base64_to_file(file_data, start) as file_obj:
+        get_s3_client().upload_fileobj(
+            file_obj,
+            S3_BUCKET,
+            safe_name,
+            ExtraArgs={'ContentType': content_type}
+        )
+    record_upload(safe_name)
+    
+    return {'url': cdn_url(safe_name), 'fileName': safe_name, 'variants': [], 'derivatives': 'pending'}
+
+def upload_batch(files: list) -> dict:
+    """Параллельная загрузка галереи общим клиентом; результаты в порядке входного списка"""
+    if not isinstance(files, list) or not files or len(files) > MAX_BATCH_FILES:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'files must be a list of 1..{MAX_BATCH_FILES} items'}),
+            'isBase64Encoded': False
+        }
+    
+    def upload_one(item) -> dict:
+        try:
+            if not isinstance(item, dict) or not item.get('file'):
+                return {'ok': False, 'error': 'No file data provided'}
+            return {'ok': True, **upload_base64_file(item['file'], item.get('fileName', 'image.jpg'))}
+        except FileTooLarge as e:
+            return {'ok': False, 'error': str(e), 'maxSize': MAX_UPLOAD_SIZE}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+    
+    get_s3_client()
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_CONCURRENCY, len(files))) as executor:
+        results = list(executor.map(upload_one, files))
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'results': results,
+            'uploaded': sum(1 for r in results if r['ok']),
+            'failed': sum(1 for r in results if not r['ok'])
+        }),
+        'isBase64Encoded': False
+    }
+
+def presign_upload(body: dict) -> dict:
+    """Короткоживущая ссылка, по которой браузер загружает файл прямо в бакет"""
+    safe_name, content_type = make_object_name(body.get('fileName', 'image.jpg'))
+    s3 = get_s3_client()
+    # Копии для файла достроит таймер; если загрузка так и не состоится, запись уйдёт в failed после повторов
+    record_upload(safe_name)
+    
+    if body.get('mode') == 'presign_post':
+        post = s3.generate_presigned_post(
+            Bucket=S3_BUCKET,
+            Key=safe_name,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, MAX_UPLOAD_SIZE]],
+            ExpiresIn=PRESIGN_EXPIRES
+        )
+        upload = {'method': 'POST', 'uploadUrl': post['url'], 'fields': post['fields']}
+    else:
+        upload_url = s3.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': S3_BUCKET, 'Key': safe_name, 'ContentType': content_type},
+            ExpiresIn=PRESIGN_EXPIRES
+        )
+        upload = {'method': 'PUT', 'uploadUrl': upload_url, 'headers': {'Content-Type': content_type}}
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({**upload, 'url': cdn_url(safe_name), 'fileName': safe_name, 'expiresIn': PRESIGN_EXPIRES}),
+        'isBase64Encoded': False
+    }
+
 def handler(event: dict, context) -> dict:
-    method = event.get('httpMethod', 'POST')
+    method = event.get('httpMethod')
+    
+    # Вызов по таймеру (событие без httpMethod) - построение копий для загруженных оригиналов
+    if method is None:
+        try:
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps(process_pending()),
+                'isBase64Encoded': False
+            }
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': str(e)}),
+                'isBase64Encoded': False
+            }
     
     if method == 'OPTIONS':
         return {
@@ -31,6 +446,19 @@ def handler(event: dict, context) -> dict:
     
     try:
         body = json.loads(event.get('body', '{}'))
+        
+        # {"mode": "presign" | "presign_post", "fileName": ...} - выдать ссылку для прямой загрузки
+        if body.get('mode') in ('presign', 'presign_post'):
+            return presign_upload(body)
+        
+        # {"mode": "derivatives", "fileName": ...} - построить уменьшенные копии после прямой загрузки
+        if body.get('mode') == 'derivatives':
+            return create_derivatives(body)
+        
+        # {"files": [{"file": ..., "fileName": ...}, ...]} - пакетная загрузка галереи
+        if 'files' in body:
+            return upload_batch(body['files'])
+        
         file_data = body.get('file')
         file_name = body.get('fileName', 'image.jpg')
         
@@ -42,52 +470,20 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        # Декодируем base64
-        if ',' in file_data:
-            file_data = file_data.split(',')[1]
-        
-        file_bytes = base64.b64decode(file_data)
-        
-        # Определяем тип файла
-        content_type = 'image/jpeg'
-        ext = file_name.split('.')[-1].lower()
-        if ext == 'png':
-            content_type = 'image/png'
-        elif ext == 'gif':
-            content_type = 'image/gif'
-        elif ext == 'webp':
-            content_type = 'image/webp'
-        
-        # Генерируем уникальное имя файла
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        unique_id = str(uuid.uuid4())[:8]
-        safe_name = f"hotel-{timestamp}-{unique_id}.{ext}"
-        
-        # Загружаем в S3
-        s3 = boto3.client(
-            's3',
-            endpoint_url='https://bucket.poehali.dev',
-            aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-            aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-        )
-        
-        s3.put_object(
-            Bucket='files',
-            Key=safe_name,
-            Body=file_bytes,
-            ContentType=content_type
-        )
-        
-        # Формируем CDN URL
-        cdn_url = f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{safe_name}"
-        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'url': cdn_url, 'fileName': safe_name}),
+            'body': json.dumps(upload_base64_file(file_data, file_name)),
+            'isBase64Encoded': False
+        }
+    
+    except FileTooLarge as e:
+        return {
+            'statusCode': 413,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e), 'maxSize': MAX_UPLOAD_SIZE}),
             'isBase64Encoded': False
         }
-        
     except Exception as e:
         return {
             'statusCode': 500,
@@ -0,0 +1,92 @@
+"""Бенчмарк ответа каталога из 10k строк: выборка курсором + сериализация.
+
+Сравнивает RealDictCursor + json.dumps(default=str) (как было), RealDictCursor + dumps
+и обычный курсор + rows_payload из кортежей. Строки генерирует generate_series с теми же типами
+колонок, что у каталога properties, поэтому база только читается. Нужны зависимости функции
+properties (psycopg2-binary, orjson):
+
+    pip install -r backend/properties/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/catalog_json.py [rows]
+"""
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+ROOT = Path(__file__).resolve().parent.parent
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+REPEATS = 9
+
+CATALOG_SQL = '''
+    SELECT i AS id, 'apartment' AS type, 'active' AS status, 'Апартаменты у метро №' || i AS name,
+           repeat('Уютная квартира с ремонтом, рядом парк и магазины. ', 3) AS description,
+           'Москва, ул. Тверская, д. ' || (i %% 300) AS address, 'Тверская' AS metro,
+           (1500 + i %% 20000)::numeric(10, 2) AS price, 'Иван Петров' AS owner_name,
+           '+7 999 123-45-67' AS owner_phone, '@owner' AS owner_telegram,
+           'https://cdn.poehali.dev/files/' || i || '-0.jpg' AS main_photo,
+           ARRAY['wifi', 'tv', 'parking', 'kitchen'] AS amenities, 'admin' AS created_by,
+           now() - i * interval '1 minute' AS created_at, now() - i * interval '30 second' AS updated_at,
+           CASE WHEN i %% 5 = 0 THEN NULL ELSE 55.75 + (i %% 1000) / 10000.0 END AS lat,
+           CASE WHEN i %% 5 = 0 THEN NULL ELSE 37.61 + (i %% 700) / 10000.0 END AS lon,
+           ARRAY(SELECT 'https://cdn.poehali.dev/files/' || i || '-' || k || '.jpg' FROM generate_series(0, 3) k) AS photos,
+           json_build_object('https://cdn.poehali.dev/files/' || i || '-0.jpg',
+                             json_build_object('w320', 'w320.webp', 'w960', 'w960.webp')) AS photo_variants,
+           i %% 12 AS room_count,
+           json_build_array(json_build_object('name', 'Тверская', 'line', '2', 'walk_minutes', 7)) AS nearest_metro
+    FROM generate_series(1, %s) i
+'''
+
+def load_properties():
+    spec = importlib.util.spec_from_file_location('properties_index', ROOT / 'backend/properties/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def measure(label: str, func) -> str:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f'{label:<48} median {timings[len(timings) // 2] * 1000:8.1f} ms   {len(body) / 1e6:.1f} MB')
+    return body
+
+def main() -> None:
+    properties = load_properties()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    orjson = properties.orjson
+    print(f'{ROWS} строк, orjson {getattr(orjson, "__version__", "не установлен")}')
+
+    def fetch(cursor_factory=None):
+        # Все выборки в одной транзакции: now() и строки совпадают между вариантами
+        with conn.cursor(cursor_factory=cursor_factory) as cur:
+            cur.execute(CATALOG_SQL, (ROWS,))
+            return properties.cursor_columns(cur), cur.fetchall()
+
+    print('Выборка + сериализация:')
+    measure('RealDictCursor + json.dumps(default=str) (было)', lambda: json.dumps(
+        fetch(RealDictCursor)[1], default=str
+    ))
+    expected = json.loads(measure('RealDictCursor + dumps', lambda: properties.dumps(fetch(RealDictCursor)[1])))
+    body = measure('курсор + rows_payload', lambda: properties.dumps(properties.rows_payload(*fetch())))
+    assert json.loads(body) == expected
+
+    columns, rows = fetch()
+    print('Только сериализация уже выбранных строк:')
+    for name, encoder in (('orjson', orjson), ('stdlib', None)):
+        if name == 'orjson' and orjson is None:
+            continue
+        properties.orjson = encoder
+        body = measure(f'rows_payload + dumps ({name})', lambda: properties.dumps(properties.rows_payload(columns, rows)))
+        assert json.loads(body) == expected
+    properties.orjson = orjson
+    conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Бенчмарк поиска по каталогу (?entity=search): полнотекстовая часть, триграммы и их сочетание.
+
+Каталог из 10k активных объектов засевается внутри транзакции, которая в конце откатывается.
+Для набора запросов - обычных и с опечатками - замеряются p50/p95 и число найденных строк:
+- "до": ILIKE по названию, метро, адресу и описанию (последовательный просмотр);
+- только search_vector @@ websearch_to_tsquery('russian', q) с ts_rank (GIN по search_vector);
+- только триграммы: lower(q) <% search_text с word_similarity (GIN gin_trgm_ops);
+- текущий search_listings из backend/hotels-api: оба условия через OR, ранжирование суммой
+  и ts_headline для строк страницы.
+Для каждого варианта печатается, какими индексами идёт план. Запускать на dev-базе со всеми
+миграциями (V0020 требует pg_trgm; без расширения замеряется только полнотекстовая часть):
+
+    pip install -r backend/hotels-api/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/catalog_search.py [rows]
+"""
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+ROOT = Path(__file__).resolve().parent.parent
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+REPEATS = 20
+PAGE_SIZE = 20
+
+# Точные запросы и запросы с опечатками: на вторых полнотекстовая часть ничего не находит
+QUERIES = {
+    'точные': ['сауна', 'квартира с балконом', 'Белорусская', 'хамам купель', 'камин мангал терраса'],
+    'с опечатками': ['саунна', 'белоруская', 'тверска', 'апартамены', 'мини отел']
+}
+# План показываем на избирательном запросе: по частому слову Postgres честно выбирает Seq Scan
+PLAN_QUERY = 'камин мангал терраса'
+
+SEED_SQL = '''
+    INSERT INTO t_p27119953_apartment_rental_mos.properties
+    (type, status, name, description, address, metro, price, owner_name, owner_phone)
+    SELECT (ARRAY['apartment', 'hotel', 'sauna', 'conference'])[1 + i %% 4], 'active',
+           (ARRAY['Уютная', 'Светлая', 'Просторная', 'Тихая', 'Стильная', 'Видовая', 'Семейная'])[1 + i %% 7] || ' ' ||
+           (ARRAY['квартира', 'студия', 'гостиница', 'сауна', 'лофт', 'апартаменты', 'мини-отель', 'хостел'])[1 + i %% 8] ||
+           ' №' || i,
+           (SELECT string_agg((ARRAY['рядом', 'метро', 'парковка', 'кухня', 'балкон', 'вид', 'реку', 'джакузи',
+                                     'бассейн', 'завтрак', 'хамам', 'купель', 'проектор', 'флипчарт', 'тихий',
+                                     'двор', 'центр', 'командировка', 'ремонт', 'кондиционер', 'посуточно',
+                                     'почасово', 'документы', 'бильярд', 'терраса', 'камин', 'сад', 'мангал',
+                                     'детская', 'кроватка', 'лифт', 'консьерж', 'охрана', 'мансарда', 'панорамные',
+                                     'окна', 'душ', 'ванна', 'стиральная', 'машина'])[1 + (hashint4(i * 100 + k) & 2147483647) %% 40], ' ')
+            FROM generate_series(1, 8 + i %% 8) k),
+           'Москва, ул. ' || (ARRAY['Тверская', 'Арбат', 'Остоженка', 'Пятницкая', 'Лесная', 'Садовая', 'Покровка'])[1 + i %% 7] ||
+           ', д. ' || (1 + i %% 120),
+           (ARRAY['Белорусская', 'Маяковская', 'Курская', 'Сокол', 'Парк Культуры', 'Таганская', 'Динамо'])[1 + i %% 7],
+           1000 + i %% 19000, 'Владелец', '+7 900 000-00-00'
+    FROM generate_series(1, %s) i
+'''
+
+BEFORE_SQL = '''
+    SELECT p.id, p.name
+    FROM t_p27119953_apartment_rental_mos.properties p
+    WHERE p.status = 'active' AND (p.name ILIKE %(like)s OR p.metro ILIKE %(like)s
+                                   OR p.address ILIKE %(like)s OR p.description ILIKE %(like)s)
+    ORDER BY p.id
+    LIMIT %(limit)s
+'''
+
+TSQUERY_SQL = '''
+    SELECT p.id, p.name, ts_rank(p.search_vector, websearch_to_tsquery('russian', %(q)s), 32) AS score
+    FROM t_p27119953_apartment_rental_mos.properties p
+    WHERE p.status = 'active' AND p.search_vector @@ websearch_to_tsquery('russian', %(q)s)
+    ORDER BY score DESC, p.id
+    LIMIT %(limit)s
+'''
+
+TRIGRAM_SQL = '''
+    SELECT p.id, p.name, word_similarity(lower(%(q)s), p.search_text) AS score
+    FROM t_p27119953_apartment_rental_mos.properties p
+    WHERE p.status = 'active' AND lower(%(q)s) <%% p.search_text
+    ORDER BY score DESC, p.id
+    LIMIT %(limit)s
+'''
+
+def load_hotels_api():
+    spec = importlib.util.spec_from_file_location('hotels_api_index', ROOT / 'backend/hotels-api/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def has_trigrams(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+               AND EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_schema = 't_p27119953_apartment_rental_mos'
+                             AND table_name = 'properties' AND column_name = 'search_text')
+        ''')
+        return cur.fetchone()[0]
+
+def seed(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, (ROWS,))
+        cur.execute('ANALYZE t_p27119953_apartment_rental_mos.properties')
+
+def plan_indexes(conn, sql: str, params: dict) -> str:
+    """Индексы, по которым идёт план; 'Seq Scan', если ни одного"""
+    with conn.cursor() as cur:
+        cur.execute('EXPLAIN ' + sql, params)
+        plan = '\n'.join(row[0] for row in cur.fetchall())
+    indexes = sorted(set(re.findall(r'Index (?:Only )?Scan (?:Backward )?on (\w+)', plan)))
+    return ', '.join(indexes) or 'Seq Scan'
+
+def measure(conn, label: str, run, plan_sql: str = None, params=None) -> None:
+    for group, queries in QUERIES.items():
+        timings, found = [], []
+        for _ in range(REPEATS):
+            for text in queries:
+                started = time.perf_counter()
+                rows = run(text)
+                timings.append(time.perf_counter() - started)
+                found.append(len(rows))
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1000
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+        hits = found[-len(queries):]
+        print(f'  {label:<34} {group:<13} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   найдено {hits}')
+    if plan_sql:
+        print(f'  {"":<34} план для «{PLAN_QUERY}»: {plan_indexes(conn, plan_sql, params(PLAN_QUERY))}')
+
+def main() -> None:
+    hotels_api = load_hotels_api()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    trigrams = has_trigrams(conn)
+
+    def fetch(sql: str, params: dict) -> list:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def like_params(text: str) -> dict:
+        return {'like': f'%{text}%', 'limit': PAGE_SIZE}
+
+    def query_params(text: str) -> dict:
+        return {'q': text, 'limit': PAGE_SIZE}
+
+    def search(text: str) -> list:
+        search = hotels_api.parse_search_query({'q': text, 'limit': str(PAGE_SIZE)})
+        response = hotels_api.search_listings(conn, search)
+        return json.loads(response['body'])['items']
+
+    try:
+        seed(conn)
+        print(f'Каталог: {ROWS} активных объектов, страница {PAGE_SIZE}, {REPEATS} повторов')
+        measure(conn, 'до: ILIKE по четырём полям', lambda t: fetch(BEFORE_SQL, like_params(t)), BEFORE_SQL, like_params)
+        measure(conn, 'websearch_to_tsquery + ts_rank', lambda t: fetch(TSQUERY_SQL, query_params(t)), TSQUERY_SQL, query_params)
+        if not trigrams:
+            print('  pg_trgm или search_text недоступны - триграммы и search_listings пропущены')
+            return
+        measure(conn, 'триграммы <% + word_similarity', lambda t: fetch(TRIGRAM_SQL, query_params(t)), TRIGRAM_SQL, query_params)
+        measure(conn, 'search_listings (OR + headline)', search)
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Нагрузочный прогон входа собственников (backend/auth): p95, доля 503 и выдачи соединений из пула.
+
+Функция загружается в процесс, handler вызывается из пула потоков с разной параллельностью.
+Каждый запрос приходит с отдельного IP и ротирует логины, а бакеты лимита попыток обнуляются
+перед каждым уровнем, поэтому 429 не мешает замеру. Половина владельцев засевается со старым
+SHA-256 хешем: их первый вход перехеширует пароль в scrypt и добавляет вторую выдачу соединения.
+Для каждого уровня печатаются p50/p95, доля ответов 503 (очередь хеширования переполнена), сколько
+раз соединение бралось из пула, пик одновременно занятых соединений и среднее время удержания -
+scrypt идёт без занятого соединения, поэтому оно порядка одного запроса, а не времени хеширования.
+
+Владельцы bench-login-* создаются в начале и удаляются в конце. Запускать на dev-базе:
+
+    pip install -r backend/auth/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/concurrent_logins.py [1 8 32 64]
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+
+ROOT = Path(__file__).resolve().parent.parent
+CONCURRENCY = [int(level) for level in sys.argv[1:]] or [1, 8, 32, 64]
+REQUESTS_PER_LEVEL = 200
+OWNERS = 100
+PASSWORD = 'bench-password'
+USERNAME_PREFIX = 'bench-login-'
+
+def load_auth():
+    # Подпись токенов нужна только для успешного ответа; бенчмарку достаточно временного ключа
+    os.environ.setdefault('AUTH_SIGNING_KEYS', 'bench:bench-secret')
+    spec = importlib.util.spec_from_file_location('auth_index', ROOT / 'backend/auth/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def seed(auth) -> None:
+    scrypt_hash = auth.hash_password(PASSWORD)
+    legacy_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    with psycopg2.connect(os.environ['DATABASE_URL']) as conn, conn.cursor() as cur:
+        cur.execute('DELETE FROM owners WHERE username LIKE %s', (USERNAME_PREFIX + '%',))
+        cur.executemany(
+            'INSERT INTO owners (username, password_hash, full_name) VALUES (%s, %s, %s)',
+            [(f'{USERNAME_PREFIX}{i}', legacy_hash if i % 2 else scrypt_hash, f'Владелец {i}') for i in range(OWNERS)]
+        )
+    conn.close()
+
+def cleanup() -> None:
+    with psycopg2.connect(os.environ['DATABASE_URL']) as conn, conn.cursor() as cur:
+        cur.execute('DELETE FROM owners WHERE username LIKE %s', (USERNAME_PREFIX + '%',))
+    conn.close()
+
+class PoolProbe:
+    """Обёртка над db_connection функции: число выдач, пик занятых соединений и время удержания"""
+
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak = 0
+        self.held = 0.0
+
+    @contextmanager
+    def __call__(self):
+        with self.db_connection() as conn:
+            with self.lock:
+                self.checkouts += 1
+                self.in_use += 1
+                self.peak = max(self.peak, self.in_use)
+            started = time.perf_counter()
+            try:
+                yield conn
+            finally:
+                with self.lock:
+                    self.in_use -= 1
+                    self.held += time.perf_counter() - started
+
+def login(auth, request_no: int) -> tuple:
+    event = {
+        'httpMethod': 'POST',
+        'headers': {'Content-Type': 'application/json'},
+        'requestContext': {'identity': {'sourceIp': f'10.{request_no // 65536 % 256}.{request_no // 256 % 256}.{request_no % 256}'}},
+        'body': json.dumps({'username': f'{USERNAME_PREFIX}{request_no % OWNERS}', 'password': PASSWORD})
+    }
+    started = time.perf_counter()
+    response = auth.handler(event, None)
+    return response['statusCode'], time.perf_counter() - started
+
+def run_level(auth, probe: PoolProbe, concurrency: int, first_request: int) -> None:
+    probe.reset()
+    auth.login_buckets = auth.LocalBuckets(auth.LOGIN_RATE_MAX_KEYS)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(lambda n: login(auth, n), range(first_request, first_request + REQUESTS_PER_LEVEL)))
+        elapsed = time.perf_counter() - started
+    statuses = Counter(status for status, _ in results)
+    timings = sorted(duration for _, duration in results)
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    held = probe.held / probe.checkouts * 1000 if probe.checkouts else 0.0
+    print(f'  {concurrency:>4} потоков   p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   '
+          f'503 {statuses[503] / len(results):6.1%}   {len(results) / elapsed:6.1f} вход/с   '
+          f'выдач из пула {probe.checkouts:>4} (пик {probe.peak}, удержание {held:5.1f} ms)   '
+          f'ответы {dict(sorted(statuses.items()))}')
+
+def main() -> None:
+    auth = load_auth()
+    probe = PoolProbe(auth.db_connection)
+    auth.db_connection = probe
+    seed(auth)
+    print(f'{OWNERS} владельцев (половина со старым SHA-256), {REQUESTS_PER_LEVEL} входов на уровень; '
+          f'scrypt N={auth.PASSWORD_SCRYPT_N}, потоков хеширования {auth.PASSWORD_HASH_CONCURRENCY}, '
+          f'очередь {auth.PASSWORD_HASH_QUEUE}, пул БД {auth.DB_POOL_MAX_SIZE}')
+    try:
+        for index, concurrency in enumerate(CONCURRENCY):
+            run_level(auth, probe, concurrency, index * REQUESTS_PER_LEVEL)
+        stats = auth.pool_stats
+        print(f'Пул за весь прогон: hits {stats["hits"]}, новых соединений {stats["misses"]}, закрыто {stats["discarded"]}')
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Бенчмарк создания отеля с 50 номерами и 500 фото: число запросов и задержка до и после.
+
+"До" - прежний create_property: INSERT на каждое фото, номер и фото номера (1 + 250 + 50 + 250).
+"После" - текущий create_property из backend/properties: пакетные INSERT через execute_values.
+Обе версии пишут в одно соединение, commit в нём отключён, после каждого прогона транзакция
+откатывается, поэтому база не меняется. Запускать на dev-базе со всеми миграциями:
+
+    pip install -r backend/properties/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/create_property.py
+"""
+import importlib.util
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions
+
+ROOT = Path(__file__).resolve().parent.parent
+ROOMS = 50
+HOTEL_PHOTOS = 250
+ROOM_PHOTOS = 5
+REPEATS = 20
+
+class BenchConnection(psycopg2.extensions.connection):
+    """Соединение, которое считает execute всех своих курсоров и не фиксирует транзакцию"""
+    queries = 0
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        connection = self
+        base = cursor_factory or psycopg2.extensions.cursor
+
+        class CountingCursor(base):
+            def execute(self, query, vars=None):
+                connection.queries += 1
+                return super().execute(query, vars)
+
+        return super().cursor(*args, cursor_factory=CountingCursor, **kwargs)
+
+    def commit(self):
+        pass
+
+def load_properties():
+    spec = importlib.util.spec_from_file_location('properties_index', ROOT / 'backend/properties/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def payload() -> dict:
+    """Отель: 250 фото отеля и 50 номеров по 5 фото - всего 500 фото"""
+    return {
+        'type': 'hotel', 'status': 'draft', 'name': 'Бенчмарк-отель', 'description': 'Описание',
+        'address': 'Москва', 'price': 5000, 'amenities': ['wifi', 'parking'],
+        'owner': {'name': 'Владелец', 'phone': '+7 900 000-00-00', 'telegram': '@owner'},
+        'photos': [f'https://cdn.poehali.dev/bench/hotel-{k}.jpg' for k in range(HOTEL_PHOTOS)],
+        'rooms': [{
+            'name': f'Номер {i}', 'type': 'standard', 'price': 3000 + i * 100, 'capacity': 2, 'area': 20,
+            'description': 'Номер с видом', 'amenities': ['tv'], 'isPublished': True,
+            'photos': [f'https://cdn.poehali.dev/bench/room-{i}-{k}.jpg' for k in range(ROOM_PHOTOS)]
+        } for i in range(ROOMS)]
+    }
+
+def create_property_row_by_row(conn, data: dict) -> int:
+    """Прежняя реализация: отдельный INSERT на каждое фото, номер и фото номера"""
+    cur = conn.cursor()
+    cur.execute('''
+        INSERT INTO t_p27119953_apartment_rental_mos.properties
+        (type, status, name, description, address, metro, price, owner_name, owner_phone,
+         owner_telegram, main_photo, amenities, created_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    ''', (
+        data.get('type'), data.get('status', 'draft'), data.get('name'), data.get('description'),
+        data.get('address'), data.get('metro'), data.get('price'), data['owner']['name'],
+        data['owner']['phone'], data['owner'].get('telegram'), data.get('mainPhoto'),
+        data.get('amenities', []), data.get('createdBy', 'admin')
+    ))
+    property_id = cur.fetchone()[0]
+    for photo_url in data['photos']:
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.property_photos
+            (property_id, photo_url) VALUES (%s, %s)
+        ''', (property_id, photo_url))
+    for room in data['rooms']:
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.property_rooms
+            (property_id, name, type, price, capacity, area, description, amenities,
+             is_published, is_archived)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        ''', (
+            property_id, room['name'], room['type'], room['price'], room['capacity'],
+            room.get('area'), room.get('description'), room.get('amenities', []),
+            room.get('isPublished', False), room.get('isArchived', False)
+        ))
+        room_id = cur.fetchone()[0]
+        for photo_url in room['photos']:
+            cur.execute('''
+                INSERT INTO t_p27119953_apartment_rental_mos.property_room_photos
+                (room_id, photo_url) VALUES (%s, %s)
+            ''', (room_id, photo_url))
+    cur.close()
+    return property_id
+
+def stored_counts(conn, property_id: int) -> tuple:
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT (SELECT COUNT(*) FROM t_p27119953_apartment_rental_mos.property_photos WHERE property_id = %(id)s),
+                   (SELECT COUNT(*) FROM t_p27119953_apartment_rental_mos.property_rooms WHERE property_id = %(id)s),
+                   (SELECT COUNT(*) FROM t_p27119953_apartment_rental_mos.property_room_photos prp
+                    JOIN t_p27119953_apartment_rental_mos.property_rooms pr ON pr.id = prp.room_id
+                    WHERE pr.property_id = %(id)s)
+        ''', {'id': property_id})
+        return cur.fetchone()
+
+def measure(conn, label: str, func) -> None:
+    timings = []
+    for _ in range(REPEATS):
+        conn.queries = 0
+        started = time.perf_counter()
+        property_id = func()
+        timings.append(time.perf_counter() - started)
+        queries = conn.queries
+        counts = stored_counts(conn, property_id)
+        conn.rollback()
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    print(f'  {label:<28} запросов {queries:>4}   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   '
+          f'фото/номера/фото номеров {counts}')
+
+def main() -> None:
+    properties = load_properties()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], connection_factory=BenchConnection)
+    # Текущий create_property берёт соединение из пула - подменяем его соединением бенчмарка
+    properties.db_connection = contextmanager(lambda: iter([conn]))
+    data = payload()
+    body = json.dumps(data)
+    print(f'Отель: {ROOMS} номеров, {HOTEL_PHOTOS + ROOMS * ROOM_PHOTOS} фото')
+    try:
+        measure(conn, 'до: INSERT на строку', lambda: create_property_row_by_row(conn, data))
+        measure(conn, 'после: execute_values', lambda: json.loads(properties.create_property({'body': body})['body'])['id'])
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Бенчмарк публичного списка отелей (?entity=hotels): число запросов и p95 до и после.
+
+"До" - прежний get_hotels: запрос отелей и отдельный запрос номеров на каждый отель (1 + N).
+"После" - текущий get_hotels из backend/hotels-api: страница отелей и номера всех её отелей
+одним запросом по ANY(%s). Для сравнения со старым списком без страниц замеряется и полный
+обход каталога по X-Next-Cursor.
+
+Каталог из 1k и 10k отелей (по 3 номера, 5 фото отеля, 2 фото номера) засевается внутри
+транзакции, которая в конце откатывается. Запускать на dev-базе со всеми миграциями:
+
+    pip install -r backend/hotels-api/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/hotels_listing.py [1000 10000]
+"""
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+ROOT = Path(__file__).resolve().parent.parent
+SIZES = [int(size) for size in sys.argv[1:]] or [1000, 10000]
+REPEATS = 20
+
+class CountingConnection(psycopg2.extensions.connection):
+    """Соединение, которое считает execute всех своих курсоров"""
+    queries = 0
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        connection = self
+        base = cursor_factory or psycopg2.extensions.cursor
+
+        class CountingCursor(base):
+            def execute(self, query, vars=None):
+                connection.queries += 1
+                return super().execute(query, vars)
+
+        return super().cursor(*args, cursor_factory=CountingCursor, **kwargs)
+
+def load_hotels_api():
+    spec = importlib.util.spec_from_file_location('hotels_api_index', ROOT / 'backend/hotels-api/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def seed(conn, count: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute('''
+            WITH hotels AS (
+                INSERT INTO t_p27119953_apartment_rental_mos.properties
+                (type, status, name, description, address, price, owner_name, owner_phone, amenities)
+                SELECT 'hotel', 'active', 'Бенчмарк-отель ' || i, 'Описание отеля', 'Москва', 5000, 'Владелец', '+7 900 000-00-00',
+                       ARRAY['wifi', 'parking']
+                FROM generate_series(1, %s) i
+                RETURNING id
+            ),
+            photos AS (
+                INSERT INTO t_p27119953_apartment_rental_mos.property_photos (property_id, photo_url)
+                SELECT id, 'https://cdn.poehali.dev/bench/' || id || '-' || k || '.jpg'
+                FROM hotels, generate_series(1, 5) k
+            )
+            INSERT INTO t_p27119953_apartment_rental_mos.property_rooms
+            (property_id, name, type, price, capacity, area, is_published, is_archived)
+            SELECT id, 'Номер ' || k, 'standard', 3000 + k * 500, 2, 20, true, false
+            FROM hotels, generate_series(1, 3) k
+        ''', (count,))
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.property_room_photos (room_id, photo_url)
+            SELECT pr.id, 'https://cdn.poehali.dev/bench/room-' || pr.id || '-' || k || '.jpg'
+            FROM t_p27119953_apartment_rental_mos.property_rooms pr
+            JOIN t_p27119953_apartment_rental_mos.properties p ON p.id = pr.property_id
+            CROSS JOIN generate_series(1, 2) k
+            WHERE p.name LIKE 'Бенчмарк-отель %%'
+        ''')
+        cur.execute('ANALYZE t_p27119953_apartment_rental_mos.properties, t_p27119953_apartment_rental_mos.property_photos, '
+                    't_p27119953_apartment_rental_mos.property_rooms, t_p27119953_apartment_rental_mos.property_room_photos')
+
+def get_hotels_n_plus_one(conn) -> list:
+    """Прежняя реализация: отдельный запрос номеров на каждый отель"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('''
+            SELECT p.*,
+                   array_agg(DISTINCT ph.photo_url) FILTER (WHERE ph.photo_url IS NOT NULL) as images
+            FROM t_p27119953_apartment_rental_mos.properties p
+            LEFT JOIN t_p27119953_apartment_rental_mos.property_photos ph ON p.id = ph.property_id
+            WHERE p.type = 'hotel' AND p.status = 'active'
+            GROUP BY p.id
+            ORDER BY p.created_at DESC
+        ''')
+        hotels = cur.fetchall()
+        for hotel in hotels:
+            cur.execute('''
+                SELECT pr.id, pr.name, pr.type, pr.price, pr.capacity, pr.area,
+                       pr.description, pr.amenities, pr.is_published, pr.is_archived,
+                       array_agg(prp.photo_url) FILTER (WHERE prp.photo_url IS NOT NULL) as images
+                FROM t_p27119953_apartment_rental_mos.property_rooms pr
+                LEFT JOIN t_p27119953_apartment_rental_mos.property_room_photos prp ON pr.id = prp.room_id
+                WHERE pr.property_id = %s AND pr.is_published = true AND pr.is_archived = false
+                GROUP BY pr.id
+                ORDER BY pr.price
+            ''', (hotel['id'],))
+            hotel['rooms'] = cur.fetchall()
+        body = json.dumps([dict(hotel) for hotel in hotels], default=str)
+    return json.loads(body)
+
+def walk_catalog(hotels_api, conn, limit: int, pages: int = None) -> list:
+    """Текущий get_hotels: страницы по X-Next-Cursor (все или первые pages)"""
+    hotels, cursor = [], None
+    while True:
+        query = {'entity': 'hotels', 'limit': str(limit), **({'cursor': cursor} if cursor else {})}
+        response = hotels_api.get_hotels(conn, query)
+        hotels.extend(json.loads(response['body']))
+        cursor = response['headers'].get('X-Next-Cursor')
+        if not cursor or (pages and len(hotels) >= pages * limit):
+            return hotels
+
+def measure(conn, label: str, func) -> list:
+    timings, queries = [], []
+    for _ in range(REPEATS):
+        conn.queries = 0
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+        queries.append(conn.queries)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    print(f'  {label:<40} запросов {queries[-1]:>6}   p50 {p50:9.1f} ms   p95 {p95:9.1f} ms   отелей {len(result)}')
+    return result
+
+def main() -> None:
+    hotels_api = load_hotels_api()
+    page_size = hotels_api.CATALOG_PAGE_SIZE_MAX
+    for size in SIZES:
+        conn = psycopg2.connect(os.environ['DATABASE_URL'], connection_factory=CountingConnection)
+        try:
+            seed(conn, size)
+            print(f'Каталог: {size} отелей')
+            before = measure(conn, 'до: 1 + N запросов, весь список', lambda: get_hotels_n_plus_one(conn))
+            after = measure(conn, f'после: весь каталог страницами по {page_size}', lambda: walk_catalog(hotels_api, conn, page_size))
+            measure(conn, f'после: первая страница ({page_size})', lambda: walk_catalog(hotels_api, conn, page_size, pages=1))
+            assert sorted(hotel['id'] for hotel in before) == sorted(hotel['id'] for hotel in after)
+        finally:
+            conn.rollback()
+            conn.close()
+
+if __name__ == '__main__':
+    main()
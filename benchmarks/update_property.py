@@ -0,0 +1,163 @@
+"""Бенчмарк редактирования объекта: частичное обновление через CASE и добавление фото.
+
+Объект с 200 фото и координатами. Замеряются:
+- сохранение формы без lat/lon - CASE оставляет координаты (и geo_cell) как были;
+- сохранение с новыми координатами;
+- добавление 100 фото, из которых половина уже есть у объекта: "до" - SELECT и INSERT на каждое фото,
+  "после" - текущий update_property из backend/properties, один INSERT ... SELECT ... WHERE NOT EXISTS
+  через execute_values.
+После каждого прогона проверяется результат (координаты, число фото без дублей), затем транзакция
+откатывается, поэтому база не меняется. Запускать на dev-базе со всеми миграциями:
+
+    pip install -r backend/properties/requirements.txt
+    DATABASE_URL=postgresql://... python benchmarks/update_property.py
+"""
+import importlib.util
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions
+
+ROOT = Path(__file__).resolve().parent.parent
+EXISTING_PHOTOS = 200
+NEW_PHOTOS = 50
+DUPLICATE_PHOTOS = 50
+REPEATS = 20
+LAT, LON = 55.7601, 37.6186
+
+class BenchConnection(psycopg2.extensions.connection):
+    """Соединение, которое считает execute всех своих курсоров и не фиксирует транзакцию"""
+    queries = 0
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        connection = self
+        base = cursor_factory or psycopg2.extensions.cursor
+
+        class CountingCursor(base):
+            def execute(self, query, vars=None):
+                connection.queries += 1
+                return super().execute(query, vars)
+
+        return super().cursor(*args, cursor_factory=CountingCursor, **kwargs)
+
+    def commit(self):
+        pass
+
+def load_properties():
+    spec = importlib.util.spec_from_file_location('properties_index', ROOT / 'backend/properties/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def seed(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.properties
+            (type, status, name, description, address, price, owner_name, owner_phone, amenities, lat, lon)
+            VALUES ('hotel', 'active', 'Бенчмарк-отель', 'Описание', 'Москва', 5000, 'Владелец', '+7 900 000-00-00',
+                    ARRAY['wifi'], %s, %s)
+            RETURNING id
+        ''', (LAT, LON))
+        property_id = cur.fetchone()[0]
+        cur.execute('''
+            INSERT INTO t_p27119953_apartment_rental_mos.property_photos (property_id, photo_url)
+            SELECT %s, 'https://cdn.poehali.dev/bench/photo-' || k || '.jpg' FROM generate_series(1, %s) k
+        ''', (property_id, EXISTING_PHOTOS))
+    return property_id
+
+def form(property_id: int, **fields) -> dict:
+    """Тело PUT формы редактирования; фото - только новые, как присылает админка"""
+    return {
+        'id': property_id, 'type': 'hotel', 'status': 'active', 'name': 'Бенчмарк-отель (ред.)',
+        'description': 'Новое описание', 'address': 'Москва', 'price': 5500, 'amenities': ['wifi', 'parking'],
+        'owner': {'name': 'Владелец', 'phone': '+7 900 000-00-00', 'telegram': '@owner'},
+        **fields
+    }
+
+def appended_photos() -> list:
+    """Половина - новые URL, половина уже есть у объекта (повторная отправка формы)"""
+    duplicates = [f'https://cdn.poehali.dev/bench/photo-{k}.jpg' for k in range(1, DUPLICATE_PHOTOS + 1)]
+    return [f'https://cdn.poehali.dev/bench/new-{k}.jpg' for k in range(NEW_PHOTOS)] + duplicates
+
+def append_photos_row_by_row(conn, property_id: int, photos: list) -> None:
+    """Прежний способ добавления: проверка и INSERT на каждое фото"""
+    with conn.cursor() as cur:
+        for photo_url in photos:
+            cur.execute('''
+                SELECT 1 FROM t_p27119953_apartment_rental_mos.property_photos
+                WHERE property_id = %s AND photo_url = %s
+            ''', (property_id, photo_url))
+            if cur.fetchone() is None:
+                cur.execute('''
+                    INSERT INTO t_p27119953_apartment_rental_mos.property_photos (property_id, photo_url)
+                    VALUES (%s, %s)
+                ''', (property_id, photo_url))
+
+def stored_state(conn, property_id: int) -> tuple:
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT p.lat::float, p.lon::float, p.geo_cell,
+                   (SELECT COUNT(*) FROM t_p27119953_apartment_rental_mos.property_photos WHERE property_id = p.id),
+                   (SELECT COUNT(DISTINCT photo_url) FROM t_p27119953_apartment_rental_mos.property_photos WHERE property_id = p.id)
+            FROM t_p27119953_apartment_rental_mos.properties p
+            WHERE p.id = %s
+        ''', (property_id,))
+        return cur.fetchone()
+
+def measure(conn, label: str, func, check) -> None:
+    timings = []
+    for _ in range(REPEATS):
+        conn.rollback()
+        property_id = seed(conn)
+        conn.queries = 0
+        started = time.perf_counter()
+        func(property_id)
+        timings.append(time.perf_counter() - started)
+        queries = conn.queries
+        state = stored_state(conn, property_id)
+        check(state)
+    conn.rollback()
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    print(f'  {label:<46} запросов {queries:>4}   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   '
+          f'lat/lon/фото {state[0]}, {state[1]}, {state[3]}')
+
+def main() -> None:
+    properties = load_properties()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], connection_factory=BenchConnection)
+    # update_property берёт соединение из пула - подменяем его соединением бенчмарка
+    properties.db_connection = contextmanager(lambda: iter([conn]))
+    expected_photos = EXISTING_PHOTOS + NEW_PHOTOS
+
+    def update(property_id: int, **fields) -> None:
+        response = properties.update_property({'body': json.dumps(form(property_id, **fields))})
+        assert response['statusCode'] == 200, response
+
+    def keeps_coordinates(state) -> None:
+        assert state[:2] == (LAT, LON) and state[2] is not None, state
+
+    def moved(state) -> None:
+        assert state[:2] == (55.75, 37.6) and state[2] is not None, state
+
+    def appended(state) -> None:
+        assert state[3] == state[4] == expected_photos, state
+
+    print(f'Объект: {EXISTING_PHOTOS} фото; добавляется {NEW_PHOTOS} новых + {DUPLICATE_PHOTOS} уже существующих')
+    try:
+        measure(conn, 'форма без lat/lon (CASE сохраняет координаты)', update, keeps_coordinates)
+        measure(conn, 'форма с новыми lat/lon', lambda pid: update(pid, lat=55.75, lon=37.6), moved)
+        measure(conn, 'до: фото SELECT + INSERT на каждое',
+                lambda pid: append_photos_row_by_row(conn, pid, appended_photos()), appended)
+        measure(conn, 'после: форма + фото через execute_values',
+                lambda pid: update(pid, photos=appended_photos()), lambda state: (keeps_coordinates(state), appended(state)))
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+-- Индексы для постраничной выдачи каталога по (created_at, id) с фильтрами
+CREATE INDEX IF NOT EXISTS idx_properties_created_id ON t_p27119953_apartment_rental_mos.properties(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_properties_type_status_created ON t_p27119953_apartment_rental_mos.properties(type, status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_properties_metro ON t_p27119953_apartment_rental_mos.properties(lower(metro));
+CREATE INDEX IF NOT EXISTS idx_property_rooms_property_capacity ON t_p27119953_apartment_rental_mos.property_rooms(property_id, capacity);
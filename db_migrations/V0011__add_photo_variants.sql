@@ -0,0 +1,6 @@
+-- Уменьшенные копии фотографий (WebP/JPEG разных ширин) рядом с оригиналом
+ALTER TABLE t_p27119953_apartment_rental_mos.property_photos ADD COLUMN IF NOT EXISTS variants JSONB;
+ALTER TABLE t_p27119953_apartment_rental_mos.property_room_photos ADD COLUMN IF NOT EXISTS variants JSONB;
+
+COMMENT ON COLUMN t_p27119953_apartment_rental_mos.property_photos.variants IS 'Производные изображения: [{width, height, webp, jpg}]';
+COMMENT ON COLUMN t_p27119953_apartment_rental_mos.property_room_photos.variants IS 'Производные изображения: [{width, height, webp, jpg}]';
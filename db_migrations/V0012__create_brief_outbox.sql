@@ -0,0 +1,18 @@
+-- Очередь заявок собственников на отправку в Telegram
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.brief_outbox (
+    id SERIAL PRIMARY KEY,
+    idempotency_key VARCHAR(200) NOT NULL UNIQUE,
+    payload JSONB NOT NULL,
+    message TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+-- Диспетчер выбирает только ожидающие отправки записи
+CREATE INDEX IF NOT EXISTS idx_brief_outbox_pending ON t_p27119953_apartment_rental_mos.brief_outbox(next_attempt_at) WHERE status = 'pending';
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.brief_outbox IS 'Исходящая очередь заявок на размещение для Telegram';
@@ -0,0 +1,22 @@
+-- Почасовые и дневные агрегаты просмотров и кликов для графиков в кабинете собственника
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.object_stats_hourly (
+    object_id INTEGER NOT NULL REFERENCES objects(id),
+    bucket_start TIMESTAMP NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    telegram_clicks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (object_id, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.object_stats_daily (
+    object_id INTEGER NOT NULL REFERENCES objects(id),
+    day DATE NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    telegram_clicks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (object_id, day)
+);
+
+-- Очистка старых почасовых строк идёт по времени, без привязки к объекту
+CREATE INDEX IF NOT EXISTS idx_object_stats_hourly_bucket ON t_p27119953_apartment_rental_mos.object_stats_hourly(bucket_start);
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.object_stats_hourly IS 'Почасовая статистика объектов (UTC), хранится ограниченное время';
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.object_stats_daily IS 'Дневная статистика объектов (UTC)';
@@ -0,0 +1,11 @@
+-- Версии редко меняющихся справочников: функции сверяют их и держат данные в кэше процесса
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO t_p27119953_apartment_rental_mos.cache_versions (name) VALUES ('promotions')
+ON CONFLICT (name) DO NOTHING;
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.cache_versions IS 'Счётчики изменений для инвалидации кэшей в функциях';
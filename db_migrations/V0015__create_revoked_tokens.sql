@@ -0,0 +1,12 @@
+-- Токены собственников, отозванные до истечения срока (выход из кабинета)
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    owner_id INTEGER NOT NULL REFERENCES owners(id),
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Функции читают только ещё действующие записи
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON t_p27119953_apartment_rental_mos.revoked_tokens(expires_at);
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.revoked_tokens IS 'Отозванные токены сессий собственников';
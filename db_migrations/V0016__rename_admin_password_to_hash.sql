@@ -0,0 +1,2 @@
+-- Пароли администраторов хешируются scrypt; открытые пароли заменяются хешем при следующем входе
+ALTER TABLE admins RENAME COLUMN password TO password_hash;
@@ -0,0 +1,16 @@
+-- Координаты объектов каталога и ячейка сетки 0.01° (~1.1 x 0.6 км в Москве) для поиска по радиусу и области карты.
+-- geo_cell = (floor(lat * 100) + 9000) * 100000 + floor(lon * 100) + 18000: соседние по долготе ячейки идут подряд,
+-- поэтому строка широты в области поиска - это один диапазон в btree
+ALTER TABLE t_p27119953_apartment_rental_mos.properties ADD COLUMN IF NOT EXISTS lat DECIMAL(10, 7);
+ALTER TABLE t_p27119953_apartment_rental_mos.properties ADD COLUMN IF NOT EXISTS lon DECIMAL(10, 7);
+ALTER TABLE t_p27119953_apartment_rental_mos.properties ADD COLUMN IF NOT EXISTS geo_cell BIGINT
+    GENERATED ALWAYS AS ((floor(lat * 100)::bigint + 9000) * 100000 + floor(lon * 100)::bigint + 18000) STORED;
+
+ALTER TABLE objects ADD COLUMN IF NOT EXISTS geo_cell BIGINT
+    GENERATED ALWAYS AS ((floor(lat * 100)::bigint + 9000) * 100000 + floor(lon * 100)::bigint + 18000) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_properties_geo_cell ON t_p27119953_apartment_rental_mos.properties(geo_cell) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_objects_geo_cell ON objects(geo_cell) WHERE is_published = true;
+
+COMMENT ON COLUMN t_p27119953_apartment_rental_mos.properties.geo_cell IS 'Ячейка сетки 0.01° по lat/lon для геопоиска';
+COMMENT ON COLUMN objects.geo_cell IS 'Ячейка сетки 0.01° по lat/lon для геопоиска';
@@ -0,0 +1,148 @@
+-- Кластеры меток карты по уровням масштаба: ячейка = 1/4 тайла по ширине, 360 / (4 * 2^zoom) градусов.
+-- Счётчик, суммы координат (для центроида) и минимальная цена поддерживаются триггерами при записи объявлений
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.map_clusters (
+    zoom SMALLINT NOT NULL,
+    cell_x INTEGER NOT NULL,
+    cell_y INTEGER NOT NULL,
+    listings INTEGER NOT NULL,
+    lat_sum DOUBLE PRECISION NOT NULL,
+    lon_sum DOUBLE PRECISION NOT NULL,
+    min_price NUMERIC(10, 2),
+    PRIMARY KEY (zoom, cell_x, cell_y)
+);
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.map_clusters IS 'Предрасчитанные кластеры опубликованных объявлений для карты (zoom 8-16)';
+
+-- Минимальная цена ячейки пересчитывается по индексу geo_cell, только когда из ячейки ушло самое дешёвое объявление
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.map_cell_min_price(
+    p_south DOUBLE PRECISION, p_west DOUBLE PRECISION, p_north DOUBLE PRECISION, p_east DOUBLE PRECISION
+) RETURNS NUMERIC AS $$
+    SELECT min(l.price) FROM (
+        SELECT p.price, p.lat, p.lon
+        FROM generate_series(floor(p_south * 100)::int, floor(p_north * 100)::int) AS grid_row
+        JOIN t_p27119953_apartment_rental_mos.properties p ON p.geo_cell BETWEEN
+            (grid_row + 9000)::bigint * 100000 + floor(p_west * 100)::bigint + 18000 AND
+            (grid_row + 9000)::bigint * 100000 + floor(p_east * 100)::bigint + 18000
+        WHERE p.status = 'active'
+        UNION ALL
+        SELECT o.price_per_hour, o.lat, o.lon
+        FROM generate_series(floor(p_south * 100)::int, floor(p_north * 100)::int) AS grid_row
+        JOIN objects o ON o.geo_cell BETWEEN
+            (grid_row + 9000)::bigint * 100000 + floor(p_west * 100)::bigint + 18000 AND
+            (grid_row + 9000)::bigint * 100000 + floor(p_east * 100)::bigint + 18000
+        WHERE o.is_published = true
+    ) l
+    WHERE l.lat >= p_south AND l.lat < p_north AND l.lon >= p_west AND l.lon < p_east
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.apply_map_delta(
+    p_lat NUMERIC, p_lon NUMERIC, p_price NUMERIC, p_sign INTEGER
+) RETURNS void AS $$
+DECLARE
+    z INTEGER;
+    cell_size DOUBLE PRECISION;
+    cx INTEGER;
+    cy INTEGER;
+    remaining INTEGER;
+    cell_min NUMERIC;
+BEGIN
+    IF p_lat IS NULL OR p_lon IS NULL THEN
+        RETURN;
+    END IF;
+    
+    FOR z IN 8..16 LOOP
+        cell_size := 360.0 / (4 * 2 ^ z);
+        cx := floor((p_lon + 180) / cell_size);
+        cy := floor((p_lat + 90) / cell_size);
+        
+        IF p_sign > 0 THEN
+            INSERT INTO t_p27119953_apartment_rental_mos.map_clusters AS c (zoom, cell_x, cell_y, listings, lat_sum, lon_sum, min_price)
+            VALUES (z, cx, cy, 1, p_lat, p_lon, p_price)
+            ON CONFLICT (zoom, cell_x, cell_y) DO UPDATE
+            SET listings = c.listings + 1,
+                lat_sum = c.lat_sum + EXCLUDED.lat_sum,
+                lon_sum = c.lon_sum + EXCLUDED.lon_sum,
+                min_price = LEAST(c.min_price, EXCLUDED.min_price);
+        ELSE
+            UPDATE t_p27119953_apartment_rental_mos.map_clusters
+            SET listings = listings - 1, lat_sum = lat_sum - p_lat, lon_sum = lon_sum - p_lon
+            WHERE zoom = z AND cell_x = cx AND cell_y = cy
+            RETURNING listings, min_price INTO remaining, cell_min;
+            
+            IF remaining <= 0 THEN
+                DELETE FROM t_p27119953_apartment_rental_mos.map_clusters WHERE zoom = z AND cell_x = cx AND cell_y = cy;
+            ELSIF p_price IS NOT NULL AND p_price <= cell_min THEN
+                UPDATE t_p27119953_apartment_rental_mos.map_clusters
+                SET min_price = t_p27119953_apartment_rental_mos.map_cell_min_price(
+                    cy * cell_size - 90, cx * cell_size - 180, (cy + 1) * cell_size - 90, (cx + 1) * cell_size - 180
+                )
+                WHERE zoom = z AND cell_x = cx AND cell_y = cy;
+            END IF;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.properties_map_clusters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'active' THEN
+        PERFORM t_p27119953_apartment_rental_mos.apply_map_delta(OLD.lat, OLD.lon, OLD.price, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'active' THEN
+        PERFORM t_p27119953_apartment_rental_mos.apply_map_delta(NEW.lat, NEW.lon, NEW.price, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.objects_map_clusters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_published THEN
+        PERFORM t_p27119953_apartment_rental_mos.apply_map_delta(OLD.lat, OLD.lon, OLD.price_per_hour, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_published THEN
+        PERFORM t_p27119953_apartment_rental_mos.apply_map_delta(NEW.lat, NEW.lon, NEW.price_per_hour, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- UPDATE OF срабатывает и когда колонка просто перечислена в SET, поэтому обновления без изменений отсекаются в WHEN
+DROP TRIGGER IF EXISTS trg_properties_map_clusters ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_map_clusters
+    AFTER INSERT OR DELETE ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.properties_map_clusters();
+
+DROP TRIGGER IF EXISTS trg_properties_map_clusters_update ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_map_clusters_update
+    AFTER UPDATE OF lat, lon, price, status ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH ROW
+    WHEN (OLD.lat IS DISTINCT FROM NEW.lat OR OLD.lon IS DISTINCT FROM NEW.lon
+          OR OLD.price IS DISTINCT FROM NEW.price OR OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION t_p27119953_apartment_rental_mos.properties_map_clusters();
+
+DROP TRIGGER IF EXISTS trg_objects_map_clusters ON objects;
+CREATE TRIGGER trg_objects_map_clusters
+    AFTER INSERT OR DELETE ON objects
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.objects_map_clusters();
+
+DROP TRIGGER IF EXISTS trg_objects_map_clusters_update ON objects;
+CREATE TRIGGER trg_objects_map_clusters_update
+    AFTER UPDATE OF lat, lon, price_per_hour, is_published ON objects
+    FOR EACH ROW
+    WHEN (OLD.lat IS DISTINCT FROM NEW.lat OR OLD.lon IS DISTINCT FROM NEW.lon
+          OR OLD.price_per_hour IS DISTINCT FROM NEW.price_per_hour OR OLD.is_published IS DISTINCT FROM NEW.is_published)
+    EXECUTE FUNCTION t_p27119953_apartment_rental_mos.objects_map_clusters();
+
+-- Начальное заполнение по уже опубликованным объявлениям
+INSERT INTO t_p27119953_apartment_rental_mos.map_clusters (zoom, cell_x, cell_y, listings, lat_sum, lon_sum, min_price)
+SELECT z, floor((l.lon + 180) / (360.0 / (4 * 2 ^ z))), floor((l.lat + 90) / (360.0 / (4 * 2 ^ z))),
+       count(*), sum(l.lat), sum(l.lon), min(l.price)
+FROM (
+    SELECT lat, lon, price FROM t_p27119953_apartment_rental_mos.properties WHERE status = 'active' AND lat IS NOT NULL AND lon IS NOT NULL
+    UNION ALL
+    SELECT lat, lon, price_per_hour FROM objects WHERE is_published = true AND lat IS NOT NULL AND lon IS NOT NULL
+) l
+CROSS JOIN generate_series(8, 16) AS z
+GROUP BY 1, 2, 3
+ON CONFLICT (zoom, cell_x, cell_y) DO NOTHING;
@@ -0,0 +1,151 @@
+-- Справочник станций метро и предрасчитанные ближайшие станции для каждого объявления.
+-- Время пешком: расстояние по прямой * 1.25 (поправка на улицы) / 80 м/мин, с округлением вверх
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.metro_stations (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    line VARCHAR(100) NOT NULL,
+    lat DECIMAL(10, 7) NOT NULL,
+    lon DECIMAL(10, 7) NOT NULL,
+    UNIQUE (name, line)
+);
+
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.listing_metro (
+    source VARCHAR(16) NOT NULL,
+    listing_id INTEGER NOT NULL,
+    station_id INTEGER NOT NULL REFERENCES t_p27119953_apartment_rental_mos.metro_stations(id) ON DELETE CASCADE,
+    rank SMALLINT NOT NULL,
+    distance_m INTEGER NOT NULL,
+    walk_minutes SMALLINT NOT NULL,
+    PRIMARY KEY (source, listing_id, station_id)
+);
+
+-- "В N минутах от станции": выборка идёт от станции по индексу, без геометрии в момент запроса
+CREATE INDEX IF NOT EXISTS idx_listing_metro_station ON t_p27119953_apartment_rental_mos.listing_metro(station_id, walk_minutes, source, listing_id);
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.listing_metro IS 'Ближайшие станции метро объявления (source = property | object), пересчитываются триггерами при смене координат';
+
+INSERT INTO t_p27119953_apartment_rental_mos.metro_stations (name, line, lat, lon) VALUES
+('Белорусская', 'Кольцевая', 55.7752, 37.5820),
+('Белорусская', 'Замоскворецкая', 55.7774, 37.5856),
+('Маяковская', 'Замоскворецкая', 55.7699, 37.5958),
+('Тверская', 'Замоскворецкая', 55.7648, 37.6054),
+('Театральная', 'Замоскворецкая', 55.7577, 37.6190),
+('Новокузнецкая', 'Замоскворецкая', 55.7424, 37.6293),
+('Динамо', 'Замоскворецкая', 55.7897, 37.5582),
+('Аэропорт', 'Замоскворецкая', 55.8004, 37.5306),
+('Сокол', 'Замоскворецкая', 55.8054, 37.5152),
+('Войковская', 'Замоскворецкая', 55.8188, 37.4976),
+('Пушкинская', 'Таганско-Краснопресненская', 55.7655, 37.6040),
+('Кузнецкий Мост', 'Таганско-Краснопресненская', 55.7617, 37.6245),
+('Чеховская', 'Серпуховско-Тимирязевская', 55.7657, 37.6081),
+('Боровицкая', 'Серпуховско-Тимирязевская', 55.7504, 37.6094),
+('Полянка', 'Серпуховско-Тимирязевская', 55.7367, 37.6186),
+('Охотный Ряд', 'Сокольническая', 55.7577, 37.6156),
+('Лубянка', 'Сокольническая', 55.7597, 37.6276),
+('Чистые пруды', 'Сокольническая', 55.7650, 37.6387),
+('Библиотека имени Ленина', 'Сокольническая', 55.7515, 37.6096),
+('Кропоткинская', 'Сокольническая', 55.7453, 37.6036),
+('Парк Культуры', 'Сокольническая', 55.7353, 37.5939),
+('Площадь Революции', 'Арбатско-Покровская', 55.7567, 37.6219),
+('Арбатская', 'Арбатско-Покровская', 55.7522, 37.6042),
+('Смоленская', 'Арбатско-Покровская', 55.7476, 37.5830),
+('Бауманская', 'Арбатско-Покровская', 55.7724, 37.6789),
+('Александровский сад', 'Филёвская', 55.7521, 37.6083),
+('Китай-город', 'Калужско-Рижская', 55.7565, 37.6314),
+('Третьяковская', 'Калужско-Рижская', 55.7408, 37.6260),
+('Парк Культуры', 'Кольцевая', 55.7351, 37.5931),
+('Октябрьская', 'Кольцевая', 55.7292, 37.6110),
+('Павелецкая', 'Кольцевая', 55.7316, 37.6364),
+('Таганская', 'Кольцевая', 55.7424, 37.6530),
+('Курская', 'Кольцевая', 55.7585, 37.6593),
+('Комсомольская', 'Кольцевая', 55.7763, 37.6549),
+('Проспект Мира', 'Кольцевая', 55.7794, 37.6334),
+('Новослободская', 'Кольцевая', 55.7794, 37.6014),
+('Краснопресненская', 'Кольцевая', 55.7604, 37.5773),
+('Киевская', 'Кольцевая', 55.7436, 37.5658)
+ON CONFLICT (name, line) DO NOTHING;
+
+-- До 3 ближайших станций в радиусе 2.5 км; справочник маленький, поэтому перебор станций дешевле индекса
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.refresh_listing_metro(
+    p_source VARCHAR, p_listing_id INTEGER, p_lat NUMERIC, p_lon NUMERIC
+) RETURNS void AS $$
+BEGIN
+    DELETE FROM t_p27119953_apartment_rental_mos.listing_metro WHERE source = p_source AND listing_id = p_listing_id;
+    IF p_lat IS NULL OR p_lon IS NULL THEN
+        RETURN;
+    END IF;
+    
+    INSERT INTO t_p27119953_apartment_rental_mos.listing_metro (source, listing_id, station_id, rank, distance_m, walk_minutes)
+    SELECT p_source, p_listing_id, id, row_number() OVER (ORDER BY distance_m), round(distance_m), ceil(distance_m * 1.25 / 80)
+    FROM (
+        SELECT s.id, 2 * 6371000 * asin(sqrt(
+                   power(sin(radians(s.lat - p_lat) / 2), 2) +
+                   cos(radians(p_lat)) * cos(radians(s.lat)) * power(sin(radians(s.lon - p_lon) / 2), 2)
+               )) AS distance_m
+        FROM t_p27119953_apartment_rental_mos.metro_stations s
+        ORDER BY distance_m
+        LIMIT 3
+    ) nearest
+    WHERE distance_m <= 2500;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.refresh_all_listing_metro() RETURNS void AS $$
+BEGIN
+    PERFORM t_p27119953_apartment_rental_mos.refresh_listing_metro('property', id, lat, lon)
+    FROM t_p27119953_apartment_rental_mos.properties;
+    PERFORM t_p27119953_apartment_rental_mos.refresh_listing_metro('object', id, lat, lon)
+    FROM objects;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_on_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM t_p27119953_apartment_rental_mos.listing_metro WHERE source = TG_ARGV[0] AND listing_id = OLD.id;
+    ELSE
+        PERFORM t_p27119953_apartment_rental_mos.refresh_listing_metro(TG_ARGV[0], NEW.id, NEW.lat, NEW.lon);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пересчёт только при фактической смене координат, а не при каждом UPDATE со списком lat/lon в SET
+DROP TRIGGER IF EXISTS trg_properties_listing_metro ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_listing_metro
+    AFTER INSERT OR DELETE ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_on_change('property');
+
+DROP TRIGGER IF EXISTS trg_properties_listing_metro_update ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_listing_metro_update
+    AFTER UPDATE OF lat, lon ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH ROW
+    WHEN (OLD.lat IS DISTINCT FROM NEW.lat OR OLD.lon IS DISTINCT FROM NEW.lon)
+    EXECUTE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_on_change('property');
+
+DROP TRIGGER IF EXISTS trg_objects_listing_metro ON objects;
+CREATE TRIGGER trg_objects_listing_metro
+    AFTER INSERT OR DELETE ON objects
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_on_change('object');
+
+DROP TRIGGER IF EXISTS trg_objects_listing_metro_update ON objects;
+CREATE TRIGGER trg_objects_listing_metro_update
+    AFTER UPDATE OF lat, lon ON objects
+    FOR EACH ROW
+    WHEN (OLD.lat IS DISTINCT FROM NEW.lat OR OLD.lon IS DISTINCT FROM NEW.lon)
+    EXECUTE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_on_change('object');
+
+-- Правка справочника станций меняет ближайшие станции у всех объявлений сразу
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.metro_stations_on_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM t_p27119953_apartment_rental_mos.refresh_all_listing_metro();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_metro_stations_refresh ON t_p27119953_apartment_rental_mos.metro_stations;
+CREATE TRIGGER trg_metro_stations_refresh
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.metro_stations
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.metro_stations_on_change();
+
+SELECT t_p27119953_apartment_rental_mos.refresh_all_listing_metro();
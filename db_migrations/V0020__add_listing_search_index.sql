@@ -0,0 +1,23 @@
+-- Полнотекстовый поиск по каталогу: tsvector в русской конфигурации (название важнее метро и адреса, описание - ниже всех)
+-- и триграммы по короткому тексту (название, адрес, метро) для запросов с опечатками.
+-- Обе колонки генерируемые, поэтому поддерживаются самой БД при любой записи
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE t_p27119953_apartment_rental_mos.properties ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(metro, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(address, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+    ) STORED;
+
+ALTER TABLE t_p27119953_apartment_rental_mos.properties ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (lower(coalesce(name, '') || ' ' || coalesce(metro, '') || ' ' || coalesce(address, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_properties_search_vector ON t_p27119953_apartment_rental_mos.properties
+    USING GIN (search_vector) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_properties_search_trgm ON t_p27119953_apartment_rental_mos.properties
+    USING GIN (search_text gin_trgm_ops) WHERE status = 'active';
+
+COMMENT ON COLUMN t_p27119953_apartment_rental_mos.properties.search_vector IS 'Полнотекстовый индекс (russian): name A, metro/address B, description C';
+COMMENT ON COLUMN t_p27119953_apartment_rental_mos.properties.search_text IS 'Название, метро и адрес в нижнем регистре для триграммного поиска';
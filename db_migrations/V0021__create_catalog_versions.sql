@@ -0,0 +1,102 @@
+-- Версии каталога для ETag поддерживаются триггерами, чтобы проверка 304 была одним чтением по ключу,
+-- а не COUNT/MAX по четырём таблицам: общий счётчик - строка 'catalog' в cache_versions (раз на оператор),
+-- версия отдельного объекта - строка в catalog_versions (на каждую затронутую строку)
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.catalog_versions (
+    property_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.catalog_versions IS 'Счётчик изменений объекта каталога вместе с номерами и фото для ETag';
+
+INSERT INTO t_p27119953_apartment_rental_mos.cache_versions (name) VALUES ('catalog')
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO t_p27119953_apartment_rental_mos.catalog_versions (property_id)
+SELECT id FROM t_p27119953_apartment_rental_mos.properties
+ON CONFLICT (property_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.bump_property_version(p_property_id INTEGER) RETURNS void AS $$
+BEGIN
+    IF p_property_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO t_p27119953_apartment_rental_mos.catalog_versions AS v (property_id) VALUES (p_property_id)
+    ON CONFLICT (property_id) DO UPDATE SET version = v.version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV[0] - где id объекта: property (сама строка properties), owner (поле property_id) или room (через номер)
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.catalog_row_changed() RETURNS trigger AS $$
+DECLARE
+    ids INTEGER[] := '{}';
+    changed_id INTEGER;
+BEGIN
+    IF TG_ARGV[0] = 'property' THEN
+        IF TG_OP <> 'DELETE' THEN ids := ids || NEW.id; END IF;
+        IF TG_OP <> 'INSERT' THEN ids := ids || OLD.id; END IF;
+    ELSIF TG_ARGV[0] = 'owner' THEN
+        IF TG_OP <> 'DELETE' THEN ids := ids || NEW.property_id; END IF;
+        IF TG_OP <> 'INSERT' THEN ids := ids || OLD.property_id; END IF;
+    ELSE
+        IF TG_OP <> 'DELETE' THEN ids := ids || NEW.room_id; END IF;
+        IF TG_OP <> 'INSERT' THEN ids := ids || OLD.room_id; END IF;
+        SELECT coalesce(array_agg(pr.property_id), '{}') INTO ids
+        FROM t_p27119953_apartment_rental_mos.property_rooms pr WHERE pr.id = ANY(ids);
+    END IF;
+    
+    FOR changed_id IN SELECT DISTINCT unnest(ids) LOOP
+        PERFORM t_p27119953_apartment_rental_mos.bump_property_version(changed_id);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed() RETURNS trigger AS $$
+BEGIN
+    UPDATE t_p27119953_apartment_rental_mos.cache_versions
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE name = 'catalog';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_catalog_version ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_row_changed('property');
+
+DROP TRIGGER IF EXISTS trg_property_rooms_catalog_version ON t_p27119953_apartment_rental_mos.property_rooms;
+CREATE TRIGGER trg_property_rooms_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_rooms
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_row_changed('owner');
+
+DROP TRIGGER IF EXISTS trg_property_photos_catalog_version ON t_p27119953_apartment_rental_mos.property_photos;
+CREATE TRIGGER trg_property_photos_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_photos
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_row_changed('owner');
+
+DROP TRIGGER IF EXISTS trg_property_room_photos_catalog_version ON t_p27119953_apartment_rental_mos.property_room_photos;
+CREATE TRIGGER trg_property_room_photos_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_room_photos
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_row_changed('room');
+
+DROP TRIGGER IF EXISTS trg_properties_catalog_statement ON t_p27119953_apartment_rental_mos.properties;
+CREATE TRIGGER trg_properties_catalog_statement
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.properties
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed();
+
+DROP TRIGGER IF EXISTS trg_property_rooms_catalog_statement ON t_p27119953_apartment_rental_mos.property_rooms;
+CREATE TRIGGER trg_property_rooms_catalog_statement
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_rooms
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed();
+
+DROP TRIGGER IF EXISTS trg_property_photos_catalog_statement ON t_p27119953_apartment_rental_mos.property_photos;
+CREATE TRIGGER trg_property_photos_catalog_statement
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_photos
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed();
+
+DROP TRIGGER IF EXISTS trg_property_room_photos_catalog_statement ON t_p27119953_apartment_rental_mos.property_room_photos;
+CREATE TRIGGER trg_property_room_photos_catalog_statement
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.property_room_photos
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed();
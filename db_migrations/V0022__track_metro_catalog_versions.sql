@@ -0,0 +1,23 @@
+-- В ответы каталога входит nearest_metro, поэтому изменения listing_metro тоже меняют версии ETag.
+-- Правка справочника станций пересобирает listing_metro целиком (V0019), так что отдельный триггер на metro_stations не нужен
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_version_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'DELETE' AND NEW.source = 'property' THEN
+        PERFORM t_p27119953_apartment_rental_mos.bump_property_version(NEW.listing_id);
+    END IF;
+    IF TG_OP <> 'INSERT' AND OLD.source = 'property' AND (TG_OP = 'DELETE' OR OLD.listing_id IS DISTINCT FROM NEW.listing_id) THEN
+        PERFORM t_p27119953_apartment_rental_mos.bump_property_version(OLD.listing_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_listing_metro_catalog_version ON t_p27119953_apartment_rental_mos.listing_metro;
+CREATE TRIGGER trg_listing_metro_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.listing_metro
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.listing_metro_version_changed();
+
+DROP TRIGGER IF EXISTS trg_listing_metro_catalog_statement ON t_p27119953_apartment_rental_mos.listing_metro;
+CREATE TRIGGER trg_listing_metro_catalog_statement
+    AFTER INSERT OR UPDATE OR DELETE ON t_p27119953_apartment_rental_mos.listing_metro
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed();
@@ -0,0 +1,71 @@
+-- Очередь построения уменьшенных копий: upload-image записывает сюда каждый загруженный оригинал,
+-- копии строит вызов по таймеру вне запроса загрузки. Готовые variants триггеры переносят во все фото с этим URL -
+-- и в уже сохранённые, и в сохранённые позже
+CREATE TABLE IF NOT EXISTS t_p27119953_apartment_rental_mos.image_variants (
+    file_name VARCHAR(100) PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'ready', 'failed')),
+    variants JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_image_variants_pending ON t_p27119953_apartment_rental_mos.image_variants(next_attempt_at)
+    WHERE status = 'pending';
+
+COMMENT ON TABLE t_p27119953_apartment_rental_mos.image_variants IS 'Загруженные оригиналы и их производные копии (WebP/JPEG разных ширин)';
+
+ALTER TABLE room_images ADD COLUMN IF NOT EXISTS variants JSONB;
+
+-- В photo_url могут лежать и длинные data: URL, поэтому hash, а не btree
+CREATE INDEX IF NOT EXISTS idx_property_photos_url ON t_p27119953_apartment_rental_mos.property_photos USING hash (photo_url);
+CREATE INDEX IF NOT EXISTS idx_property_room_photos_url ON t_p27119953_apartment_rental_mos.property_room_photos USING hash (photo_url);
+CREATE INDEX IF NOT EXISTS idx_room_images_url ON room_images USING hash (image_url);
+
+-- TG_ARGV[0] - колонка с URL фото в таблице, на которой висит триггер
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.fill_photo_variants() RETURNS trigger AS $$
+BEGIN
+    IF NEW.variants IS NULL THEN
+        SELECT iv.variants INTO NEW.variants
+        FROM t_p27119953_apartment_rental_mos.image_variants iv
+        WHERE iv.url = to_jsonb(NEW)->>TG_ARGV[0] AND iv.status = 'ready';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_property_photos_variants ON t_p27119953_apartment_rental_mos.property_photos;
+CREATE TRIGGER trg_property_photos_variants
+    BEFORE INSERT OR UPDATE OF photo_url ON t_p27119953_apartment_rental_mos.property_photos
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.fill_photo_variants('photo_url');
+
+DROP TRIGGER IF EXISTS trg_property_room_photos_variants ON t_p27119953_apartment_rental_mos.property_room_photos;
+CREATE TRIGGER trg_property_room_photos_variants
+    BEFORE INSERT OR UPDATE OF photo_url ON t_p27119953_apartment_rental_mos.property_room_photos
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.fill_photo_variants('photo_url');
+
+DROP TRIGGER IF EXISTS trg_room_images_variants ON room_images;
+CREATE TRIGGER trg_room_images_variants
+    BEFORE INSERT OR UPDATE OF image_url ON room_images
+    FOR EACH ROW EXECUTE FUNCTION t_p27119953_apartment_rental_mos.fill_photo_variants('image_url');
+
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.propagate_image_variants() RETURNS trigger AS $$
+BEGIN
+    UPDATE t_p27119953_apartment_rental_mos.property_photos SET variants = NEW.variants
+    WHERE photo_url = NEW.url AND variants IS NULL;
+    UPDATE t_p27119953_apartment_rental_mos.property_room_photos SET variants = NEW.variants
+    WHERE photo_url = NEW.url AND variants IS NULL;
+    UPDATE room_images SET variants = NEW.variants
+    WHERE image_url = NEW.url AND variants IS NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_image_variants_ready ON t_p27119953_apartment_rental_mos.image_variants;
+CREATE TRIGGER trg_image_variants_ready
+    AFTER INSERT OR UPDATE OF status, variants ON t_p27119953_apartment_rental_mos.image_variants
+    FOR EACH ROW WHEN (NEW.status = 'ready')
+    EXECUTE FUNCTION t_p27119953_apartment_rental_mos.propagate_image_variants();
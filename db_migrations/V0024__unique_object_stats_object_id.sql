@@ -0,0 +1,29 @@
+-- Одна строка статистики на объект: track-stats прибавляет дельты через INSERT ... ON CONFLICT (object_id),
+-- что безопасно при параллельных сбросах буфера. Дубликаты, которые успели появиться, сливаются в строку с наименьшим id
+WITH merged AS (
+    SELECT object_id,
+           MIN(id) AS keep_id,
+           SUM(COALESCE(views_count, 0)) AS views_count,
+           SUM(COALESCE(telegram_clicks_count, 0)) AS telegram_clicks_count,
+           MAX(last_view_at) AS last_view_at,
+           MAX(last_click_at) AS last_click_at
+    FROM object_stats
+    GROUP BY object_id
+    HAVING COUNT(*) > 1
+),
+kept AS (
+    UPDATE object_stats s
+    SET views_count = m.views_count,
+        telegram_clicks_count = m.telegram_clicks_count,
+        last_view_at = m.last_view_at,
+        last_click_at = m.last_click_at
+    FROM merged m
+    WHERE s.id = m.keep_id
+)
+DELETE FROM object_stats s
+USING merged m
+WHERE s.object_id = m.object_id AND s.id <> m.keep_id;
+
+-- Уникальный индекс заменяет прежний обычный индекс по object_id
+CREATE UNIQUE INDEX IF NOT EXISTS uq_object_stats_object_id ON object_stats(object_id);
+DROP INDEX IF EXISTS idx_object_stats_object_id;
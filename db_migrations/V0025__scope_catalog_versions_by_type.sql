@@ -0,0 +1,84 @@
+-- Общая строка 'catalog' в cache_versions оказалась горячей: любая запись в каталог ждала её блокировку
+-- до конца транзакции и сбрасывала ETag всех списков сразу. Теперь счётчик ведётся на тип объекта
+-- (строки 'catalog:hotel', 'catalog:apartment', ...): запись блокирует только строку своего типа,
+-- а список отелей не меняет ETag при правке квартиры. Типы изменённых объектов триггер уровня оператора
+-- берёт из таблиц переходов, поэтому массовая вставка фото обновляет строку типа один раз, а не на каждое фото
+INSERT INTO t_p27119953_apartment_rental_mos.cache_versions (name)
+SELECT DISTINCT 'catalog:' || type FROM t_p27119953_apartment_rental_mos.properties
+ON CONFLICT (name) DO NOTHING;
+
+DELETE FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name = 'catalog';
+
+-- Строки обновляются в порядке имени, чтобы две записи разных типов не взяли блокировки навстречу друг другу
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.bump_catalog_types(p_types TEXT[]) RETURNS void AS $$
+BEGIN
+    INSERT INTO t_p27119953_apartment_rental_mos.cache_versions AS v (name)
+    SELECT DISTINCT 'catalog:' || t FROM unnest(p_types) t WHERE t IS NOT NULL ORDER BY 1
+    ON CONFLICT (name) DO UPDATE SET version = v.version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV[0] - как найти тип объекта, как в catalog_row_changed: property (сама строка properties),
+-- owner (поле property_id), room (через номер), metro (listing_id строк с source = 'property').
+-- У объекта, удалённого тем же оператором, тип берёт триггер самой properties
+CREATE OR REPLACE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed() RETURNS trigger AS $$
+DECLARE
+    ids INTEGER[] := '{}';
+    types TEXT[] := '{}';
+BEGIN
+    IF TG_ARGV[0] = 'property' THEN
+        IF TG_OP <> 'DELETE' THEN SELECT types || array_agg(type) INTO types FROM new_rows; END IF;
+        IF TG_OP <> 'INSERT' THEN SELECT types || array_agg(type) INTO types FROM old_rows; END IF;
+    ELSE
+        IF TG_ARGV[0] = 'owner' THEN
+            IF TG_OP <> 'DELETE' THEN SELECT ids || array_agg(property_id) INTO ids FROM new_rows; END IF;
+            IF TG_OP <> 'INSERT' THEN SELECT ids || array_agg(property_id) INTO ids FROM old_rows; END IF;
+        ELSIF TG_ARGV[0] = 'metro' THEN
+            IF TG_OP <> 'DELETE' THEN SELECT ids || array_agg(listing_id) INTO ids FROM new_rows WHERE source = 'property'; END IF;
+            IF TG_OP <> 'INSERT' THEN SELECT ids || array_agg(listing_id) INTO ids FROM old_rows WHERE source = 'property'; END IF;
+        ELSE
+            IF TG_OP <> 'DELETE' THEN SELECT ids || array_agg(room_id) INTO ids FROM new_rows; END IF;
+            IF TG_OP <> 'INSERT' THEN SELECT ids || array_agg(room_id) INTO ids FROM old_rows; END IF;
+            SELECT coalesce(array_agg(pr.property_id), '{}') INTO ids
+            FROM t_p27119953_apartment_rental_mos.property_rooms pr WHERE pr.id = ANY(ids);
+        END IF;
+        SELECT coalesce(array_agg(DISTINCT p.type), '{}') INTO types
+        FROM t_p27119953_apartment_rental_mos.properties p WHERE p.id = ANY(ids);
+    END IF;
+
+    IF cardinality(types) > 0 THEN
+        PERFORM t_p27119953_apartment_rental_mos.bump_catalog_types(types);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Таблицы переходов нельзя объявить у триггера сразу на несколько событий, поэтому на каждое событие свой триггер
+DO $$
+DECLARE
+    target RECORD;
+    suffix TEXT;
+BEGIN
+    FOR target IN SELECT * FROM (VALUES
+        ('properties', 'property'), ('property_rooms', 'owner'), ('property_photos', 'owner'),
+        ('property_room_photos', 'room'), ('listing_metro', 'metro')
+    ) AS t(tbl, kind) LOOP
+        FOREACH suffix IN ARRAY ARRAY['statement', 'insert', 'update', 'delete'] LOOP
+            EXECUTE format('DROP TRIGGER IF EXISTS %I ON t_p27119953_apartment_rental_mos.%I',
+                           'trg_' || target.tbl || '_catalog_' || suffix, target.tbl);
+        END LOOP;
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON t_p27119953_apartment_rental_mos.%I '
+                       'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT '
+                       'EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed(%L)',
+                       'trg_' || target.tbl || '_catalog_insert', target.tbl, target.kind);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON t_p27119953_apartment_rental_mos.%I '
+                       'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT '
+                       'EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed(%L)',
+                       'trg_' || target.tbl || '_catalog_update', target.tbl, target.kind);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON t_p27119953_apartment_rental_mos.%I '
+                       'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT '
+                       'EXECUTE FUNCTION t_p27119953_apartment_rental_mos.catalog_statement_changed(%L)',
+                       'trg_' || target.tbl || '_catalog_delete', target.tbl, target.kind);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,5 @@
+-- Открытые пароли администраторов, которые так и не заменились на scrypt при входе (V0016), сбрасываются:
+-- auth-admin больше не сверяет пароль открытым текстом. Маркер не совпадает ни с одним форматом хеша,
+-- поэтому вход по такой записи невозможен, пока ей не задан новый хеш scrypt (hash_password из shared/passwords.py)
+UPDATE admins SET password_hash = '!reset-required'
+WHERE password_hash NOT LIKE 'scrypt$%';
@@ -0,0 +1,64 @@
+"""Копирует общие блоки из shared/ в backend-функции и проверяет, что копии не разошлись.
+
+Каждая функция деплоится своим каталогом и не может импортировать соседний модуль, поэтому пул
+соединений, маршрутизация, кеш и т.п. живут в index.py каждой функции. Каноническая версия блока -
+shared/<имя>.py; в функциях копия обрамлена строками
+
+    # >>> shared/<имя>.py ...
+    # <<< shared/<имя>.py
+
+Правится только shared/, затем:
+
+    python scripts/sync_shared.py          # переписать копии в backend/*/index.py
+    python scripts/sync_shared.py --check  # ничего не менять, код выхода 1 при расхождении
+
+Проверку запускает и tests/test_shared_blocks.py.
+"""
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SHARED_DIR = ROOT / 'shared'
+FUNCTIONS_GLOB = 'backend/*/index.py'
+BLOCK_RE = re.compile(r'^# >>> shared/(?P<name>[\w.-]+)\b.*?^# <<< shared/(?P=name)\n', re.M | re.S)
+
+def canonical_blocks() -> dict:
+    """Имя файла в shared/ -> его блок вместе со строками-маркерами"""
+    blocks = {}
+    for path in sorted(SHARED_DIR.glob('*.py')):
+        found = list(BLOCK_RE.finditer(path.read_text()))
+        if len(found) != 1 or found[0]['name'] != path.name:
+            raise ValueError(f'{path.relative_to(ROOT)}: expected exactly one block "# >>> shared/{path.name}"')
+        blocks[path.name] = found[0].group(0)
+    return blocks
+
+def synced_source(source: str, blocks: dict, path: Path) -> str:
+    def replace(match):
+        if match['name'] not in blocks:
+            raise ValueError(f'{path.relative_to(ROOT)}: unknown shared block {match["name"]}')
+        return blocks[match['name']]
+    return BLOCK_RE.sub(replace, source)
+
+def sync(check: bool = False) -> list:
+    """Переписывает устаревшие копии (или только находит их при check); возвращает пути к ним"""
+    blocks = canonical_blocks()
+    stale = []
+    for path in sorted(ROOT.glob(FUNCTIONS_GLOB)):
+        source = path.read_text()
+        updated = synced_source(source, blocks, path)
+        if updated != source:
+            stale.append(path.relative_to(ROOT))
+            if not check:
+                path.write_text(updated)
+    return stale
+
+def main() -> int:
+    check = '--check' in sys.argv[1:]
+    stale = sync(check)
+    for path in stale:
+        print(f'{path}: {"out of sync with shared/" if check else "updated"}')
+    return 1 if check and stale else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Кеш ответов публичного каталога: LocalCache (LRU в памяти) или RedisCache при CACHE_REDIS_URL.
+
+Функция задаёт CACHE_PREFIX и импортирует json, os, threading, time и OrderedDict (collections).
+"""
+# >>> shared/cache.py - не править здесь, см. scripts/sync_shared.py
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '60'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+class LocalCache:
+    """LRU-кеш с TTL в памяти процесса"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                cache_stats['evictions'] += 1
+
+class RedisCache:
+    """Общий кеш для всех функций; принимает готовый клиент (в тестах подходит fakeredis)"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def get(self, key: str):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        self.client.set(key, json.dumps(value), ex=max(int(ttl), 1))
+
+def create_cache():
+    redis_url = os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisCache(redis.Redis.from_url(redis_url))
+    return LocalCache(CACHE_MAX_ENTRIES)
+
+cache = create_cache()
+
+def normalize_params(params: dict) -> str:
+    return '&'.join(f'{k}={params[k]}' for k in sorted(params) if params[k] not in (None, ''))
+
+def cached_response(namespace: str, params: dict, build) -> dict:
+    """Read-through: ответ из кеша по нормализованным параметрам запроса или build().
+    Версия данных приходит в params (_version), поэтому после записи в БД кеш сбрасывать не нужно"""
+    key = f'{CACHE_PREFIX}:{namespace}:{normalize_params(params)}'
+    
+    response = cache.get(key)
+    if response is not None:
+        cache_stats['hits'] += 1
+        return {**response, 'headers': {**response['headers'], 'X-Cache': 'HIT'}}
+    
+    cache_stats['misses'] += 1
+    response = build()
+    if response['statusCode'] == 200:
+        cache.set(key, response, CACHE_TTL)
+    return {**response, 'headers': {**response['headers'], 'X-Cache': 'MISS'}}
+# <<< shared/cache.py
@@ -0,0 +1,142 @@
+"""Условные GET (ETag по счётчикам версий V0021/V0025) и постраничная выдача каталога с фильтрами.
+
+Нужны db_connection и cached_response/normalize_params из shared/db_pool.py и shared/cache.py,
+а также импорты base64, hashlib, json и datetime (datetime).
+"""
+# >>> shared/catalog.py - не править здесь, см. scripts/sync_shared.py
+# Условные GET: ETag строится по дешёвому признаку версии данных, а не по телу ответа
+def get_catalog_version(conn, property_id=None, property_type=None) -> str:
+    """Версия одного объекта, объектов одного типа или всего каталога из счётчиков, которые ведут триггеры V0021/V0025.
+    Счётчики типов только растут, поэтому их сумма меняется при любой записи в каталог"""
+    with conn.cursor() as cur:
+        if property_id is not None:
+            cur.execute('''
+                SELECT version FROM t_p27119953_apartment_rental_mos.catalog_versions WHERE property_id = %s::int
+            ''', (property_id,))
+        elif property_type:
+            cur.execute('''
+                SELECT version FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name = 'catalog:' || %s
+            ''', (property_type,))
+        else:
+            cur.execute('''
+                SELECT sum(version) FROM t_p27119953_apartment_rental_mos.cache_versions WHERE name LIKE 'catalog:%'
+            ''')
+        row = cur.fetchone()
+    return str(row[0]) if row and row[0] is not None else '0'
+
+def make_etag(version: str, params: dict) -> str:
+    return '"' + hashlib.sha1(f'{version}#{normalize_params(params)}'.encode()).hexdigest() + '"'
+
+def request_etags(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'if-none-match'), None) or ''
+    return {tag.strip() for tag in value.split(',') if tag.strip()}
+
+def not_modified(etag: str) -> dict:
+    return {
+        'statusCode': 304,
+        'headers': {'ETag': etag, 'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'ETag'},
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+def conditional_get(event: dict, property_id, namespace: str, params: dict, build, property_type=None) -> dict:
+    """304 без тела, если версия не менялась; иначе ответ из кеша с ETag"""
+    with db_connection() as conn:
+        etag = make_etag(get_catalog_version(conn, property_id, property_type), params)
+    client_etags = request_etags(event)
+    if 'W/' + etag in client_etags:
+        # Клиент получил тело сжатым (compress_response ослабляет ETag): 304 повторяет тот же W/-вариант
+        return not_modified('W/' + etag)
+    if etag in client_etags or '*' in client_etags:
+        return not_modified(etag)
+    
+    # Версия входит в ключ кеша, поэтому кеш не отдаёт тело, не совпадающее с ETag
+    response = cached_response(namespace, {**params, '_version': etag}, build)
+    if response['statusCode'] != 200:
+        return response
+    headers = {**response['headers'], 'ETag': etag, 'Access-Control-Expose-Headers': 'X-Next-Cursor, ETag'}
+    return {**response, 'headers': headers}
+
+# Постраничная выдача каталога: курсор по (created_at, id), размер страницы ограничен
+CATALOG_PAGE_SIZE = 50
+CATALOG_PAGE_SIZE_MAX = 100
+CATALOG_QUERY_MAX_LENGTH = 200
+# ?near_metro=Белорусская&walk_minutes=5 отвечает по предрасчитанной таблице listing_metro
+METRO_WALK_MINUTES_DEFAULT = 10
+METRO_WALK_MINUTES_MAX = 30
+
+def encode_cursor(row: dict) -> str:
+    """Курсор следующей страницы из последней строки текущей; created_at может быть NULL"""
+    created_at = row['created_at'].isoformat() if row['created_at'] is not None else None
+    raw = json.dumps([created_at, row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id)
+
+def build_catalog_filters(query_params: dict, room_condition: str = 'TRUE') -> tuple:
+    """Условия WHERE и параметры для фильтров каталога; ValueError при неверных значениях"""
+    conditions = []
+    params = []
+    
+    if query_params.get('type'):
+        conditions.append('p.type = %s')
+        params.append(query_params['type'])
+    if query_params.get('status'):
+        conditions.append('p.status = %s')
+        params.append(query_params['status'])
+    if query_params.get('metro'):
+        conditions.append('lower(p.metro) = lower(%s)')
+        params.append(query_params['metro'].strip())
+    if query_params.get('near_metro'):
+        walk_minutes = int(query_params.get('walk_minutes') or METRO_WALK_MINUTES_DEFAULT)
+        if not 1 <= walk_minutes <= METRO_WALK_MINUTES_MAX:
+            raise ValueError('walk_minutes out of range')
+        conditions.append('''p.id IN (
+            SELECT lm.listing_id
+            FROM t_p27119953_apartment_rental_mos.listing_metro lm
+            JOIN t_p27119953_apartment_rental_mos.metro_stations s ON s.id = lm.station_id
+            WHERE lm.source = 'property' AND lower(s.name) = lower(%s) AND lm.walk_minutes <= %s
+        )''')
+        params.extend([query_params['near_metro'].strip(), walk_minutes])
+    if query_params.get('q'):
+        # Подстрока названия, метро или адреса: search_text в нижнем регистре, LIKE идёт по триграммному GIN
+        pattern = ' '.join(query_params['q'].split()).lower()
+        if len(pattern) > CATALOG_QUERY_MAX_LENGTH:
+            raise ValueError('q too long')
+        pattern = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append('p.search_text LIKE %s')
+        params.append(f'%{pattern}%')
+    if query_params.get('price_min'):
+        conditions.append('p.price >= %s')
+        params.append(float(query_params['price_min']))
+    if query_params.get('price_max'):
+        conditions.append('p.price <= %s')
+        params.append(float(query_params['price_max']))
+    if query_params.get('capacity'):
+        conditions.append(f'''EXISTS (
+            SELECT 1 FROM t_p27119953_apartment_rental_mos.property_rooms pr
+            WHERE pr.property_id = p.id AND pr.capacity >= %s AND {room_condition}
+        )''')
+        params.append(int(query_params['capacity']))
+    if query_params.get('cursor'):
+        created_at, row_id = decode_cursor(query_params['cursor'])
+        if created_at is None:
+            # В ORDER BY created_at DESC строки без даты идут первыми (NULLS FIRST):
+            # после них остаются такие же строки с меньшим id и все строки с датой
+            conditions.append('(p.created_at IS NOT NULL OR p.id < %s)')
+            params.append(row_id)
+        else:
+            conditions.append('(p.created_at, p.id) < (%s, %s)')
+            params.extend((created_at, row_id))
+    
+    return conditions, params
+
+def get_page_size(query_params: dict) -> int:
+    limit = int(query_params.get('limit') or CATALOG_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, CATALOG_PAGE_SIZE_MAX)
+# <<< shared/catalog.py
@@ -0,0 +1,134 @@
+"""Таблица маршрутов, JSON-ответы и сжатие для функций с несколькими эндпоинтами.
+
+Функция сама задаёт PREFLIGHT_HEADERS, ROUTE_PARAMS и route_not_found(method, query) и импортирует
+base64, gzip, json, os, time, psycopg2, date/datetime (datetime) и Decimal (decimal).
+"""
+# >>> shared/http.py - не править здесь, см. scripts/sync_shared.py
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+ROUTES = {}
+
+def route(method: str, *values):
+    """Регистрирует обработчик для метода и значений параметров ROUTE_PARAMS"""
+    def register(func):
+        ROUTES[(method,) + values] = func
+        return func
+    return register
+
+# Быстрая сериализация: orjson, если он установлен, иначе stdlib json.
+# NUMERIC приходит из драйвера сразу float, datetime/date кодируются по типу без цепочки isinstance
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_AS_FLOAT',
+    lambda value, cur: float(value) if value is not None else None
+))
+
+_JSON_ENCODERS = {Decimal: float, datetime: datetime.isoformat, date: date.isoformat}
+
+def _json_default(value):
+    encoder = _JSON_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return encoder(value)
+
+def dumps(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default).decode()
+    return json.dumps(payload, default=_json_default)
+
+def cursor_columns(cursor) -> list:
+    return [column.name for column in cursor.description]
+
+def rows_payload(columns: list, rows: list) -> list:
+    """Кортежи строк обычного курсора в объекты по именам колонок; в JSON их переводит только dumps"""
+    return [dict(zip(columns, row)) for row in rows]
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+# Сжатие ответов по Accept-Encoding: brotli (если установлен) или gzip, только для тел больше порога.
+# compression_stats по маршрутам помогают подобрать порог и уровни сжатия
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compression_stats = {}
+
+def accepted_encodings(event: dict) -> set:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), None) or ''
+    encodings = set()
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=') if params.strip().startswith('q=') else '1'
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            continue
+    return encodings
+
+def compress_response(event: dict, response: dict, endpoint: str) -> dict:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or 'Content-Encoding' in response['headers']:
+        return response
+    
+    stats = compression_stats.setdefault(endpoint, {
+        'responses': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0
+    })
+    stats['responses'] += 1
+    raw = body.encode()
+    encodings = accepted_encodings(event)
+    if len(raw) < COMPRESS_MIN_SIZE or not encodings:
+        return response
+    
+    started = time.thread_time()
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings or '*' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    stats['cpu_ms'] += (time.thread_time() - started) * 1000
+    stats['compressed'] += 1
+    stats['bytes_in'] += len(raw)
+    stats['bytes_out'] += len(compressed)
+    
+    headers = {**response['headers'], 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}
+    # Сжатое тело по байтам не совпадает с несжатым, поэтому сильный ETag ослабляется (W/).
+    # If-None-Match сравнивается без W/, так что 304 получают клиенты с любым из вариантов
+    if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+        headers['ETag'] = 'W/' + headers['ETag']
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+def dispatch(event: dict) -> dict:
+    """Выбор обработчика по таблице маршрутов за один поиск в словаре"""
+    method = event.get('httpMethod', 'GET')
+    if method == 'OPTIONS':
+        return {'statusCode': 200, 'headers': dict(PREFLIGHT_HEADERS), 'body': '', 'isBase64Encoded': False}
+    
+    query = event.get('queryStringParameters') or {}
+    key = (method,) + tuple(query.get(name, default) for name, default in ROUTE_PARAMS)
+    route_handler = ROUTES.get(key)
+    if route_handler is None:
+        return route_not_found(method, query)
+    return compress_response(event, route_handler(event, query), ' '.join(str(part) for part in key if part))
+# <<< shared/http.py
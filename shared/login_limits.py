@@ -0,0 +1,95 @@
+"""Лимит попыток входа: token bucket по IP и логину, LocalBuckets в памяти или RedisBuckets при RATE_LIMIT_REDIS_URL.
+
+Функция задаёт RATE_LIMIT_PREFIX и импортирует os, threading, time и OrderedDict (collections).
+"""
+# >>> shared/login_limits.py - не править здесь, см. scripts/sync_shared.py
+LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', '5'))
+LOGIN_RATE_USER_PER_MIN = float(os.environ.get('LOGIN_RATE_USER_PER_MIN', '5'))
+LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', '20'))
+LOGIN_RATE_IP_PER_MIN = float(os.environ.get('LOGIN_RATE_IP_PER_MIN', '30'))
+LOGIN_RATE_MAX_KEYS = int(os.environ.get('LOGIN_RATE_MAX_KEYS', '10000'))
+
+rate_limit_stats = {'allowed': 0, 'limited': 0, 'evictions': 0}
+
+class LocalBuckets:
+    """Token bucket в памяти процесса: на ключ хранятся только остаток токенов и время обновления"""
+    
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Списывает токен; возвращает 0 или через сколько секунд появится следующий"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                rate_limit_stats['evictions'] += 1
+        return retry_after
+
+class RedisBuckets:
+    """Общие для всех экземпляров бакеты; списание атомарно в Lua-скрипте"""
+    
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        local retry_after = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            retry_after = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(retry_after)
+    """
+    
+    def __init__(self, client):
+        self.script = client.register_script(self.SCRIPT)
+    
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(self.script(keys=[key], args=[capacity, rate, time.time()]))
+
+def create_buckets():
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        import redis
+        return RedisBuckets(redis.Redis.from_url(redis_url))
+    return LocalBuckets(LOGIN_RATE_MAX_KEYS)
+
+login_buckets = create_buckets()
+
+def source_ip(event: dict) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    headers = event.get('headers') or {}
+    forwarded = next((v for k, v in headers.items() if k.lower() == 'x-forwarded-for'), None) or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+def login_retry_after(event: dict, username: str) -> float:
+    """0, если попытку входа можно обрабатывать, иначе сколько секунд ждать"""
+    retry_after = login_buckets.take(
+        f'{RATE_LIMIT_PREFIX}:ip:{source_ip(event)}', LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MIN / 60
+    )
+    if not retry_after:
+        retry_after = login_buckets.take(
+            f'{RATE_LIMIT_PREFIX}:user:{username.lower()}', LOGIN_RATE_USER_BURST, LOGIN_RATE_USER_PER_MIN / 60
+        )
+    rate_limit_stats['limited' if retry_after else 'allowed'] += 1
+    return retry_after
+# <<< shared/login_limits.py
@@ -0,0 +1,61 @@
+"""Хеширование паролей scrypt в ограниченном пуле потоков и проверка с перехешированием устаревших хешей.
+
+Нужны импорты base64, hashlib, hmac, os, secrets, threading и ThreadPoolExecutor (concurrent.futures).
+"""
+# >>> shared/passwords.py - не править здесь, см. scripts/sync_shared.py
+# Пароли хешируются scrypt; стоимость настраивается без миграции, т.к. параметры хранятся в самом хеше.
+# Хеширование идёт в ограниченном пуле потоков: всплеск логинов не отнимает весь CPU у остальных запросов
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '2'))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', '2'))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование переполнена - клиенту стоит повторить позже"""
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+def _run_hashing(func, *args):
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise PasswordHasherBusy()
+    try:
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _hash_password_sync(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return '$'.join((
+        'scrypt', str(PASSWORD_SCRYPT_N), str(PASSWORD_SCRYPT_R), str(PASSWORD_SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ))
+
+def _verify_password_sync(password: str, stored: str) -> tuple:
+    if stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+        return ok, ok and (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    # Старый формат: SHA-256 без соли; при успешном входе хеш сразу заменяется на scrypt
+    ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    return ok, ok
+
+def hash_password(password: str) -> str:
+    """Хеширование пароля scrypt со случайной солью"""
+    return _run_hashing(_hash_password_sync, password)
+
+def verify_password(password: str, stored) -> tuple:
+    """Проверка пароля: (совпал ли, нужно ли перехешировать текущими параметрами).
+    Для отсутствующего пользователя хеш всё равно считается, чтобы время ответа не выдавало логины"""
+    if not stored:
+        hash_password(password)
+        return False, False
+    return _run_hashing(_verify_password_sync, password, stored)
+# <<< shared/passwords.py
@@ -0,0 +1,83 @@
+"""Проверка подписанных HMAC токенов собственников с ротацией ключей AUTH_SIGNING_KEYS и списком отзыва.
+
+Нужны db_connection из shared/db_pool.py и импорты base64, hashlib, hmac, json, os, threading, time, psycopg2.
+"""
+# >>> shared/tokens.py - не править здесь, см. scripts/sync_shared.py
+# Подписанные токены сессии проверяются локально по HMAC, без запроса к БД.
+# AUTH_SIGNING_KEYS="kid2:secret2,kid1:secret1": первым ключом подписываются новые токены,
+# остальные ещё принимаются при проверке, пока не истекут выданные ими токены
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(12 * 3600)))
+REVOCATION_REFRESH = float(os.environ.get('AUTH_REVOCATION_REFRESH', '30'))
+
+def load_signing_keys() -> list:
+    keys = []
+    for item in os.environ.get('AUTH_SIGNING_KEYS', '').split(','):
+        kid, sep, secret = item.strip().partition(':')
+        if sep and kid and secret:
+            keys.append((kid, secret.encode()))
+    return keys
+
+SIGNING_KEYS = load_signing_keys()
+if not SIGNING_KEYS:
+    # Без ключей токены не выдаются и не принимаются: вход отвечает 503, кабинет - 401
+    print('AUTH_SIGNING_KEYS is not configured: owner tokens can be neither signed nor verified')
+
+# Отозванные до срока токены (выход из кабинета) держим в памяти и перечитываем не чаще REVOCATION_REFRESH
+_revoked = {'jtis': frozenset(), 'loaded_at': None}
+_revoked_lock = threading.Lock()
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def _token_signature(secret: bytes, signed_part: str) -> str:
+    return _b64encode(hmac.new(secret, signed_part.encode(), hashlib.sha256).digest())
+
+def refresh_revoked(force: bool = False) -> frozenset:
+    now = time.monotonic()
+    loaded_at = _revoked['loaded_at']
+    if not force and loaded_at is not None and now - loaded_at < REVOCATION_REFRESH:
+        return _revoked['jtis']
+    with _revoked_lock:
+        if not force and _revoked['loaded_at'] is not None and now - _revoked['loaded_at'] < REVOCATION_REFRESH:
+            return _revoked['jtis']
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT jti FROM t_p27119953_apartment_rental_mos.revoked_tokens
+                        WHERE expires_at > CURRENT_TIMESTAMP
+                    """)
+                    _revoked['jtis'] = frozenset(row[0] for row in cur.fetchall())
+        except psycopg2.Error as e:
+            # Оставляем прежний список, чтобы сбой БД не блокировал проверку; повторим позже
+            print(f'Revocation list refresh failed: {str(e)}')
+        _revoked['loaded_at'] = now
+    return _revoked['jtis']
+
+def verify_token(token: str):
+    """Claims токена или None, если подпись, срок действия или отзыв не проходят проверку"""
+    parts = (token or '').split('.')
+    if len(parts) != 3:
+        return None
+    kid, payload, signature = parts
+    secret = next((secret for key_id, secret in SIGNING_KEYS if key_id == kid), None)
+    if secret is None or not hmac.compare_digest(signature, _token_signature(secret, f'{kid}.{payload}')):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) <= time.time():
+        return None
+    if claims.get('jti') in refresh_revoked():
+        return None
+    return claims
+
+def request_token(event: dict) -> str:
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'x-authorization'), None) or ''
+    return value.removeprefix('Bearer ').strip()
+# <<< shared/tokens.py
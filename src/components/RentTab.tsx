@@ -38,6 +38,15 @@ interface RentTabProps {
 }
 
 const API_URL = 'https://functions.poehali.dev/1961571b-26cd-4f80-9709-45455d336430';
+const HOTELS_PAGE_SIZE = 24;
+const HOTELS_SEARCH_DEBOUNCE_MS = 300;
+
+// Для карточки берём уменьшенную WebP-копию (~640px), если сервер её построил
+const pickCardImage = (url: string, variants?: Record<string, { width: number; webp: string }[]> | null) => {
+  const sizes = variants?.[url];
+  if (!sizes || sizes.length === 0) return url;
+  return (sizes.find((v) => v.width >= 640) || sizes[sizes.length - 1]).webp;
+};
 
 export default function RentTab({
   apartmentStats,
@@ -59,11 +68,12 @@ export default function RentTab({
   const [phoneVisibleMap, setPhoneVisibleMap] = useState<Record<number, boolean>>({});
   const [hotelsFromDB, setHotelsFromDB] = useState<Apartment[]>([]);
 
+  const [hotelsCursor, setHotelsCursor] = useState<string | null>(null);
+  const [hotelsLoading, setHotelsLoading] = useState(false);
+  const hotelsRequestRef = useRef(0);
+
   const handleCategoryClick = (category: 'hotels' | 'apartments' | 'saunas' | 'conference') => {
     setActiveCategory(category);
-    if (category === 'hotels') {
-      loadHotels();
-    }
     setTimeout(() => {
       const section = document.getElementById('results-section');
       if (section) {
@@ -72,36 +82,56 @@ export default function RentTab({
     }, 100);
   };
 
-  const loadHotels = async () => {
+  // Одна страница каталога за запрос: фильтры уходят на сервер, следующая страница - по X-Next-Cursor
+  const loadHotels = async (cursor: string | null = null) => {
+    const requestId = ++hotelsRequestRef.current;
+    const params = new URLSearchParams({ entity: 'hotels', limit: String(HOTELS_PAGE_SIZE) });
+    if (searchQuery.trim()) params.set('q', searchQuery.trim());
+    if (cursor) params.set('cursor', cursor);
+    setHotelsLoading(true);
     try {
-      const response = await fetch(`${API_URL}?entity=hotels`);
+      const response = await fetch(`${API_URL}?${params}`);
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
       const data = await response.json();
+      // Ответ на устаревший запрос (сменился поиск) не должен перетирать новую выдачу
+      if (requestId !== hotelsRequestRef.current) return;
       
       const mapped: Apartment[] = data.map((hotel: any) => ({
         id: hotel.id,
         title: hotel.name,
         image: hotel.images && hotel.images.length > 0 && hotel.images[0] 
-          ? hotel.images[0] 
+          ? pickCardImage(hotel.images[0], hotel.image_variants)
           : 'https://cdn.poehali.dev/projects/432e7c51-cea3-442e-b82d-2ac77f4ff46d/files/2644c7d5-13e5-4838-b53a-5b82cda63881.jpg',
         price: hotel.rooms && hotel.rooms.length > 0 ? hotel.rooms[0].price : Number(hotel.price || 0),
-        metro: hotel.metro || '',
+        metro: hotel.metro || (hotel.nearest_metro && hotel.nearest_metro.length > 0 ? hotel.nearest_metro[0].name : ''),
+        metroWalkMinutes: hotel.nearest_metro && hotel.nearest_metro.length > 0 ? hotel.nearest_metro[0].walk_minutes : undefined,
         address: hotel.address,
         area: hotel.rooms && hotel.rooms.length > 0 ? hotel.rooms[0].area : 0,
         telegram: hotel.owner_telegram || '',
         views: 0,
         telegramClicks: 0,
-        lat: 55.7558,
-        lon: 37.6173,
+        lat: hotel.lat != null ? Number(hotel.lat) : 55.7558,
+        lon: hotel.lon != null ? Number(hotel.lon) : 37.6173,
         category: 'hotels' as const,
         minHours: 2,
         phone: hotel.owner_phone
       }));
-      setHotelsFromDB(mapped);
+      setHotelsFromDB(prev => cursor ? [...prev, ...mapped] : mapped);
+      setHotelsCursor(response.headers.get('X-Next-Cursor'));
     } catch (error) {
       console.error('Failed to load hotels:', error);
+    } finally {
+      if (requestId === hotelsRequestRef.current) setHotelsLoading(false);
     }
   };
 
+  // Первая страница при выборе отелей и при смене поискового запроса (с задержкой на ввод)
+  useEffect(() => {
+    if (activeCategory !== 'hotels') return;
+    const timeout = setTimeout(() => loadHotels(), HOTELS_SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timeout);
+  }, [activeCategory, searchQuery]);
+
   const staticListings: Apartment[] = [
     // Апартаменты
     { id: 201, title: 'Студия с видом на реку', image: 'https://cdn.poehali.dev/projects/432e7c51-cea3-442e-b82d-2ac77f4ff46d/files/e5ab91c8-b024-4279-a610-7927a666ae1a.jpg', price: 3500, metro: 'Парк Культуры', metroWalkMinutes: 8, address: 'Остоженка, 12', area: 32, telegram: '@owner1', views: 0, telegramClicks: 0, lat: 55.740700, lon: 37.597700, category: 'apartments' },
@@ -182,6 +212,9 @@ export default function RentTab({
         setPhoneVisibleMap={setPhoneVisibleMap}
         trackView={trackView}
         trackTelegramClick={trackTelegramClick}
+        hasMore={activeCategory === 'hotels' && hotelsCursor !== null}
+        loadingMore={hotelsLoading}
+        onLoadMore={() => hotelsCursor && loadHotels(hotelsCursor)}
       />
     </div>
   );
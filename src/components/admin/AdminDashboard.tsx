@@ -44,8 +44,13 @@ export default function AdminDashboard({ user, onLogout }: AdminDashboardProps)
   const loadProperties = async () => {
     try {
       setLoading(true);
-      const response = await fetch(API_URL);
-      const data = await response.json();
+      const data: any[] = [];
+      let cursor: string | null = null;
+      do {
+        const response = await fetch(cursor ? `${API_URL}?limit=100&cursor=${encodeURIComponent(cursor)}` : `${API_URL}?limit=100`);
+        data.push(...(await response.json()));
+        cursor = response.headers.get('X-Next-Cursor');
+      } while (cursor);
       setProperties(data.map((p: any) => ({
         id: String(p.id),
         type: p.type,
@@ -56,6 +61,8 @@ export default function AdminDashboard({ user, onLogout }: AdminDashboardProps)
         metro: p.metro || '',
         price: p.price ? Number(p.price) : 0,
         rating: p.rating ? Number(p.rating) : 0,
+        lat: p.lat != null ? Number(p.lat) : null,
+        lon: p.lon != null ? Number(p.lon) : null,
         owner: {
           name: p.owner_name,
           phone: p.owner_phone,
@@ -354,7 +361,7 @@ export default function AdminDashboard({ user, onLogout }: AdminDashboardProps)
                       await fetch(API_URL, {
                         method: 'PUT',
                         headers: { 'Content-Type': 'application/json' },
-                        body: JSON.dumps({
+                        body: JSON.stringify({
                           ...property,
                           id: Number(editingProperty.id),
                         }),
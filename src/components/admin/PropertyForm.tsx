@@ -7,6 +7,7 @@ import { Card } from '@/components/ui/card';
 import Icon from '@/components/ui/icon';
 import type { Property, PropertyType, ImageUpload, PropertyOwner, Room } from '@/types/admin';
 import { AMENITIES } from '@/types/admin';
+import { uploadImages } from '@/lib/uploadImages';
 import RoomsManager from './RoomsManager';
 
 interface PropertyFormProps {
@@ -30,6 +31,8 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
     address: property?.address || '',
     metro: property?.metro || '',
     price: property?.price || 0,
+    lat: property?.lat != null ? String(property.lat) : '',
+    lon: property?.lon != null ? String(property.lon) : '',
   });
 
   const [owner, setOwner] = useState<PropertyOwner>(
@@ -44,6 +47,7 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
 
   const [mainPhoto, setMainPhoto] = useState<ImageUpload | null>(null);
   const [photos, setPhotos] = useState<ImageUpload[]>([]);
+  const [uploading, setUploading] = useState(false);
   const mainPhotoInputRef = useRef<HTMLInputElement>(null);
   const photosInputRef = useRef<HTMLInputElement>(null);
 
@@ -86,7 +90,7 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
     );
   };
 
-  const handleSubmit = (e: React.FormEvent) => {
+  const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
 
     if (!formData.name || !formData.address || !owner.name || !owner.phone) {
@@ -94,12 +98,30 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
       return;
     }
 
+    // Фото сохраняются ссылками на бакет, а не data: URL в базе
+    const pending = [...(mainPhoto ? [mainPhoto] : []), ...photos];
+    let uploaded: string[];
+    try {
+      setUploading(true);
+      uploaded = await uploadImages(pending.map((p) => ({ file: p.file, fileName: p.file.name })));
+    } catch (error) {
+      console.error('Failed to upload photos:', error);
+      alert('Ошибка при загрузке фотографий');
+      return;
+    } finally {
+      setUploading(false);
+    }
+    const mainPhotoUrl = mainPhoto ? uploaded[0] : null;
+    const photoUrls = mainPhoto ? uploaded.slice(1) : uploaded;
+
     const propertyData: Partial<Property> = {
       ...formData,
+      lat: formData.lat.trim() ? Number(formData.lat) : null,
+      lon: formData.lon.trim() ? Number(formData.lon) : null,
       owner,
       amenities: selectedAmenities,
-      mainPhoto: mainPhoto?.preview || property?.mainPhoto || '',
-      photos: photos.map((p) => p.preview),
+      mainPhoto: mainPhotoUrl || property?.mainPhoto || '',
+      photos: photoUrls,
       rooms,
       status: property?.status || 'draft',
       createdAt: property?.createdAt || new Date().toISOString(),
@@ -173,6 +195,31 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
           />
         </div>
 
+        <div className="grid grid-cols-2 gap-4">
+          <div>
+            <Label htmlFor="lat">Широта</Label>
+            <Input
+              id="lat"
+              type="number"
+              step="0.000001"
+              value={formData.lat}
+              onChange={(e) => setFormData({ ...formData, lat: e.target.value })}
+              placeholder="55.755800"
+            />
+          </div>
+          <div>
+            <Label htmlFor="lon">Долгота</Label>
+            <Input
+              id="lon"
+              type="number"
+              step="0.000001"
+              value={formData.lon}
+              onChange={(e) => setFormData({ ...formData, lon: e.target.value })}
+              placeholder="37.617300"
+            />
+          </div>
+        </div>
+
         <div>
           <Label htmlFor="price">Цена (₽)</Label>
           <Input
@@ -333,9 +380,9 @@ export default function PropertyForm({ property, onSave, onCancel }: PropertyFor
       </Card>
 
       <div className="flex gap-4">
-        <Button type="submit" className="flex-1">
+        <Button type="submit" className="flex-1" disabled={uploading}>
           <Icon name="Save" size={16} className="mr-2" />
-          Сохранить
+          {uploading ? 'Загрузка фото...' : 'Сохранить'}
         </Button>
         <Button type="button" variant="outline" onClick={onCancel}>
           Отмена
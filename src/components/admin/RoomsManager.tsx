@@ -8,6 +8,7 @@ import { Badge } from '@/components/ui/badge';
 import Icon from '@/components/ui/icon';
 import type { Room, ImageUpload } from '@/types/admin';
 import { AMENITIES } from '@/types/admin';
+import { uploadImages } from '@/lib/uploadImages';
 
 interface RoomsManagerProps {
   rooms: Room[];
@@ -186,6 +187,7 @@ interface RoomFormDialogProps {
 function RoomFormDialog({ room, propertyType, onSave, onCancel }: RoomFormDialogProps) {
   const [formData, setFormData] = useState(room);
   const [photos, setPhotos] = useState<ImageUpload[]>([]);
+  const [uploading, setUploading] = useState(false);
   const photosInputRef = useRef<HTMLInputElement>(null);
 
   const handlePhotosChange = (e: React.ChangeEvent<HTMLInputElement>) => {
@@ -217,15 +219,26 @@ function RoomFormDialog({ room, propertyType, onSave, onCancel }: RoomFormDialog
     });
   };
 
-  const handleSubmit = (e: React.FormEvent) => {
+  const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!formData.name || !formData.price) {
       alert('Заполните обязательные поля');
       return;
     }
+    let uploaded: string[];
+    try {
+      setUploading(true);
+      uploaded = await uploadImages(photos.map((p) => ({ file: p.file, fileName: p.file.name })));
+    } catch (error) {
+      console.error('Failed to upload photos:', error);
+      alert('Ошибка при загрузке фотографий');
+      return;
+    } finally {
+      setUploading(false);
+    }
     onSave({
       ...formData,
-      photos: [...formData.photos, ...photos.map((p) => p.preview)],
+      photos: [...formData.photos, ...uploaded],
     });
   };
 
@@ -375,9 +388,9 @@ function RoomFormDialog({ room, propertyType, onSave, onCancel }: RoomFormDialog
             </div>
 
             <div className="flex gap-4 pt-4">
-              <Button type="submit" className="flex-1">
+              <Button type="submit" className="flex-1" disabled={uploading}>
                 <Icon name="Save" size={16} className="mr-2" />
-                Сохранить
+                {uploading ? 'Загрузка фото...' : 'Сохранить'}
               </Button>
               <Button type="button" variant="outline" onClick={onCancel}>
                 Отмена
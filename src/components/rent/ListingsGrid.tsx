@@ -38,6 +38,9 @@ interface ListingsGridProps {
   setPhoneVisibleMap: (map: Record<number, boolean>) => void;
   trackView: (id: number) => void;
   trackTelegramClick: (id: number) => void;
+  hasMore?: boolean;
+  loadingMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 const categoryConfig = {
@@ -57,7 +60,10 @@ export default function ListingsGrid({
   phoneVisibleMap,
   setPhoneVisibleMap,
   trackView,
-  trackTelegramClick
+  trackTelegramClick,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore
 }: ListingsGridProps) {
   const resultsRef = useRef<HTMLDivElement>(null);
   const navigate = useNavigate();
@@ -191,7 +197,21 @@ export default function ListingsGrid({
           ))}
         </div>
 
-        {filteredListings.length === 0 && (
+        {hasMore && onLoadMore && (
+          <div className="flex justify-center mt-8">
+            <Button
+              variant="outline"
+              size="lg"
+              disabled={loadingMore}
+              onClick={onLoadMore}
+            >
+              <Icon name={loadingMore ? 'Loader2' : 'ChevronDown'} size={18} className={loadingMore ? 'mr-2 animate-spin' : 'mr-2'} />
+              {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+            </Button>
+          </div>
+        )}
+
+        {filteredListings.length === 0 && !loadingMore && (
           <div className="text-center py-16">
             <Icon name="SearchX" size={64} className="mx-auto mb-4 text-gray-400" />
             <p className="text-xl text-gray-600">Ничего не найдено</p>
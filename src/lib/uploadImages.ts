@@ -0,0 +1,58 @@
+const UPLOAD_IMAGE_URL = 'https://functions.poehali.dev/1f01a2cb-8661-4f11-b90a-dae6dcb16df0';
+const MAX_UPLOAD_SIZE = 20 * 1024 * 1024;
+const UPLOAD_CONCURRENCY = 4;
+
+export interface PendingImage {
+  file: Blob;
+  fileName: string;
+}
+
+interface PresignedPost {
+  uploadUrl: string;
+  fields: Record<string, string>;
+  url: string;
+}
+
+// Файл уходит прямо в бакет по presigned POST: функция выдаёт только подпись,
+// поэтому тело запроса к ней не растёт с размером фото и base64-копия не нужна
+async function uploadImage(image: PendingImage): Promise<string> {
+  if (image.file.size > MAX_UPLOAD_SIZE) {
+    throw new Error(`${image.fileName}: файл больше ${MAX_UPLOAD_SIZE / 1024 / 1024} МБ`);
+  }
+  const response = await fetch(UPLOAD_IMAGE_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ mode: 'presign_post', fileName: image.fileName }),
+  });
+  if (!response.ok) {
+    throw new Error(`Presign failed: ${response.status}`);
+  }
+  const presigned: PresignedPost = await response.json();
+
+  // Поля подписи идут до файла: бакет проверяет их и content-length-range
+  const form = new FormData();
+  for (const [name, value] of Object.entries(presigned.fields)) {
+    form.append(name, value);
+  }
+  form.append('file', image.file, image.fileName);
+  const upload = await fetch(presigned.uploadUrl, { method: 'POST', body: form });
+  if (!upload.ok) {
+    throw new Error(`Upload failed: ${upload.status}`);
+  }
+  return presigned.url;
+}
+
+// Загружает файлы в бакет и возвращает ссылки в том же порядке.
+// Уменьшенные копии строятся на сервере позже и попадают в фото по URL
+export async function uploadImages(images: PendingImage[]): Promise<string[]> {
+  const urls: string[] = new Array(images.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < images.length) {
+      const index = next++;
+      urls[index] = await uploadImage(images[index]);
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(UPLOAD_CONCURRENCY, images.length) }, worker));
+  return urls;
+}
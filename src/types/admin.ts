@@ -53,6 +53,8 @@ export interface Property {
   rooms: Room[];
   price?: number;
   rating?: number;
+  lat?: number | null;
+  lon?: number | null;
   createdAt: string;
   updatedAt: string;
   createdBy: string;
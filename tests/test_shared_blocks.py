@@ -0,0 +1,26 @@
+"""Копии общих блоков в backend/*/index.py совпадают с shared/.
+
+При расхождении: поправить shared/<блок>.py и запустить python scripts/sync_shared.py.
+"""
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def load_sync():
+    spec = importlib.util.spec_from_file_location('sync_shared', ROOT / 'scripts/sync_shared.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_function_copies_match_shared():
+    assert load_sync().sync(check=True) == []
+
+def test_every_shared_block_is_used():
+    sync = load_sync()
+    used = {
+        match['name']
+        for path in ROOT.glob(sync.FUNCTIONS_GLOB)
+        for match in sync.BLOCK_RE.finditer(path.read_text())
+    }
+    assert set(sync.canonical_blocks()) == used
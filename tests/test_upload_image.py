@@ -0,0 +1,117 @@
+"""Прямая загрузка в бакет и потоковое декодирование base64 в upload-image на S3 из moto.
+
+Очередь копий в БД здесь не нужна: record_upload подменяется списком имён.
+Запуск:
+
+    pip install -r backend/upload-image/requirements.txt moto pytest requests
+    python -m pytest tests/test_upload_image.py
+"""
+import base64
+import importlib.util
+import io
+import json
+from pathlib import Path
+
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+
+@pytest.fixture
+def upload_image(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('S3_ENDPOINT_URL', 'https://s3.amazonaws.com')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='files')
+        spec = importlib.util.spec_from_file_location('upload_image_index', ROOT / 'backend/upload-image/index.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.recorded = []
+        monkeypatch.setattr(module, 'record_upload', module.recorded.append)
+        yield module
+
+def jpeg_bytes(width: int = 1600, height: int = 900) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 10, 10)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+def stored_object(module, key: str) -> dict:
+    return module.get_s3_client().get_object(Bucket=module.S3_BUCKET, Key=key)
+
+def post(module, body: dict) -> dict:
+    return module.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+
+def test_presigned_put_uploads_to_bucket(upload_image):
+    response = post(upload_image, {'mode': 'presign', 'fileName': 'photo.png'})
+    assert response['statusCode'] == 200
+    upload = json.loads(response['body'])
+    assert upload['method'] == 'PUT'
+    assert upload_image.recorded == [upload['fileName']]
+
+    content = b'\x89PNG fake image'
+    put = requests.put(upload['uploadUrl'], data=content, headers=upload['headers'])
+    assert put.status_code == 200
+    stored = stored_object(upload_image, upload['fileName'])
+    assert stored['Body'].read() == content
+    assert stored['ContentType'] == 'image/png'
+
+def test_presigned_post_uploads_to_bucket_with_size_limit(upload_image):
+    response = post(upload_image, {'mode': 'presign_post', 'fileName': 'photo.jpg'})
+    assert response['statusCode'] == 200
+    upload = json.loads(response['body'])
+    assert upload['method'] == 'POST'
+
+    policy = json.loads(base64.b64decode(upload['fields']['policy']))
+    assert ['content-length-range', 1, upload_image.MAX_UPLOAD_SIZE] in policy['conditions']
+
+    content = jpeg_bytes()
+    sent = requests.post(upload['uploadUrl'], data=upload['fields'], files={'file': ('photo.jpg', content)})
+    assert sent.status_code in (200, 204)
+    assert stored_object(upload_image, upload['fileName'])['Body'].read() == content
+
+def test_base64_upload_streams_to_bucket(upload_image, monkeypatch):
+    # Кусок меньше файла: декодирование идёт в несколько шагов
+    monkeypatch.setattr(upload_image, 'DECODE_CHUNK_SIZE', 4 * 1024)
+    content = jpeg_bytes()
+    data = 'data:image/jpeg;base64,' + base64.b64encode(content).decode()
+
+    response = post(upload_image, {'file': data, 'fileName': 'photo.jpg'})
+    assert response['statusCode'] == 200
+    result = json.loads(response['body'])
+    assert result['derivatives'] == 'pending'
+    assert upload_image.recorded == [result['fileName']]
+    assert stored_object(upload_image, result['fileName'])['Body'].read() == content
+
+@pytest.mark.parametrize('size', [1, 2, 3, 1000])
+def test_decoded_size_matches_base64_length(upload_image, size):
+    encoded = 'data:image/jpeg;base64,' + base64.b64encode(b'x' * size).decode()
+    assert upload_image.decoded_size(encoded, encoded.find(',') + 1) == size
+
+def test_base64_upload_over_limit_is_rejected_before_decoding(upload_image, monkeypatch):
+    monkeypatch.setattr(upload_image, 'MAX_UPLOAD_SIZE', 1024)
+    monkeypatch.setattr(upload_image, 'decode_base64_to_file', lambda *args: pytest.fail('decoded oversized file'))
+    data = 'data:image/jpeg;base64,' + base64.b64encode(b'x' * 1025).decode()
+
+    response = post(upload_image, {'file': data, 'fileName': 'photo.jpg'})
+    assert response['statusCode'] == 413
+    assert json.loads(response['body'])['maxSize'] == 1024
+
+    response = post(upload_image, {'files': [{'file': data, 'fileName': 'photo.jpg'}]})
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['results'][0]['ok'] is False
+    assert upload_image.recorded == []
+
+def test_derivatives_built_from_stored_original(upload_image):
+    response = post(upload_image, {'mode': 'presign', 'fileName': 'photo.jpg'})
+    upload = json.loads(response['body'])
+    requests.put(upload['uploadUrl'], data=jpeg_bytes(), headers=upload['headers'])
+
+    variants = upload_image.build_stored_derivatives(upload['fileName'])
+    assert [v['width'] for v in variants] == list(upload_image.DERIVATIVE_WIDTHS)
+    stem = upload['fileName'].rsplit('.', 1)[0]
+    assert stored_object(upload_image, f'{stem}-320w.webp')['ContentType'] == 'image/webp'